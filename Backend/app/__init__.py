@@ -1,11 +1,32 @@
 from flask import Flask, redirect, url_for, jsonify
 from flask_cors import CORS
 import os
+import importlib
+import logging
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Modules kept out of the import path of create_app because they are slow to
+# load; they are imported on first use, or up front with PRELOAD_HEAVY_MODULES
+HEAVY_MODULES = ["app.langgraph.workflow", "gtts", "numpy"]
+
+def preload_heavy_modules():
+    """
+    Import the heavy modules now instead of on the first request.
+
+    Meant for a pre-forking server (`gunicorn --preload`): the master pays
+    the import once and the forked workers share it.
+    """
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+
 def create_app(test_config=None):
     # Create and configure the app
     app = Flask(__name__, instance_relative_config=True)
@@ -37,12 +58,25 @@ def create_app(test_config=None):
             "message": "Cartoonimations API is running",
             "endpoints": {
                 "health": "/api/health",
-                "generate": "/api/generate (POST)"
+                "generate": "/api/generate (POST)",
+                "jobs": "/api/jobs"
             }
         })
 
+    # Set up the job store
+    from .services import job_store
+    job_store.init_app(app)
+
+    # Keep generated media within its storage quotas
+    from .services import storage_service
+    storage_service.init_app(app)
+
     # Register routes
-    from .routes import main_routes
+    from .routes import main_routes, admin_routes
     app.register_blueprint(main_routes.bp)
+    app.register_blueprint(admin_routes.bp)
+
+    if os.environ.get("PRELOAD_HEAVY_MODULES", "false").lower() in ["true", "1", "yes"]:
+        preload_heavy_modules()
 
     return app
\ No newline at end of file
@@ -1,78 +1,1132 @@
 import os
+import shutil
+import time
+import asyncio
+import threading
 import logging
 import traceback
-from ..services.manim_service import save_manim_code, generate_manim_code
-from ..services.video_service import create_video
-from ..services.voice_service import create_voiceover
-from ..langgraph.workflow import AnimationWorkflow
+import uuid
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from ..services.manim_service import (
+    save_manim_code, generate_manim_code, sanitize_manim_code, get_fallback_template, is_fallback_code,
+    FALLBACK_MARKER
+)
+from ..services.video_service import (
+    create_video, get_job_partial_dir, get_project_paths, render_section, stitch_sections, remove_sections,
+    seed_partial_movies, is_mock_video
+)
+from ..services.voice_service import create_voiceover, get_audio_path, voiceover_enabled
+from ..services.job_store import get_job_store, prompt_hash, STATUS_QUEUED, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED
+from ..services.single_flight import SingleFlight
+from ..services.prompt_index import get_prompt_index, get_reuse_mode, same_word_order
+from ..services.admission import get_admission_controller, AdmissionRejected
+from ..services.render_scheduler import get_render_scheduler, PRIORITY_INTERACTIVE, PRIORITY_STANDARD, PRIORITY_BATCH
+from ..services.render_queue import get_render_backend, get_render_queue_client
+from ..services.artifact_store import get_artifact_store
+from ..services.render_affinity import affinity_key
+from ..services.packaging_service import package_hls, hls_packaging_enabled, hls_package_complete
+from ..services.live_publisher import LIVE_PLAYLIST
+from ..services.thumbnail_service import create_thumbnails, POSTER
+from ..services.scene_cost import estimate_render_cost, enforce_scene_limits, get_render_timeout, SceneRejected
+from ..services.section_stream import SectionParser
+from ..services.scene_diff import diff_scenes, apply_patch
+from ..services.render_checkpoint import RenderCheckpoint, checkpoints_enabled, get_checkpoint_dir
+from ..services.encoder_profiles import get_profile
+from ..services.memory_accounting import get_job_memory
+from ..services.profiling import (
+    start_job_profiling, finish_job_profiling, get_job_profiler, get_profile_dir, job_stage, job_context,
+    PSTATS_FILE, COLLAPSED_FILE
+)
+from ..services.tracing import (
+    start_trace, finish_trace, activate_trace, job_trace, span, start_span, add_remote_spans, get_trace_path,
+    CATEGORY_COMPUTE, CATEGORY_IO, CATEGORY_QUEUE
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_animation(prompt):
+# Identical concurrent requests share one pipeline run
+_generate_flight = SingleFlight("generate")
+# A job is packaged for HLS at most once at a time
+_package_flight = SingleFlight("package")
+_thumbnail_flight = SingleFlight("thumbnails")
+
+def job_result(job, reused=False):
+    """
+    Build the API response for a job.
+
+    Args:
+        job (dict): Job record from the job store
+        reused (bool): Whether the result was served from an earlier job
+
+    Returns:
+        dict: Animation details including video path, script, etc.
+    """
+    hls_path = job.get("hls_path")
+    poster_path = job.get("poster_path")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "video_path": job.get("video_path"),
+        "audio_path": job.get("audio_path"),
+        "hls_url": f"/api/jobs/{job['id']}/hls/{os.path.basename(hls_path)}"
+        if hls_package_complete(hls_path) else None,
+        "poster_url": f"/api/jobs/{job['id']}/thumbnails/{POSTER}"
+        if poster_path and os.path.exists(poster_path) else None,
+        "profile_urls": _profile_urls(job["id"]),
+        "trace_url": f"/api/jobs/{job['id']}/trace" if os.path.exists(get_trace_path(job["id"])) else None,
+        "script": job.get("script"),
+        "prompt": job["prompt"],
+        "degraded": bool(job.get("degraded")),
+        "reused": reused
+    }
+
+def _profile_urls(job_id):
+    """URLs of a profiled job's merged profiles, or None if it wasn't profiled."""
+    directory = get_profile_dir(job_id)
+    urls = [f"/api/jobs/{job_id}/profile/{name}" for name in (PSTATS_FILE, COLLAPSED_FILE)
+            if os.path.exists(os.path.join(directory, name))]
+    return urls or None
+
+def find_similar_job(prompt, settings=None):
+    """
+    Find a completed job whose prompt is a near-duplicate of this one.
+
+    Args:
+        prompt (str): User prompt
+        settings (dict, optional): Generation settings; only jobs with the same settings match
+
+    Returns:
+        tuple: (job, similarity) or None if nothing is similar enough
+    """
+    store = get_job_store()
+    for job_id, similarity in get_prompt_index().query(prompt):
+        job = store.get_job(job_id)
+        if not job or job["settings"] != (settings or {}) or job.get("degraded"):
+            continue
+        if job.get("video_path") and os.path.exists(job["video_path"]):
+            return job, similarity
+    return None
+
+def ensure_hls(job_id, priority=PRIORITY_STANDARD):
+    """
+    Package a completed job for HLS playback unless it already is.
+
+    Packaging runs on the render scheduler so it shares the render workers.
+
+    Args:
+        job_id (str): Job id
+        priority (str): Priority class for the packaging work
+
+    Returns:
+        dict: The job record
+    """
+    store = get_job_store()
+    job = store.get_job(job_id)
+    if hls_package_complete(job.get("hls_path")):
+        return job
+    if not job.get("video_path") or not os.path.exists(job["video_path"]):
+        return job
+
+    def package():
+        started = time.perf_counter()
+        future = get_render_scheduler().submit(
+            package_hls, job["video_path"], job_id,
+            priority=priority, cost=job["timings"].get("render_estimate", 1.0)
+        )
+        hls_path = future.result()
+        if hls_path:
+            timings = {**job["timings"], "packaging": time.perf_counter() - started}
+            store.update_job(job_id, hls_path=hls_path, timings=timings)
+            store.add_artifact(job_id, "hls", hls_path)
+        return store.get_job(job_id)
+
+    job, _ = _package_flight.do(job_id, package)
+    return job
+
+def ensure_thumbnails(job_id):
+    """
+    Create a completed job's poster and sprite sheet unless they exist.
+
+    Jobs from before thumbnails existed get them on first request.
+
+    Returns:
+        dict: The job record
+    """
+    store = get_job_store()
+    job = store.get_job(job_id)
+    if not job or job["status"] != STATUS_COMPLETED:
+        return job
+    if job.get("poster_path") and os.path.exists(job["poster_path"]):
+        return job
+    if not job.get("video_path") or not os.path.exists(job["video_path"]):
+        return job
+
+    def generate():
+        record_thumbnails(job_id, job["video_path"], get_job_partial_dir(job_id, job["settings"].get("encoder_profile")))
+        return store.get_job(job_id)
+
+    job, _ = _thumbnail_flight.do(job_id, generate)
+    return job
+
+def record_thumbnails(job_id, video_path, partial_dir=None):
+    """Create thumbnails for a video and record them in the job store."""
+    store = get_job_store()
+    artifacts = create_thumbnails(video_path, job_id, partial_dir)
+    for kind, path in artifacts.items():
+        store.add_artifact(job_id, kind, path)
+    if "poster" in artifacts:
+        store.update_job(job_id, poster_path=artifacts["poster"])
+    return artifacts
+
+def _flight_key(prompt, settings, reuse, reuse_mode, priority, profiling):
+    """
+    Get the key concurrent generate calls are coalesced by.
+
+    Only callers asking for the same thing share a job: a forced request
+    doesn't attach to one that may reuse an earlier result, and a caller
+    doesn't inherit another priority class. Profiled calls never share.
+    """
+    mode = (reuse_mode or get_reuse_mode()).lower() if reuse else "force"
+    key = f"{prompt_hash(prompt, settings)}:{mode}:{priority}"
+    if profiling:
+        key = f"{key}:profile:{uuid.uuid4().hex}"
+    return key
+
+def create_animation(prompt, settings=None, reuse=True, reuse_mode=None, priority=PRIORITY_STANDARD, hls=None,
+                     profiling=False):
     """
     Create an educational animation from a user prompt.
-    
+
+    Concurrent calls with the same normalized prompt, settings, reuse
+    options and priority are coalesced: they attach to the in-flight job
+    and share its result.
+
     Args:
         prompt (str): User prompt describing the animation
-        
+        settings (dict, optional): Generation settings that affect the output
+        reuse (bool): Return an existing result for the same prompt and settings if there is one
+        reuse_mode (str, optional): How near-duplicate prompts are handled ("return",
+            "offer" or "off"). Defaults to PROMPT_REUSE_MODE.
+        priority (str): Render priority class: "interactive", "standard" or "batch"
+        hls (bool, optional): Package the video for HLS playback. Defaults to HLS_PACKAGING_ENABLED.
+        profiling (bool): Profile the workflow and render and keep the profiles with the job.
+            A profiled job always runs anew, it never reuses or shares a result.
+
     Returns:
         dict: Animation details including video path, script, etc.
     """
+    if profiling:
+        # A reused or shared result would have nothing to profile
+        reuse = False
+    key = _flight_key(prompt, settings, reuse, reuse_mode, priority, profiling)
+    result, shared = _generate_flight.do(key, _run_animation_job, prompt, settings, reuse, reuse_mode, priority,
+                                         profiling)
+    result = _with_hls(result, hls, priority)
+    return {**result, "coalesced": shared}
+
+def _with_hls(result, hls, priority):
+    """Add an HLS package to a completed result if requested."""
+    # Packaging doesn't change the video, so reused results are packaged on demand
+    if hls is None:
+        hls = hls_packaging_enabled()
+    if hls and result.get("status") == STATUS_COMPLETED and not result.get("hls_url"):
+        try:
+            job = ensure_hls(result["job_id"], priority)
+            result = {**result, "hls_url": job_result(job)["hls_url"]}
+        except Exception as e:
+            logger.error(f"Error packaging job {result['job_id']} for HLS: {e}")
+    return result
+
+async def acreate_animation(prompt, settings=None, reuse=True, reuse_mode=None, priority=PRIORITY_STANDARD, hls=None,
+                            profiling=False):
+    """
+    Async version of create_animation for the ASGI server.
+
+    A job waiting on the LLM holds no thread, so one process can keep many
+    jobs in flight; rendering still runs on the render scheduler. A
+    profiled job's workflow runs in a thread, so its nodes are profiled as
+    in create_animation.
+    """
+    if profiling:
+        reuse = False
+    key = _flight_key(prompt, settings, reuse, reuse_mode, priority, profiling)
+    result, shared = await _generate_flight.ado(key, _arun_animation_job, prompt, settings, reuse, reuse_mode, priority,
+                                                profiling)
+    result = await asyncio.to_thread(_with_hls, result, hls, priority)
+    return {**result, "coalesced": shared}
+
+async def _arun_animation_job(prompt, settings=None, reuse=True, reuse_mode=None, priority=PRIORITY_STANDARD,
+                              profiling=False):
+    """Async version of _run_animation_job."""
+    if reuse:
+        reused = await asyncio.to_thread(_find_reusable_result, prompt, settings, reuse_mode)
+        if reused:
+            return reused
+
+    async with get_admission_controller().async_admit():
+        return await _agenerate_new_animation(prompt, settings, priority, profiling)
+
+def _run_animation_job(prompt, settings=None, reuse=True, reuse_mode=None, priority=PRIORITY_STANDARD,
+                       profiling=False):
+    """Run the full generation pipeline for one job. See create_animation."""
+    if reuse:
+        reused = _find_reusable_result(prompt, settings, reuse_mode)
+        if reused:
+            return reused
+
+    # New work only starts once admission control grants a job slot
+    with get_admission_controller().admit():
+        return _generate_new_animation(prompt, settings, priority, profiling=profiling)
+
+def _find_reusable_result(prompt, settings=None, reuse_mode=None):
+    """Answer a prompt from an identical or near-duplicate earlier job, or return None."""
+    store = get_job_store()
+    existing = store.find_completed_by_prompt(prompt, settings)
+    if existing and existing.get("video_path") and os.path.exists(existing["video_path"]):
+        logger.info(f"Reusing job {existing['id']} for prompt: {prompt}")
+        store.touch_artifacts(existing["id"])
+        return job_result(existing, reused=True)
+
+    reuse_mode = (reuse_mode or get_reuse_mode()).lower()
+    similar = find_similar_job(prompt, settings) if reuse_mode in ["return", "offer"] else None
+    if similar:
+        match, similarity = similar
+        logger.info(f"Prompt is similar ({similarity:.2f}) to job {match['id']}: {match['prompt']}")
+        if reuse_mode == "return" and not same_word_order(prompt, match["prompt"]):
+            # Same words in another order may ask the opposite; clients that
+            # want to decide themselves ask for reuse_mode "offer"
+            logger.info(f"Not reusing job {match['id']}: prompt words are in a different order")
+            return None
+        store.touch_artifacts(match["id"])
+        if reuse_mode == "offer":
+            return {
+                "status": "similar_found",
+                "prompt": prompt,
+                "similarity": similarity,
+                "match": job_result(match, reused=True)
+            }
+        return {**job_result(match, reused=True), "similar_to": match["prompt"], "similarity": similarity}
+    return None
+
+def start_animation(prompt, settings=None, reuse=True, reuse_mode=None, priority=PRIORITY_STANDARD,
+                    profiling=False):
+    """
+    Start generating an animation in the background and return at once.
+
+    The render publishes its partial movies to the job's live playlist, so
+    playback can begin while the rest of the scene is still rendering.
+    Reusable earlier results are returned directly as in create_animation.
+
+    Args:
+        prompt (str): User prompt describing the animation
+        settings (dict, optional): Generation settings that affect the output
+        reuse (bool): Return an existing result for the same prompt and settings if there is one
+        reuse_mode (str, optional): How near-duplicate prompts are handled
+        priority (str): Render priority class
+        profiling (bool): Profile the job; it then always runs anew
+
+    Returns:
+        dict: The queued job with its live playlist URL, or a reused result
+
+    Raises:
+        ValueError: If renders run on queue workers, which don't publish live playlists
+    """
+    if get_render_backend() == "queue":
+        raise ValueError("Live streaming is not available with RENDER_BACKEND=queue")
+    if reuse and not profiling:
+        reused = _find_reusable_result(prompt, settings, reuse_mode)
+        if reused:
+            return reused
+
+    job = get_job_store().create_job(prompt, settings)
+    thread = threading.Thread(
+        target=_run_background_job, args=(job["id"], prompt, settings, priority, profiling),
+        name=f"job-{job['id'][:8]}", daemon=True
+    )
+    thread.start()
+    return {**job_result(job), "live_url": f"/api/jobs/{job['id']}/live/{LIVE_PLAYLIST}"}
+
+def _run_background_job(job_id, prompt, settings, priority, profiling=False):
+    """Run a job started by start_animation."""
     try:
-        logger.info(f"Creating animation for prompt: {prompt}")
-        
-        # Check if we're using AI workflow
-        use_ai_workflow = os.environ.get("USE_AI_WORKFLOW", "true").lower() in ["true", "1", "yes"]
-        
-        if use_ai_workflow:
-            # Use LangGraph workflow
-            try:
-                workflow = AnimationWorkflow()
-                result = workflow.run(prompt)
-                
-                manim_code = result.get("manim_code", "")
-                script = result.get("script", "")
-            except Exception as e:
-                logger.error(f"Error in AI workflow: {e}")
-                logger.error(traceback.format_exc())
-                # Fallback to simple template
-                manim_code = f"# Failed to generate code, using template\nfrom manim import *\n\nclass EducationalScene(Scene):\n    def construct(self):\n        title = Text(\"{prompt}\").scale(0.8)\n        title.to_edge(UP)\n        self.play(Write(title))\n        self.wait(2)"
-                script = f"Here is an explanation about {prompt}"
+        with get_admission_controller().admit():
+            _generate_new_animation(prompt, settings, priority, job_id=job_id, live=True, profiling=profiling)
+    except AdmissionRejected as e:
+        logger.warning(f"Job {job_id} rejected: {e}")
+        get_job_store().update_job(job_id, status=STATUS_FAILED, finished_at=time.time(), error=str(e))
+    except Exception as e:
+        # _generate_new_animation has already recorded the failure
+        logger.error(f"Background job {job_id} failed: {e}")
+
+def get_batch_max_items():
+    """Get the largest number of prompts accepted in one batch."""
+    return int(os.environ.get("BATCH_MAX_ITEMS", "200"))
+
+def start_batch(prompts, settings=None, reuse=True, priority=PRIORITY_BATCH):
+    """
+    Queue many prompts as one batch and return at once.
+
+    Prompts with an identical completed job are answered by it, and repeated
+    prompts within the batch share one job. The rest are generated together:
+    each workflow stage runs as one LangChain batch and renders fan out over
+    the render scheduler as soon as each item's code is ready.
+
+    Args:
+        prompts (list): User prompts
+        settings (dict, optional): Generation settings shared by all items
+        reuse (bool): Answer prompts from earlier completed jobs
+        priority (str): Render priority class for the batch's renders
+
+    Returns:
+        dict: Batch id, each item's job id and the manifest URL
+    """
+    store = get_job_store()
+    items = []
+    batch_jobs = {}
+    for prompt in prompts:
+        key = prompt_hash(prompt, settings)
+        existing = store.find_completed_by_prompt(prompt, settings) if reuse else None
+        if existing and existing.get("video_path") and os.path.exists(existing["video_path"]):
+            items.append({"prompt": prompt, "job_id": existing["id"], "reused": True})
+        elif key in batch_jobs:
+            items.append({"prompt": prompt, "job_id": batch_jobs[key], "reused": True})
         else:
-            # Use direct template approach
-            manim_code = generate_manim_code(prompt)  # This should use the LLM
-            script = f"Here is an explanation about {prompt}"
-            
-        # Create video from code
+            batch_jobs[key] = uuid.uuid4().hex
+            items.append({"prompt": prompt, "job_id": batch_jobs[key], "reused": False})
+
+    batch = store.create_batch(items, settings, priority)
+    thread = threading.Thread(target=_run_batch, args=(batch["id"],), name=f"batch-{batch['id'][:8]}", daemon=True)
+    thread.start()
+    logger.info(f"Queued batch {batch['id']}: {len(items)} items, {len(batch_jobs)} to generate")
+    return {
+        "batch_id": batch["id"],
+        "items": [{"index": index, **item} for index, item in enumerate(batch["items"])],
+        "manifest_url": f"/api/batches/{batch['id']}",
+    }
+
+def _run_batch(batch_id):
+    """Generate the new jobs of a batch started by start_batch."""
+    store = get_job_store()
+    batch = store.get_batch(batch_id)
+    work = []
+    for item in batch["items"]:
+        if not item["reused"]:
+            work.append((item["job_id"], item["prompt"]))
+    store.update_batch(batch_id, started_at=time.time())
+    try:
+        # The batch takes one job slot; its renders queue behind interactive work at batch priority
+        with get_admission_controller().admit():
+            _generate_batch(work, batch["settings"] or None, batch["priority"])
+    except AdmissionRejected as e:
+        logger.warning(f"Batch {batch_id} rejected: {e}")
+        for job_id, _ in work:
+            store.update_job(job_id, status=STATUS_FAILED, finished_at=time.time(), error=str(e))
+    except Exception as e:
+        logger.error(f"Batch {batch_id} failed: {e}")
+        logger.error(traceback.format_exc())
+    finally:
+        store.update_batch(batch_id, finished_at=time.time())
+
+def _generate_batch(work, settings, priority):
+    """
+    Run the LLM, render and post-render stages for a list of (job id, prompt).
+    """
+    started = time.perf_counter()
+    timings = {job_id: {} for job_id, _ in work}
+    renders = {}
+    for job_id, prompt in work:
+        # Items are handled on shared threads, each step enters its job's trace with job_trace
+        _begin_job(prompt, settings, job_id, activate_trace=False)
+
+    def render(index, state):
+        job_id, prompt = work[index]
+        timings[job_id]["workflow"] = time.perf_counter() - started
+        try:
+            with job_trace(job_id):
+                manim_code = _prepare_scene(job_id, prompt, state["manim_code"], None, timings[job_id])
+                future = _submit_render(job_id, manim_code, state.get("scene_plan"), settings, priority, False,
+                                        timings[job_id])
+            renders[index] = (future, time.perf_counter())
+        except Exception as e:
+            renders[index] = (e, time.perf_counter())
+
+    prompts = [prompt for _, prompt in work]
+    if _use_ai_workflow():
+        try:
+            states = _new_workflow().run_batch(prompts, on_code=render)
+        except Exception as e:
+            logger.error(f"Error in batch AI workflow: {e}")
+            logger.error(traceback.format_exc())
+            states = [e] * len(work)
+    else:
+        states = []
+        for index, prompt in enumerate(prompts):
+            states.append({"prompt": prompt, "manim_code": generate_manim_code(prompt)})
+            render(index, states[index])
+
+    # Items the LLM couldn't handle get the template scene, as single jobs do
+    for index, (_, prompt) in enumerate(work):
+        if index not in renders:
+            manim_code, _, _ = _fallback_content(prompt)
+            render(index, {"prompt": prompt, "manim_code": manim_code})
+
+    # Thumbnails and voiceovers of finished renders run side by side
+    workers = int(os.environ.get("BATCH_FINISH_WORKERS", "4"))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-finish") as pool:
+        for index, (job_id, prompt) in enumerate(work):
+            state = states[index]
+            script = state.get("script") if isinstance(state, dict) else None
+            future, submitted = renders[index]
+            pool.submit(_finish_batch_item, job_id, prompt, script or _fallback_content(prompt)[1],
+                        future, submitted, settings, timings[job_id], started)
+
+def _finish_batch_item(job_id, prompt, script, future, submitted, settings, timings, started):
+    """Wait for one batch item's render and complete or fail its job."""
+    with job_trace(job_id):
+        try:
+            if isinstance(future, Exception):
+                raise future
+            video_path = future.result()
+            _check_render(video_path)
+            timings["render"] = time.perf_counter() - submitted
+            get_job_store().update_job(job_id, script=script)
+            _finish_job(job_id, prompt, script, video_path, settings, timings, started)
+        except Exception as e:
+            _fail_job(job_id, e, timings, started)
+
+def get_batch_manifest(batch_id):
+    """
+    Get a batch's per-item status and aggregate throughput.
+
+    Args:
+        batch_id (str): Batch id
+
+    Returns:
+        dict: The manifest, or None if there is no such batch
+    """
+    store = get_job_store()
+    batch = store.get_batch(batch_id)
+    if not batch:
+        return None
+    jobs = store.get_jobs({item["job_id"] for item in batch["items"]})
+
+    items = []
+    counts = Counter()
+    item_seconds = []
+    for index, item in enumerate(batch["items"]):
+        job = jobs.get(item["job_id"]) or {"status": "missing"}
+        counts[job["status"]] += 1
+        seconds = None
+        if not item["reused"] and job.get("started_at") and job.get("finished_at"):
+            seconds = job["finished_at"] - job["started_at"]
+            item_seconds.append(seconds)
+        items.append({
+            "index": index,
+            "prompt": item["prompt"],
+            "job_id": item["job_id"],
+            "reused": item["reused"],
+            "status": job["status"],
+            "video_path": job.get("video_path"),
+            "error": job.get("error"),
+            "seconds": seconds,
+            "job_url": f"/api/jobs/{item['job_id']}",
+        })
+
+    if batch["finished_at"]:
+        status = STATUS_COMPLETED
+    else:
+        status = STATUS_RUNNING if batch["started_at"] else STATUS_QUEUED
+    elapsed = (batch["finished_at"] or time.time()) - (batch["started_at"] or batch["created_at"])
+    generated = sum(1 for item in items if not item["reused"] and item["status"] == STATUS_COMPLETED)
+    return {
+        "batch_id": batch["id"],
+        "status": status,
+        "priority": batch["priority"],
+        "settings": batch["settings"],
+        "created_at": batch["created_at"],
+        "started_at": batch["started_at"],
+        "finished_at": batch["finished_at"],
+        "total": len(items),
+        "counts": dict(counts),
+        "throughput": {
+            "elapsed_seconds": elapsed,
+            "generated": generated,
+            "items_per_minute": generated / elapsed * 60 if elapsed > 0 else 0.0,
+            "mean_item_seconds": sum(item_seconds) / len(item_seconds) if item_seconds else None,
+        },
+        "items": items,
+    }
+
+def edit_animation(job_id, code=None, patch=None, instruction=None, priority=PRIORITY_INTERACTIVE,
+                   profiling=False):
+    """
+    Edit a completed animation, re-rendering only what changed.
+
+    The edit becomes a new job. Its scene is compared with the edited job's
+    animation by animation: the render starts after the leading animations
+    that are unchanged, splicing in their segments from the edited job's
+    checkpoint, and Manim's cache serves later animations whose scene state
+    didn't change either. The script and voiceover are kept.
+
+    Args:
+        job_id (str): Completed job to edit
+        code (str, optional): The complete edited scene
+        patch (str, optional): Unified diff against the job's scene
+        instruction (str, optional): Follow-up instruction, e.g. "make the circle blue"
+        priority (str): Render priority class
+        profiling (bool): Profile the edit's LLM call and render
+
+    Returns:
+        dict: The new job's result with an "edit" summary
+
+    Raises:
+        LookupError: If there is no completed job with a scene to edit
+        ValueError: If not exactly one kind of edit is given or the patch doesn't apply
+    """
+    parent = get_job_store().get_job(job_id)
+    if not parent or parent["status"] != STATUS_COMPLETED or not parent.get("manim_code"):
+        raise LookupError(f"No completed job {job_id} to edit")
+    if sum(edit is not None for edit in (code, patch, instruction)) != 1:
+        raise ValueError("Give exactly one of code, patch or instruction")
+    if patch is not None:
+        code = apply_patch(parent["manim_code"], patch)
+
+    with get_admission_controller().admit():
+        return _generate_edit(parent, code, instruction, priority, profiling)
+
+def _generate_edit(parent, code, instruction, priority, profiling=False):
+    """Run the LLM (for instructions) and render stages of an edit. See edit_animation."""
+    prompt, settings = parent["prompt"], parent["settings"]
+    job_id = get_job_store().create_job(prompt, settings, status=STATUS_RUNNING, parent_id=parent["id"])["id"]
+    job_id = _begin_job(prompt, settings, job_id, profiling)
+    timings = {}
+    started = time.perf_counter()
+
+    try:
+        logger.info(f"Editing job {parent['id']} as job {job_id}")
+        if instruction is not None:
+            stage_started = time.perf_counter()
+            with job_stage(job_id, "workflow.edit"):
+                code = _new_workflow().edit_code(parent["manim_code"], instruction)
+            timings["workflow"] = time.perf_counter() - stage_started
+
+        manim_code = _prepare_scene(job_id, prompt, code, parent["script"], timings)
+        edit = _seed_edit(parent["id"], job_id, parent["manim_code"], manim_code, settings)
+        timings["reused_animations"] = edit["reused"]
+
+        stage_started = time.perf_counter()
+        try:
+            with span("render"):
+                video_path = _submit_render(job_id, manim_code, None, settings, priority, False, timings).result()
+            _check_render(video_path)
+        except Exception as e:
+            logger.error(f"Error creating video: {e}")
+            logger.error(traceback.format_exc())
+            raise Exception(f"Failed to generate video: {str(e)}")
+        timings["render"] = time.perf_counter() - stage_started
+
+        result = _finish_job(job_id, prompt, parent["script"], video_path, settings, timings, started,
+                             audio_source=parent.get("audio_path"), index_prompt=False)
+        return {**result, "edit": {"parent_id": parent["id"], **edit}}
+
+    except Exception as e:
+        _fail_job(job_id, e, timings, started)
+        raise Exception(f"Failed to edit animation: {str(e)}")
+
+def _seed_edit(parent_id, job_id, old_code, new_code, settings):
+    """
+    Give an edit's render the unchanged animations of the job it edits.
+
+    Returns:
+        dict: Animations in the new scene, the changed ones, and how many
+            were reused from the edited job's render
+    """
+    diff = diff_scenes(old_code, new_code)
+    summary = {
+        "animations": diff["animations"] if diff else None,
+        "changed": diff["changed"] if diff else None,
+        "reused": 0,
+    }
+    if not checkpoints_enabled():
+        return summary
+
+    profile = get_profile((settings or {}).get("encoder_profile"))
+    try:
+        seed_partial_movies(parent_id, job_id, profile["name"])
+        if diff and diff["reusable"]:
+            checkpoint = RenderCheckpoint.for_job(job_id, new_code, profile["manim_quality"])
+            summary["reused"] = checkpoint.seed(RenderCheckpoint(get_checkpoint_dir(parent_id)), diff["reusable"])
+            if summary["reused"] == diff["animations"]:
+                # Nothing left to render, e.g. trailing animations were removed
+                checkpoint.finish(diff["animations"])
+    except Exception as e:
+        logger.error(f"Error reusing the render of job {parent_id}: {e}")
+    logger.info(
+        f"Edit of job {parent_id} changes animations {summary['changed']}, "
+        f"reusing {summary['reused']} of {summary['animations']}"
+    )
+    return summary
+
+def _generate_new_animation(prompt, settings=None, priority=PRIORITY_STANDARD, job_id=None, live=False,
+                            profiling=False):
+    """Run the LLM, render and voiceover stages for a new or queued job."""
+    job_id = _begin_job(prompt, settings, job_id, profiling)
+    timings = {}
+    started = time.perf_counter()
+
+    try:
+        logger.info(f"Creating animation for prompt: {prompt} (job {job_id})")
+
+        if _use_streaming_render(live):
+            streamed = _generate_streaming(job_id, prompt, settings, priority, timings)
+            if streamed:
+                script, video_path = streamed
+                return _finish_job(job_id, prompt, script, video_path, settings, timings, started)
+
+        stage_started = time.perf_counter()
+        with span("workflow"):
+            manim_code, script, scene_plan = _generate_content(prompt, job_id)
+        timings["workflow"] = time.perf_counter() - stage_started
+
+        manim_code = _prepare_scene(job_id, prompt, manim_code, script, timings)
+
+        # Create video from code, scheduled by priority class and expected cost
+        stage_started = time.perf_counter()
         try:
-            video_path = create_video(manim_code)
-            if not video_path or not os.path.exists(video_path):
-                raise FileNotFoundError("Failed to generate video file")
+            with span("render"):
+                video_path = _submit_render(job_id, manim_code, scene_plan, settings, priority, live, timings).result()
+            _check_render(video_path)
         except Exception as e:
             logger.error(f"Error creating video: {e}")
             logger.error(traceback.format_exc())
             raise Exception(f"Failed to generate video: {str(e)}")
-            
-        # Create voiceover from script
+        timings["render"] = time.perf_counter() - stage_started
+
+        return _finish_job(job_id, prompt, script, video_path, settings, timings, started)
+
+    except Exception as e:
+        _fail_job(job_id, e, timings, started)
+        raise Exception(f"Failed to create animation: {str(e)}")
+    finally:
+        logger.info("Animation creation process completed.")
+
+async def _agenerate_new_animation(prompt, settings=None, priority=PRIORITY_STANDARD, profiling=False):
+    """
+    Async version of _generate_new_animation.
+
+    LLM calls are awaited on the event loop, the render runs on the render
+    scheduler and blocking bookkeeping runs in the default thread pool.
+    """
+    job_id = await asyncio.to_thread(_begin_job, prompt, settings, None, profiling)
+    # _begin_job ran in a copy of this context
+    activate_trace(job_id)
+    timings = {}
+    started = time.perf_counter()
+
+    try:
+        logger.info(f"Creating animation for prompt: {prompt} (job {job_id})")
+
+        if _use_streaming_render(False):
+            streamed = await asyncio.to_thread(_generate_streaming, job_id, prompt, settings, priority, timings)
+            if streamed:
+                script, video_path = streamed
+                return await asyncio.to_thread(_finish_job, job_id, prompt, script, video_path, settings, timings, started)
+
+        stage_started = time.perf_counter()
+        with span("workflow"):
+            if get_job_profiler(job_id) is not None:
+                # Profilers follow one thread, and the event loop interleaves
+                # every job's nodes, so a profiled job runs the sync workflow
+                manim_code, script, scene_plan = await asyncio.to_thread(_generate_content, prompt, job_id)
+            else:
+                manim_code, script, scene_plan = await _agenerate_content(prompt)
+        timings["workflow"] = time.perf_counter() - stage_started
+
+        manim_code = await asyncio.to_thread(_prepare_scene, job_id, prompt, manim_code, script, timings)
+
+        stage_started = time.perf_counter()
         try:
-            audio_path = create_voiceover(script)
+            with span("render"):
+                future = _submit_render(job_id, manim_code, scene_plan, settings, priority, False, timings)
+                video_path = await asyncio.wrap_future(future)
+            _check_render(video_path)
         except Exception as e:
-            logger.error(f"Error creating voiceover: {e}")
+            logger.error(f"Error creating video: {e}")
             logger.error(traceback.format_exc())
-            audio_path = None
-            
-        return {
-            "video_path": video_path,
-            "audio_path": audio_path,
-            "script": script,
-            "prompt": prompt
-        }
-        
+            raise Exception(f"Failed to generate video: {str(e)}")
+        timings["render"] = time.perf_counter() - stage_started
+
+        return await asyncio.to_thread(_finish_job, job_id, prompt, script, video_path, settings, timings, started)
+
     except Exception as e:
-        logger.error(f"Error creating animation: {e}")
-        logger.error(traceback.format_exc())
+        await asyncio.to_thread(_fail_job, job_id, e, timings, started)
         raise Exception(f"Failed to create animation: {str(e)}")
     finally:
         logger.info("Animation creation process completed.")
+
+def _begin_job(prompt, settings=None, job_id=None, profiling=False, activate_trace=True):
+    """
+    Create the job (unless it was queued already) and mark it running.
+
+    The job is profiled if profiling is requested or the admin toggle is on.
+    Its trace is started and, with activate_trace, spans recorded in this
+    context from now on belong to it until the job finishes or fails.
+    """
+    store = get_job_store()
+    if job_id is None:
+        job_id = store.create_job(prompt, settings, status=STATUS_RUNNING)["id"]
+    store.update_job(job_id, status=STATUS_RUNNING, started_at=time.time())
+    get_job_memory().begin(job_id)
+    start_job_profiling(job_id, profiling)
+    start_trace(job_id, activate=activate_trace, prompt=prompt[:200],
+                encoder_profile=(settings or {}).get("encoder_profile"))
+    return job_id
+
+def _new_workflow():
+    """Create the LangGraph workflow, importing the LangChain stack on first use."""
+    from ..langgraph.workflow import AnimationWorkflow
+    return AnimationWorkflow()
+
+def _use_ai_workflow():
+    return os.environ.get("USE_AI_WORKFLOW", "true").lower() in ["true", "1", "yes"]
+
+def _fallback_content(prompt):
+    """Template code and script used when the AI workflow fails."""
+    manim_code = f"# Failed to generate code, using template\nfrom manim import *\n\nclass EducationalScene(Scene):\n    def construct(self):\n        {FALLBACK_MARKER}\n        title = Text(\"{prompt}\").scale(0.8)\n        title.to_edge(UP)\n        self.play(Write(title))\n        self.wait(2)"
+    return manim_code, f"Here is an explanation about {prompt}", None
+
+def _generate_content(prompt, job_id=None):
+    """
+    Run the LLM stage.
+
+    If the job is profiled, each workflow node is profiled as its own stage.
+
+    Returns:
+        tuple: (manim_code, script, scene_plan)
+    """
+    if not _use_ai_workflow():
+        # Use direct template approach
+        with job_stage(job_id, "workflow.generate_manim_code"):
+            manim_code = generate_manim_code(prompt)  # This should use the LLM
+        return manim_code, f"Here is an explanation about {prompt}", None
+
+    # Use LangGraph workflow
+    try:
+        with job_context(job_id):
+            result = _new_workflow().run(prompt)
+        return result.get("manim_code", ""), result.get("script", ""), result.get("scene_plan")
+    except Exception as e:
+        logger.error(f"Error in AI workflow: {e}")
+        logger.error(traceback.format_exc())
+        return _fallback_content(prompt)
+
+async def _agenerate_content(prompt):
+    """Async version of _generate_content."""
+    if not _use_ai_workflow():
+        manim_code = await asyncio.to_thread(generate_manim_code, prompt)
+        return manim_code, f"Here is an explanation about {prompt}", None
+
+    try:
+        result = await _new_workflow().arun(prompt)
+        return result.get("manim_code", ""), result.get("script", ""), result.get("scene_plan")
+    except Exception as e:
+        logger.error(f"Error in AI workflow: {e}")
+        logger.error(traceback.format_exc())
+        return _fallback_content(prompt)
+
+def _use_streaming_render(live=False):
+    """
+    Whether to render sections while the code is still being generated.
+
+    Live jobs use the single-render path, whose partial movies feed the live playlist.
+    Section renders run on this process's scheduler, so with RENDER_BACKEND=queue
+    the scene is always handed to the workers whole.
+    """
+    enabled = os.environ.get("STREAMING_RENDER_ENABLED", "false").lower() in ["true", "1", "yes"]
+    return enabled and not live and _use_ai_workflow() and get_render_backend() != "queue"
+
+def _generate_streaming(job_id, prompt, settings, priority, timings):
+    """
+    Run the LLM and render stages overlapped.
+
+    The code generator streams the scene in self-contained sections; each
+    one is checked and queued for rendering as soon as it is complete, and
+    the section videos are stitched at the end. If any section is invalid or
+    fails to render, or the assembled scene is over the scene limits, it is
+    rendered in one piece instead. Section renders are cancelled and their
+    files removed however the stage ends.
+
+    Returns:
+        tuple: (script, video_path), or None if the LLM stage failed and the
+            regular pipeline should run instead
+    """
+    profile = (settings or {}).get("encoder_profile")
+    scheduler = get_render_scheduler()
+    parser = SectionParser()
+    renders = []
+    started = time.perf_counter()
+
+    def dispatch(section):
+        if None in renders:
+            # An earlier section already failed, the scene will be rendered whole
+            renders.append(None)
+            return
+        try:
+            if not section.valid:
+                raise SceneRejected(f"Section {section.index + 1} is not valid Python ({section.error})")
+            code, _ = enforce_scene_limits(section.code)
+        except SceneRejected as e:
+            logger.warning(f"{e}; the scene will be rendered whole")
+            renders.append(None)
+            return
+        cost = estimate_render_cost(code)
+        if not renders:
+            timings["first_section"] = time.perf_counter() - started
+        renders.append(scheduler.submit(
+            render_section, code, job_id, section.index,
+            timeout=get_render_timeout(cost), profile=profile, priority=priority, cost=cost
+        ))
+
+    try:
+        with job_context(job_id):
+            workflow = _new_workflow()
+            state = workflow.plan(prompt)
+            for chunk in workflow.stream_code(state):
+                for section in parser.feed(chunk):
+                    dispatch(section)
+            for section in parser.close():
+                dispatch(section)
+    except Exception as e:
+        logger.error(f"Error streaming scene code: {e}")
+        logger.error(traceback.format_exc())
+        _discard_sections(job_id, renders, len(parser.sections))
+        return None
+    if not parser.sections:
+        logger.warning("Streamed code had no sections, using the regular pipeline")
+        return None
+    timings["workflow"] = time.perf_counter() - started
+
+    try:
+        # The script is written while the sections render
+        try:
+            with job_context(job_id):
+                script = workflow.write_script(state)
+        except Exception as e:
+            logger.error(f"Error writing script: {e}")
+            script = f"Here is an explanation about {prompt}"
+        # Sections are checked one by one; the totals are checked on the whole scene
+        manim_code = _prepare_scene(job_id, prompt, parser.assemble(), script, timings)
+
+        stage_started = time.perf_counter()
+        video_path = None
+        if is_fallback_code(manim_code):
+            logger.warning(f"Streamed scene of job {job_id} is over the scene limits, discarding its sections")
+            _discard_sections(job_id, renders, len(parser.sections))
+        else:
+            section_paths = []
+            for future in renders:
+                try:
+                    section_paths.append(future.result() if future else None)
+                except Exception as e:
+                    logger.error(f"Error rendering section: {e}")
+                    section_paths.append(None)
+            if all(section_paths):
+                video_path = stitch_sections(section_paths, get_project_paths(job_id)["final_output_path"])
+        if not video_path:
+            logger.warning(f"Rendering job {job_id} as a single scene")
+            future = _submit_render(job_id, manim_code, state.get("scene_plan"), settings, priority, False, timings)
+            video_path = future.result()
+    finally:
+        _discard_sections(job_id, renders, len(parser.sections))
+    _check_render(video_path)
+    timings["sections"] = len(parser.sections)
+    timings["render"] = time.perf_counter() - stage_started
+    return script, video_path
+
+def _discard_sections(job_id, renders, count):
+    """
+    Cancel a streamed job's queued section renders and delete its section files.
+
+    Sections already rendering can't be stopped; the files are deleted once
+    the last of them finishes.
+    """
+    running = [future for future in renders if future is not None and not future.cancel()]
+    pending = [len(running)]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            pending[0] -= 1
+            last = pending[0] == 0
+        if last:
+            remove_sections(job_id, count)
+
+    if not running:
+        remove_sections(job_id, count)
+    for future in running:
+        future.add_done_callback(finished)
+
+def _prepare_scene(job_id, prompt, manim_code, script, timings):
+    """Sanitize and bound the generated scene and record it on the job."""
+    # Clamp or reject scenes that would take an absurd amount of work to render
+    with span("scene.validate", CATEGORY_COMPUTE) as current:
+        try:
+            manim_code, _ = enforce_scene_limits(sanitize_manim_code(manim_code))
+        except SceneRejected as e:
+            logger.warning(f"{e}; using fallback template")
+            manim_code = get_fallback_template(title=prompt)
+            current.set_attribute("rejected", str(e))
+    # The template answers no prompt; keep the job out of reuse
+    degraded = is_fallback_code(manim_code)
+    get_job_store().update_job(job_id, manim_code=manim_code, script=script, timings=timings, degraded=degraded)
+    return manim_code
+
+def _submit_render(job_id, manim_code, scene_plan, settings, priority, live, timings):
+    """Queue the render on the scheduler. Returns a concurrent.futures.Future."""
+    cost = estimate_render_cost(manim_code, scene_plan)
+    timings["render_estimate"] = cost
+    profile = (settings or {}).get("encoder_profile")
+    profiling = get_job_profiler(job_id) is not None
+    if get_render_backend() == "queue":
+        return _submit_queued_render(job_id, manim_code, get_render_timeout(cost), profile, live, priority, cost,
+                                     profiling)
+    return get_render_scheduler().submit(
+        create_video, manim_code, job_id=job_id, timeout=get_render_timeout(cost),
+        profile=profile, live=live, priority=priority, cost=cost, profiling=profiling
+    )
+
+def _submit_queued_render(job_id, manim_code, timeout, profile, live, priority, cost, profiling=False):
+    """Hand a render to the render workers. Returns a Future resolving to the video's local path."""
+    # Covers the wait for a worker and the render there; the worker's own spans are merged under it
+    pending = start_span("render.queued", CATEGORY_QUEUE)
+    payload = {"manim_code": manim_code, "job_id": job_id, "timeout": timeout, "profile": profile, "live": live,
+               "profiling": profiling, "trace": pending.context()}
+    try:
+        task = get_render_queue_client().submit(
+            payload, job_id=job_id, priority=priority, cost=cost, affinity=affinity_key(manim_code)
+        )
+    except Exception as e:
+        pending.record_error(e)
+        pending.end()
+        raise
+    video = Future()
+    video.set_running_or_notify_cancel()
+
+    def fetch(done):
+        try:
+            result = done.result()
+            if result.get("mock"):
+                get_job_store().update_job(job_id, degraded=True)
+            add_remote_spans(pending, result.get("spans"))
+            pending.end(worker_id=result.get("worker_id"))
+            _fetch_profiles(job_id, result.get("profiles") or [])
+            video.set_result(get_artifact_store().get(result["key"]))
+        except Exception as e:
+            pending.record_error(e)
+            pending.end()
+            video.set_exception(e)
+
+    task.add_done_callback(fetch)
+    return video
+
+def _fetch_profiles(job_id, keys):
+    """Copy the render profiles a worker put in the artifact store into the job's profile directory."""
+    directory = get_profile_dir(job_id)
+    for key in keys:
+        path = get_artifact_store().get(key)
+        if path:
+            os.makedirs(directory, exist_ok=True)
+            shutil.copyfile(path, os.path.join(directory, os.path.basename(key)))
+
+def _check_render(video_path):
+    if not video_path or not os.path.exists(video_path):
+        raise FileNotFoundError("Failed to generate video file")
+
+def _finish_job(job_id, prompt, script, video_path, settings, timings, started, audio_source=None,
+                index_prompt=True):
+    """
+    Run the post-render stages, mark the job completed and return its result.
+
+    audio_source is a voiceover of the same script to copy instead of
+    synthesizing it again; index_prompt adds the prompt to the similarity index.
+    """
+    store = get_job_store()
+    store.add_artifact(job_id, "video", video_path)
+
+    # Poster and scrubbing sprite, taken from the partial movies and keyframes
+    stage_started = time.perf_counter()
+    try:
+        with job_stage(job_id, "thumbnails"), span("publish.thumbnails", CATEGORY_COMPUTE):
+            record_thumbnails(job_id, video_path,
+                              get_job_partial_dir(job_id, (settings or {}).get("encoder_profile")))
+    except Exception as e:
+        logger.error(f"Error creating thumbnails: {e}")
+    timings["thumbnails"] = time.perf_counter() - stage_started
+
+    # Create voiceover from script
+    stage_started = time.perf_counter()
+    try:
+        if audio_source and os.path.exists(audio_source):
+            audio_path = get_audio_path(job_id)
+            with span("publish.audio", CATEGORY_IO, copied_from=audio_source):
+                os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+                shutil.copyfile(audio_source, audio_path)
+        elif voiceover_enabled():
+            with job_stage(job_id, "voiceover"):
+                audio_path = create_voiceover(script, output_path=get_audio_path(job_id))
+        else:
+            audio_path = None
+        if audio_path:
+            store.add_artifact(job_id, "audio", audio_path)
+    except Exception as e:
+        logger.error(f"Error creating voiceover: {e}")
+        logger.error(traceback.format_exc())
+        audio_path = None
+    timings["voiceover"] = time.perf_counter() - stage_started
+    timings["total"] = time.perf_counter() - started
+    _record_memory(job_id, timings)
+    _record_profile(job_id, timings)
+    degraded = store.get_job(job_id)["degraded"] or is_mock_video(video_path)
+    if degraded:
+        logger.warning(f"Job {job_id} completed with a fallback scene or mock video; it won't be reused")
+
+    with span("publish.job", CATEGORY_IO):
+        store.update_job(
+            job_id,
+            status=STATUS_COMPLETED,
+            finished_at=time.time(),
+            video_path=video_path,
+            audio_path=audio_path,
+            timings=timings,
+            degraded=degraded
+        )
+        if index_prompt and not degraded:
+            get_prompt_index().add(prompt, job_id)
+    finish_trace(job_id, status=STATUS_COMPLETED)
+    return job_result(store.get_job(job_id))
+
+def _fail_job(job_id, error, timings, started):
+    logger.error(f"Error creating animation: {error}")
+    logger.error(traceback.format_exc())
+    timings["total"] = time.perf_counter() - started
+    _record_memory(job_id, timings)
+    _record_profile(job_id, timings)
+    get_job_store().update_job(job_id, status=STATUS_FAILED, finished_at=time.time(), error=str(error), timings=timings)
+    finish_trace(job_id, error=error, status=STATUS_FAILED)
+
+def _record_memory(job_id, timings):
+    """Add the process RSS before and after the job to its timings."""
+    memory = get_job_memory().end(job_id)
+    if memory:
+        timings["memory"] = memory
+
+def _record_profile(job_id, timings):
+    """Merge a profiled job's stage profiles and record them as its artifacts."""
+    paths = finish_job_profiling(job_id)
+    for path in paths:
+        get_job_store().add_artifact(job_id, "profile", path)
+    if paths:
+        timings["profile"] = [os.path.basename(path) for path in paths]
@@ -1,15 +1,73 @@
 import os
+import ast
+import json
+import re
+import time
 import logging
 from typing import TypedDict, Optional, Dict, Any
 from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
+from ..services.llm_gateway import create_chat_model, track_usage
+from ..services import metrics
+from ..services.profiling import current_stage
+from ..services.tracing import span, start_span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+WORKFLOW_SECONDS = metrics.histogram("workflow_seconds", "LLM workflow duration by mode")
+WORKFLOW_TOKENS = metrics.counter("workflow_tokens_total", "LLM tokens used by workflow mode")
+WORKFLOW_RUNS = metrics.counter("workflow_runs_total", "LLM workflow runs by mode and outcome")
+
+# Fields the fast mode's single JSON answer must contain
+FAST_OUTPUT_FIELDS = ("plan", "scene_plan", "manim_code", "script")
+
+def get_workflow_mode():
+    """Get the workflow mode: "graph" (four LLM calls) or "fast" (one structured call)."""
+    return os.environ.get("WORKFLOW_MODE", "graph").lower()
+
+def parse_fast_output(text):
+    """
+    Parse and validate the fast mode's JSON answer.
+
+    Args:
+        text (str): Raw model output
+
+    Returns:
+        dict: plan, scene_plan, manim_code and script
+
+    Raises:
+        ValueError: If the answer doesn't match the schema or the code can't be parsed
+    """
+    # Models sometimes wrap JSON in a code fence despite being told not to
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        raise ValueError("No JSON object in output")
+    data = json.loads(match.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("Output is not a JSON object")
+
+    result = {}
+    for field in FAST_OUTPUT_FIELDS:
+        value = data.get(field)
+        if isinstance(value, (list, dict)) and field != "manim_code":
+            value = json.dumps(value, indent=2)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"Missing or empty field: {field}")
+        result[field] = value
+
+    code = result["manim_code"]
+    if "class EducationalScene" not in code or "def construct" not in code:
+        raise ValueError("manim_code doesn't define EducationalScene.construct")
+    try:
+        ast.parse(code)
+    except SyntaxError as e:
+        raise ValueError(f"manim_code has a syntax error: {e}")
+    return result
+
 # Define the state schema
 class WorkflowState(TypedDict):
     prompt: str
@@ -18,25 +76,44 @@ class WorkflowState(TypedDict):
     manim_code: Optional[str]
     script: Optional[str]
 
+def _instrumented(name, node):
+    """Wrap a sync node in a workflow.<name> trace span, profiled as a stage of a profiled job."""
+    def instrumented_node(state: WorkflowState) -> WorkflowState:
+        with span(f"workflow.{name}"), current_stage(f"workflow.{name}"):
+            return node(state)
+    return instrumented_node
+
+def _ainstrumented(name, node):
+    """
+    Wrap an async node in a workflow.<name> trace span.
+
+    Async nodes aren't profiled: the profilers follow one thread, and the
+    event loop interleaves the nodes of every job. Profiled jobs run the
+    sync graph in a thread instead (see acreate_animation).
+    """
+    async def instrumented_node(state: WorkflowState) -> WorkflowState:
+        with span(f"workflow.{name}"):
+            return await node(state)
+    return instrumented_node
+
 class AnimationWorkflow:
     """
     LangGraph workflow for educational animation generation.
     """
     
-    def __init__(self, groq_api_key=None):
+    def __init__(self, groq_api_key=None, mode=None):
         """
         Initialize the animation workflow.
         
         Args:
             groq_api_key (str, optional): Groq API key.
                 If not provided, will be taken from environment variables.
+            mode (str, optional): "graph" or "fast". Defaults to WORKFLOW_MODE.
         """
         self.groq_api_key = groq_api_key or os.environ.get("GROQ_API_KEY")
-        self.llm = ChatGroq(
-            model="llama3-70b-8192",  # Groq model format doesn't need the "groq/" prefix
-            temperature=0.7,
-            groq_api_key=self.groq_api_key  # Use groq_api_key parameter instead of api_key
-        )
+        self.mode = (mode or get_workflow_mode()).lower()
+        # Calls go through the shared gateway, which handles provider rate limits
+        self.llm = create_chat_model(temperature=0.7, api_key=self.groq_api_key)
         # Create a chain that parses the output to string
         self.output_parser = StrOutputParser()
         self.graph = self._build_graph()
@@ -52,10 +129,17 @@ class AnimationWorkflow:
         graph = StateGraph(WorkflowState)
         
         # Add nodes for each step in the animation generation process
-        graph.add_node("director", self._director_node)
-        graph.add_node("scene_planner", self._scene_planner_node)
-        graph.add_node("code_generator", self._code_generator_node)
-        graph.add_node("script_writer", self._script_writer_node)
+        # Each node has a sync and an async implementation, so the graph
+        # supports both invoke() and ainvoke(). Every node is a span of the
+        # job's trace; sync nodes are profiled when their job is (profiled
+        # jobs on the async server run the sync graph)
+        for name, node, anode in (
+            ("director", self._director_node, self._adirector_node),
+            ("scene_planner", self._scene_planner_node, self._ascene_planner_node),
+            ("code_generator", self._code_generator_node, self._acode_generator_node),
+            ("script_writer", self._script_writer_node, self._ascript_writer_node),
+        ):
+            graph.add_node(name, RunnableLambda(_instrumented(name, node), afunc=_ainstrumented(name, anode)))
         
         # Define the workflow edges
         graph.add_edge("director", "scene_planner")
@@ -69,16 +153,8 @@ class AnimationWorkflow:
         # Compile the graph
         return graph.compile()
     
-    def _director_node(self, state: WorkflowState) -> WorkflowState:
-        """
-        Director node: Understands the user's prompt and creates a high-level plan.
-        
-        Args:
-            state (WorkflowState): Current workflow state
-            
-        Returns:
-            WorkflowState: Updated workflow state
-        """
+    def _director_chain(self):
+        """Chain for the director node."""
         prompt = PromptTemplate.from_template(
             """You are a Director for educational animations.
             
@@ -96,23 +172,30 @@ class AnimationWorkflow:
         )
         
         # Use modern syntax: prompt | llm | parser
-        chain = prompt | self.llm | self.output_parser
-        plan = chain.invoke({"prompt": state["prompt"]})
-        
-        logger.info("Director has created a high-level plan")
-        
-        return {"prompt": state["prompt"], "plan": plan}
+        return prompt | self.llm | self.output_parser
     
-    def _scene_planner_node(self, state: WorkflowState) -> WorkflowState:
+    def _director_node(self, state: WorkflowState) -> WorkflowState:
         """
-        Scene planner node: Plans individual scenes for the animation.
+        Director node: Understands the user's prompt and creates a high-level plan.
         
         Args:
             state (WorkflowState): Current workflow state
             
         Returns:
-            WorkflowState: Updated workflow state with scene plan
+            WorkflowState: Updated workflow state
         """
+        plan = self._director_chain().invoke({"prompt": state["prompt"]})
+        logger.info("Director has created a high-level plan")
+        return {"prompt": state["prompt"], "plan": plan}
+    
+    async def _adirector_node(self, state: WorkflowState) -> WorkflowState:
+        """Async version of _director_node."""
+        plan = await self._director_chain().ainvoke({"prompt": state["prompt"]})
+        logger.info("Director has created a high-level plan")
+        return {"prompt": state["prompt"], "plan": plan}
+    
+    def _scene_planner_chain(self):
+        """Chain for the scene planner node."""
         prompt = PromptTemplate.from_template(
             """You are a Scene Planner for educational animations.
             
@@ -132,23 +215,30 @@ class AnimationWorkflow:
         )
         
         # Use modern syntax with proper parsing
-        chain = prompt | self.llm | self.output_parser
-        scene_plan = chain.invoke({"plan": state["plan"]})
-        
-        logger.info("Scene Planner has created a scene breakdown")
-        
-        return {**state, "scene_plan": scene_plan}
+        return prompt | self.llm | self.output_parser
     
-    def _code_generator_node(self, state: WorkflowState) -> WorkflowState:
+    def _scene_planner_node(self, state: WorkflowState) -> WorkflowState:
         """
-        Code generator node: Creates Manim code for each scene.
+        Scene planner node: Plans individual scenes for the animation.
         
         Args:
             state (WorkflowState): Current workflow state
             
         Returns:
-            WorkflowState: Updated workflow state with generated code
+            WorkflowState: Updated workflow state with scene plan
         """
+        scene_plan = self._scene_planner_chain().invoke({"plan": state["plan"]})
+        logger.info("Scene Planner has created a scene breakdown")
+        return {**state, "scene_plan": scene_plan}
+    
+    async def _ascene_planner_node(self, state: WorkflowState) -> WorkflowState:
+        """Async version of _scene_planner_node."""
+        scene_plan = await self._scene_planner_chain().ainvoke({"plan": state["plan"]})
+        logger.info("Scene Planner has created a scene breakdown")
+        return {**state, "scene_plan": scene_plan}
+    
+    def _code_generator_chain(self):
+        """Chain for the code generator node."""
         prompt = PromptTemplate.from_template(
             """You are a Manim Code Generator for educational animations.
             
@@ -166,16 +256,54 @@ class AnimationWorkflow:
         )
         
         # Use modern syntax with proper parsing
-        chain = prompt | self.llm | self.output_parser
-        manim_code = chain.invoke({
+        return prompt | self.llm | self.output_parser
+    
+    def _code_generator_node(self, state: WorkflowState) -> WorkflowState:
+        """
+        Code generator node: Creates Manim code for each scene.
+        
+        Args:
+            state (WorkflowState): Current workflow state
+            
+        Returns:
+            WorkflowState: Updated workflow state with generated code
+        """
+        manim_code = self._code_generator_chain().invoke({
+            "scene_plan": state["scene_plan"], 
+            "prompt": state["prompt"]
+        })
+        logger.info("Code Generator has created Manim code")
+        return {**state, "manim_code": manim_code}
+    
+    async def _acode_generator_node(self, state: WorkflowState) -> WorkflowState:
+        """Async version of _code_generator_node."""
+        manim_code = await self._code_generator_chain().ainvoke({
             "scene_plan": state["scene_plan"], 
             "prompt": state["prompt"]
         })
-        
         logger.info("Code Generator has created Manim code")
-        
         return {**state, "manim_code": manim_code}
     
+    def _script_writer_chain(self):
+        """Chain for the script writer node."""
+        prompt = PromptTemplate.from_template(
+            """You are a Script Writer for educational animations.
+            
+            Given the scene plan below, write a voiceover script that matches the animation timing.
+            
+            Scene plan:
+            {scene_plan}
+            
+            Original prompt:
+            {prompt}
+            
+            Write a clear, engaging script suitable for a narrator:
+            """
+        )
+        
+        # Use modern syntax with proper parsing
+        return prompt | self.llm | self.output_parser
+    
     def _script_writer_node(self, state: WorkflowState) -> WorkflowState:
         """
         Script writer node: Creates a voiceover script for the animation.
@@ -186,10 +314,79 @@ class AnimationWorkflow:
         Returns:
             WorkflowState: Updated workflow state with script
         """
+        script = self._script_writer_chain().invoke({
+            "scene_plan": state["scene_plan"], 
+            "prompt": state["prompt"]
+        })
+        logger.info("Script Writer has created a voiceover script")
+        return {**state, "script": script}
+    
+    async def _ascript_writer_node(self, state: WorkflowState) -> WorkflowState:
+        """Async version of _script_writer_node."""
+        script = await self._script_writer_chain().ainvoke({
+            "scene_plan": state["scene_plan"], 
+            "prompt": state["prompt"]
+        })
+        logger.info("Script Writer has created a voiceover script")
+        return {**state, "script": script}
+    
+    def run_batch(self, prompts, max_concurrency=None, on_code=None):
+        """
+        Run the workflow for many prompts, each stage as one LangChain batch.
+        
+        Every stage runs over all items still in the batch with at most
+        max_concurrency LLM calls in flight; an item that fails is dropped
+        from the later stages.
+        
+        Args:
+            prompts (list): User prompts
+            max_concurrency (int, optional): LLM calls in flight per stage.
+                Defaults to BATCH_LLM_CONCURRENCY.
+            on_code (callable, optional): Called with (index, state) as soon as an
+                item's code is ready, so its render can start while the rest of
+                the batch is still generating
+            
+        Returns:
+            list: Final state of each prompt, or the exception that stopped it
+        """
+        max_concurrency = max_concurrency or int(os.environ.get("BATCH_LLM_CONCURRENCY", "4"))
+        config = {"max_concurrency": max_concurrency}
+        results = [{"prompt": prompt} for prompt in prompts]
+        stages = [
+            ("plan", self._director_chain(), lambda state: {"prompt": state["prompt"]}),
+            ("scene_plan", self._scene_planner_chain(), lambda state: {"plan": state["plan"]}),
+            ("manim_code", self._code_generator_chain(),
+             lambda state: {"scene_plan": state["scene_plan"], "prompt": state["prompt"]}),
+            ("script", self._script_writer_chain(),
+             lambda state: {"scene_plan": state["scene_plan"], "prompt": state["prompt"]}),
+        ]
+        
+        started = time.perf_counter()
+        with track_usage() as usage:
+            for key, chain, make_input in stages:
+                pending = [index for index, state in enumerate(results) if isinstance(state, dict)]
+                inputs = [make_input(results[index]) for index in pending]
+                for position, output in chain.batch_as_completed(inputs, config, return_exceptions=True):
+                    index = pending[position]
+                    if isinstance(output, Exception):
+                        logger.error(f"Batch item {index} failed at {key}: {output}")
+                        results[index] = output
+                        continue
+                    results[index] = {**results[index], key: output}
+                    if key == "manim_code" and on_code:
+                        on_code(index, results[index])
+                logger.info(f"Batch stage {key} done for {len(pending)} items")
+        
+        failed = sum(isinstance(state, Exception) for state in results)
+        self._accounted("batch", started, usage, "ok" if not failed else "partial")
+        return results
+    
+    def _section_code_chain(self):
+        """Chain for streaming code generation: the scene as self-contained sections."""
         prompt = PromptTemplate.from_template(
-            """You are a Script Writer for educational animations.
+            """You are a Manim Code Generator for educational animations.
             
-            Given the scene plan below, write a voiceover script that matches the animation timing.
+            Write Manim code for the scene plan below, one section per planned scene.
             
             Scene plan:
             {scene_plan}
@@ -197,25 +394,171 @@ class AnimationWorkflow:
             Original prompt:
             {prompt}
             
-            Write a clear, engaging script suitable for a narrator:
+            Rules:
+            - Start with `from manim import *`, then `class EducationalScene(Scene):` and `def construct(self):`
+            - Begin each section with a comment line `# SECTION <number>: <scene title>`
+            - Each section must be self-contained: it creates every object it uses, never refers
+              to variables from other sections, and ends with `self.play(FadeOut(*self.mobjects))`
+            - Output only Python code, no markdown and no explanations
             """
         )
+        llm = create_chat_model(temperature=0.2, api_key=self.groq_api_key, streaming=True)
+        return prompt | llm | self.output_parser
+    
+    def plan(self, prompt: str) -> Dict[str, Any]:
+        """
+        Run the director and scene planner only.
         
-        # Use modern syntax with proper parsing
-        chain = prompt | self.llm | self.output_parser
-        script = chain.invoke({
-            "scene_plan": state["scene_plan"], 
-            "prompt": state["prompt"]
-        })
+        Returns:
+            dict: Workflow state with plan and scene_plan
+        """
+        state = _instrumented("director", self._director_node)({"prompt": prompt})
+        return _instrumented("scene_planner", self._scene_planner_node)(state)
+    
+    def stream_code(self, state: Dict[str, Any]):
+        """
+        Stream the scene code for a planned state, in marked sections.
         
-        logger.info("Script Writer has created a voiceover script")
+        Args:
+            state (dict): Workflow state from plan()
+            
+        Yields:
+            str: Code text as the LLM produces it
+        """
+        # Not made current: the caller dispatches section renders between chunks
+        current = start_span("workflow.code_generator")
+        try:
+            yield from self._section_code_chain().stream({
+                "scene_plan": state["scene_plan"],
+                "prompt": state["prompt"]
+            })
+        except BaseException as e:
+            current.record_error(e)
+            raise
+        finally:
+            current.end()
+    
+    def write_script(self, state: Dict[str, Any]) -> str:
+        """Run the script writer alone for a planned state."""
+        return _instrumented("script_writer", self._script_writer_node)(state)["script"]
+    
+    def _edit_chain(self):
+        """Chain for editing an existing scene with a follow-up instruction."""
+        prompt = PromptTemplate.from_template(
+            """You are a Manim Code Editor for educational animations.
+            
+            Change the scene below as the instruction asks.
+            
+            Instruction:
+            {instruction}
+            
+            Scene:
+            {manim_code}
+            
+            Rules:
+            - Change only what the instruction needs; keep every other line exactly as it is,
+              in the same order, so the unchanged animations can be reused
+            - Keep `class EducationalScene(Scene)` and `def construct(self)`
+            - Output only the complete Python code, no markdown and no explanations
+            """
+        )
+        llm = create_chat_model(temperature=0.0, api_key=self.groq_api_key)
+        return prompt | llm | self.output_parser
+    
+    def edit_code(self, manim_code: str, instruction: str) -> str:
+        """
+        Apply a follow-up instruction to a rendered scene.
         
-        return {**state, "script": script}
+        Args:
+            manim_code (str): The scene as it was rendered
+            instruction (str): What to change, e.g. "make the circle blue"
+            
+        Returns:
+            str: The edited scene code
+        """
+        with span("workflow.edit"):
+            edited = self._edit_chain().invoke({"manim_code": manim_code, "instruction": instruction})
+        logger.info("Code Editor has applied the instruction")
+        return edited
+    
+    def _fast_chain(self):
+        """Chain for the fast mode: everything in one structured call."""
+        prompt = PromptTemplate.from_template(
+            """You are a team creating an educational animation: director, scene planner,
+            Manim programmer and script writer.
+            
+            User prompt: {prompt}
+            
+            Answer with a single JSON object and nothing else, with these string fields:
+            - "plan": title, key concepts, visual style and educational objectives, briefly
+            - "scene_plan": 3-5 scenes, each with its duration in seconds, visual elements and transitions
+            - "manim_code": complete Python code starting with `from manim import *` and defining
+              `class EducationalScene(Scene)` with all animation inside `def construct(self)`
+            - "script": a narrator voiceover script matching the scene timings
+            """
+        )
+        llm = create_chat_model(temperature=0.4, api_key=self.groq_api_key, json_mode=True)
+        return prompt | llm | self.output_parser
+    
+    def _accounted(self, mode, started, usage, outcome):
+        """Record latency and token metrics for one workflow run."""
+        seconds = time.perf_counter() - started
+        WORKFLOW_SECONDS.observe(seconds, mode=mode)
+        WORKFLOW_RUNS.inc(mode=mode, outcome=outcome)
+        WORKFLOW_TOKENS.inc(usage["input_tokens"], mode=mode, kind="input")
+        WORKFLOW_TOKENS.inc(usage["output_tokens"], mode=mode, kind="output")
+        logger.info(
+            f"{mode} workflow {outcome} in {seconds:.1f}s: {usage['calls']} calls, "
+            f"{usage['input_tokens']} input and {usage['output_tokens']} output tokens"
+        )
+        return {"mode": mode, "seconds": seconds, **usage}
+    
+    def _run_fast(self, prompt):
+        """Run the fast mode, returning None if the call fails or its answer is unusable."""
+        started = time.perf_counter()
+        with track_usage() as usage, span("workflow.fast") as fast_span, current_stage("workflow.fast"):
+            try:
+                output = self._fast_chain().invoke({"prompt": prompt})
+            except Exception as e:
+                # e.g. the provider rejecting the JSON-mode answer, or a timeout
+                fast_span.record_error(e)
+                logger.warning(f"Fast workflow call failed: {e}")
+                self._accounted("fast", started, usage, "invalid")
+                return None
+        try:
+            result = parse_fast_output(output)
+        except ValueError as e:
+            logger.warning(f"Fast workflow output rejected: {e}")
+            self._accounted("fast", started, usage, "invalid")
+            return None
+        return {"prompt": prompt, **result, "workflow": self._accounted("fast", started, usage, "ok")}
+    
+    async def _arun_fast(self, prompt):
+        """Async version of _run_fast."""
+        started = time.perf_counter()
+        with track_usage() as usage, span("workflow.fast") as fast_span:
+            try:
+                output = await self._fast_chain().ainvoke({"prompt": prompt})
+            except Exception as e:
+                fast_span.record_error(e)
+                logger.warning(f"Fast workflow call failed: {e}")
+                self._accounted("fast", started, usage, "invalid")
+                return None
+        try:
+            result = parse_fast_output(output)
+        except ValueError as e:
+            logger.warning(f"Fast workflow output rejected: {e}")
+            self._accounted("fast", started, usage, "invalid")
+            return None
+        return {"prompt": prompt, **result, "workflow": self._accounted("fast", started, usage, "ok")}
     
     def run(self, prompt: str) -> Dict[str, Any]:
         """
         Run the workflow with a user prompt.
         
+        In fast mode a single structured call is tried first, falling back
+        to the multi-node graph if it fails or its answer doesn't validate.
+        
         Args:
             prompt (str): User prompt for animation generation
             
@@ -224,11 +567,44 @@ class AnimationWorkflow:
         """
         logger.info(f"Starting animation workflow for prompt: {prompt}")
         
+        if self.mode == "fast":
+            result = self._run_fast(prompt)
+            if result is not None:
+                return result
+        
         # Initialize the workflow state
         initial_state: WorkflowState = {"prompt": prompt}
         
         # Execute the workflow
-        result = self.graph.invoke(initial_state)
+        started = time.perf_counter()
+        with track_usage() as usage:
+            result = self.graph.invoke(initial_state)
+        result["workflow"] = self._accounted("graph", started, usage, "ok")
+        
+        logger.info("Animation workflow completed successfully")
+        return result
+    
+    async def arun(self, prompt: str) -> Dict[str, Any]:
+        """
+        Run the workflow without blocking the event loop while waiting on the LLM.
         
+        Args:
+            prompt (str): User prompt for animation generation
+            
+        Returns:
+            dict: Final workflow state with all generated content
+        """
+        logger.info(f"Starting async animation workflow for prompt: {prompt}")
+        
+        if self.mode == "fast":
+            result = await self._arun_fast(prompt)
+            if result is not None:
+                return result
+        
+        initial_state: WorkflowState = {"prompt": prompt}
+        started = time.perf_counter()
+        with track_usage() as usage:
+            result = await self.graph.ainvoke(initial_state)
+        result["workflow"] = self._accounted("graph", started, usage, "ok")
         logger.info("Animation workflow completed successfully")
-        return result
\ No newline at end of file
+        return result
@@ -0,0 +1,119 @@
+import hmac
+import ipaddress
+import os
+from flask import Blueprint, jsonify, request
+from ..services.storage_service import get_storage_manager, CATEGORIES
+from ..services.render_queue import get_render_queue
+from ..services.memory_accounting import get_allocation_tracer, memory_report
+from ..services.profiling import get_profiling_switch
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+def is_admin_caller(token, client):
+    """
+    Check whether a caller may use admin operations.
+
+    With ADMIN_TOKEN configured the caller must send it as X-Admin-Token.
+    Without one, only callers on this host are allowed.
+
+    Args:
+        token (str): X-Admin-Token header value, or None
+        client (str): Client address, as used for rate limiting
+    """
+    expected = os.environ.get("ADMIN_TOKEN")
+    if expected:
+        return token is not None and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+    try:
+        return ipaddress.ip_address(client or "").is_loopback
+    except ValueError:
+        return False
+
+def is_admin_request():
+    """Check whether the current request may use admin operations, see is_admin_caller."""
+    client = request.remote_addr
+    if os.environ.get("TRUST_PROXY_HEADERS", "false").lower() in ["true", "1", "yes"] and request.access_route:
+        # Behind a local proxy every request comes from loopback
+        client = request.access_route[0]
+    return is_admin_caller(request.headers.get("X-Admin-Token"), client)
+
+@bp.before_request
+def require_admin_token():
+    """Require the X-Admin-Token header, or a local caller when ADMIN_TOKEN isn't configured."""
+    if not is_admin_request():
+        return jsonify({"error": "Unauthorized"}), 401
+
+@bp.route('/storage', methods=['GET'])
+def storage_usage():
+    """Disk usage by storage category."""
+    return jsonify(get_storage_manager().usage()), 200
+
+@bp.route('/storage/compact', methods=['POST'])
+def compact_storage():
+    """Run a compaction pass, over all categories unless `categories` (a list of names) is given."""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    known = [category["name"] for category in CATEGORIES]
+    categories = data.get('categories', known)
+    if (not isinstance(categories, list) or not categories
+            or not all(isinstance(name, str) and name in known for name in categories)):
+        return jsonify({"error": f"categories must be a non-empty list of: {', '.join(known)}"}), 400
+    evicted = get_storage_manager().compact(categories)
+    return jsonify({"evicted": evicted}), 200
+
+@bp.route('/render-queue', methods=['GET'])
+def render_queue_status():
+    """Render queue tasks by status and the workers holding leases."""
+    return jsonify(get_render_queue().stats()), 200
+
+@bp.route('/memory', methods=['GET'])
+def memory_status():
+    """RSS, garbage collector state and allocation tracing status of this process."""
+    return jsonify(memory_report()), 200
+
+@bp.route('/memory/tracemalloc', methods=['POST'])
+def toggle_tracemalloc():
+    """Start or stop allocation tracing: `{"action": "start", "frames": 10}` or `{"action": "stop"}`."""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action == 'start':
+        get_allocation_tracer().start(data.get('frames'))
+    elif action == 'stop':
+        get_allocation_tracer().stop()
+    else:
+        return jsonify({"error": "action must be start or stop"}), 400
+    return jsonify(get_allocation_tracer().status()), 200
+
+@bp.route('/memory/snapshot', methods=['POST'])
+def memory_snapshot():
+    """Largest allocations, and what grew since the last snapshot. Needs tracing to be started."""
+    data = request.get_json(silent=True) or {}
+    try:
+        snapshot = get_allocation_tracer().snapshot(
+            limit=int(data.get('limit', 20)), key_type=data.get('key_type', 'lineno')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(snapshot), 200
+
+@bp.route('/profiling', methods=['GET'])
+def profiling_status():
+    """Whether upcoming jobs of this process are profiled."""
+    return jsonify(get_profiling_switch().status()), 200
+
+@bp.route('/profiling', methods=['POST'])
+def toggle_profiling():
+    """Profile upcoming jobs: `{"enabled": true, "jobs": 5}` (every job if `jobs` is left out) or `{"enabled": false}`."""
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled'):
+        jobs = data.get('jobs')
+        if jobs is not None and (not isinstance(jobs, int) or jobs < 1):
+            return jsonify({"error": "jobs must be a positive integer"}), 400
+        get_profiling_switch().enable(jobs)
+    else:
+        get_profiling_switch().disable()
+    return jsonify(get_profiling_switch().status()), 200
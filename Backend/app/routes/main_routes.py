@@ -1,5 +1,21 @@
-from flask import Blueprint, jsonify, request, redirect, url_for
-from ..controllers.animation_controller import create_animation
+import os
+from flask import Blueprint, Response, jsonify, request, redirect, url_for, send_from_directory
+from ..controllers.animation_controller import (
+    create_animation, start_animation, ensure_thumbnails, start_batch, get_batch_manifest, get_batch_max_items,
+    edit_animation
+)
+from ..services.job_store import get_job_store, STATUS_COMPLETED
+from ..services import metrics
+from ..services.admission import AdmissionRejected, get_admission_controller
+from ..services.render_scheduler import CLASS_OFFSETS
+from ..services.render_queue import get_render_backend
+from ..services.encoder_profiles import PROFILES
+from ..services.packaging_service import get_hls_dir, CONTENT_TYPES, MASTER_PLAYLIST
+from ..services.live_publisher import get_live_dir, live_streaming_enabled
+from ..services.thumbnail_service import get_thumbnail_dir, POSTER, SPRITE, SPRITE_VTT
+from ..services.profiling import get_profile_dir, is_profile_file, profiling_requested, PROFILE_HEADER
+from ..services.tracing import get_trace, summarize
+from .admin_routes import is_admin_request
 
 bp = Blueprint('main', __name__, url_prefix='/api')
 
@@ -13,17 +29,289 @@ def health_check():
     """Health check endpoint."""
     return jsonify({"status": "ok", "message": "Server is running"}), 200
 
+def get_client_id():
+    """Identify the client for rate limiting."""
+    if os.environ.get("TRUST_PROXY_HEADERS", "false").lower() in ["true", "1", "yes"] and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr
+
+def wants_profiling():
+    """
+    Check whether the request asks for its job to be profiled (X-Profile: 1).
+
+    Raises:
+        PermissionError: If it does without the admin token
+    """
+    if not profiling_requested(request.headers.get(PROFILE_HEADER)):
+        return False
+    if not is_admin_request():
+        raise PermissionError("Profiling requires the X-Admin-Token header")
+    return True
+
+def too_many_requests(error):
+    """Build a 429 response with a Retry-After header."""
+    response = jsonify({"error": str(error), "reason": error.reason, "retry_after": error.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in the Prometheus text format."""
+    return Response(metrics.render_latest(), mimetype='text/plain; version=0.0.4')
+
+def parse_generate_request(data):
+    """
+    Validate a generate request body.
+
+    Args:
+        data (dict): JSON request body
+
+    Returns:
+        dict: prompt, settings, reuse, reuse_mode, priority, hls and stream
+
+    Raises:
+        ValueError: If the request is invalid
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    prompt = data.get('prompt')
+    if not prompt:
+        raise ValueError("No prompt provided")
+    if not isinstance(prompt, str):
+        raise ValueError("Prompt must be a string")
+    if data.get('priority', 'standard') not in CLASS_OFFSETS:
+        raise ValueError(f"Unknown priority: {data.get('priority')}")
+    # Queue workers render away from the API and don't publish live playlists
+    queued = get_render_backend() == "queue"
+    stream = data.get('stream', live_streaming_enabled() and not queued)
+    if stream and queued:
+        raise ValueError("Live streaming is not available with RENDER_BACKEND=queue")
+    return {
+        "prompt": prompt,
+        "settings": parse_settings(data),
+        # Unless forced, an identical or near-duplicate earlier prompt is answered from the job store
+        "reuse": not data.get('force', False),
+        "reuse_mode": data.get('reuse_mode'),
+        "priority": data.get('priority', 'standard'),
+        "hls": data.get('hls'),
+        "stream": stream,
+    }
+
+def parse_settings(data):
+    """Get the settings that change the output, which are part of the reuse key."""
+    settings = {}
+    if data.get('encoder_profile'):
+        if not isinstance(data['encoder_profile'], str) or data['encoder_profile'] not in PROFILES:
+            raise ValueError(f"Unknown encoder profile: {data['encoder_profile']}")
+        settings['encoder_profile'] = data['encoder_profile']
+    return settings or None
+
+def parse_batch_request(data):
+    """
+    Validate a batch generate request body.
+
+    Returns:
+        dict: prompts, settings, reuse and priority
+
+    Raises:
+        ValueError: If the request is invalid
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    prompts = data.get('prompts')
+    if not isinstance(prompts, list) or not prompts:
+        raise ValueError("No prompts provided")
+    if not all(isinstance(prompt, str) and prompt.strip() for prompt in prompts):
+        raise ValueError("Every prompt must be a non-empty string")
+    if len(prompts) > get_batch_max_items():
+        raise ValueError(f"Too many prompts: {len(prompts)} (limit {get_batch_max_items()})")
+    if data.get('priority', 'batch') not in CLASS_OFFSETS:
+        raise ValueError(f"Unknown priority: {data.get('priority')}")
+    return {
+        "prompts": prompts,
+        "settings": parse_settings(data),
+        "reuse": not data.get('force', False),
+        "priority": data.get('priority', 'batch'),
+    }
+
 @bp.route('/generate', methods=['POST'])
 def generate_animation():
     """Generate an educational animation from a prompt."""
-    data = request.json
-    prompt = data.get('prompt')
-    if not prompt:
-        return jsonify({"error": "No prompt provided"}), 400
+    try:
+        params = parse_generate_request(request.json)
+        params["profiling"] = wants_profiling()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
     
     try:
-        # This will be implemented later in the animation controller
-        result = create_animation(prompt)
+        get_admission_controller().check_rate(get_client_id())
+        if params.pop('stream'):
+            # Answer at once; the video is published to `live_url` as it renders
+            params.pop('hls')
+            result = start_animation(**params)
+            return jsonify(result), 202 if result.get("live_url") else 200
+        result = create_animation(**params)
         return jsonify(result), 200
+    except AdmissionRejected as e:
+        return too_many_requests(e)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Queue many prompts at once. Progress is reported by the batch manifest."""
+    try:
+        params = parse_batch_request(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        get_admission_controller().check_rate(get_client_id())
+        return jsonify(start_batch(**params)), 202
+    except AdmissionRejected as e:
+        return too_many_requests(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def parse_edit_request(data):
+    """
+    Validate the JSON body of an edit request.
+
+    Raises:
+        ValueError: If the body is invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    edits = {key: data[key] for key in ('code', 'patch', 'instruction') if data.get(key) is not None}
+    if len(edits) != 1:
+        raise ValueError("Give exactly one of code, patch or instruction")
+    if not all(isinstance(value, str) and value.strip() for value in edits.values()):
+        raise ValueError("The edit must be a non-empty string")
+    priority = data.get('priority', 'interactive')
+    if priority not in CLASS_OFFSETS:
+        raise ValueError(f"Unknown priority: {priority}")
+    return {**edits, "priority": priority}
+
+@bp.route('/jobs/<job_id>/edit', methods=['POST'])
+def edit_job(job_id):
+    """Edit a completed animation; only the animations that changed are re-rendered."""
+    try:
+        params = parse_edit_request(request.get_json(silent=True))
+        params["profiling"] = wants_profiling()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
+
+    try:
+        get_admission_controller().check_rate(get_client_id())
+        return jsonify(edit_animation(job_id, **params)), 200
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except AdmissionRejected as e:
+        return too_many_requests(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Get a batch manifest: per-item status and aggregate throughput."""
+    manifest = get_batch_manifest(batch_id)
+    if not manifest:
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify(manifest), 200
+
+@bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List jobs newest first. Supports `limit`, `cursor` and `status` query parameters."""
+    try:
+        jobs, next_cursor = get_job_store().list_jobs(
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for job in jobs:
+        # Posters missing for older jobs are created on first request
+        job["poster_url"] = f"/api/jobs/{job['id']}/thumbnails/{POSTER}" if job["status"] == STATUS_COMPLETED else None
+    return jsonify({"jobs": jobs, "next_cursor": next_cursor}), 200
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a single job with its artifacts."""
+    store = get_job_store()
+    job = store.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    job["artifacts"] = store.list_artifacts(job_id)
+    return jsonify(job), 200
+
+def send_package_file(directory, job_id, filename, max_age):
+    """Serve a playlist or segment from a job's packaging directory."""
+    extension = os.path.splitext(filename)[1]
+    if extension not in CONTENT_TYPES:
+        return jsonify({"error": "Not found"}), 404
+    if not get_job_store().get_job(job_id) or not os.path.isdir(directory):
+        return jsonify({"error": "No playlist for this job"}), 404
+    return send_from_directory(directory, filename, mimetype=CONTENT_TYPES[extension], max_age=max_age)
+
+@bp.route('/jobs/<job_id>/hls/<path:filename>', methods=['GET'])
+def get_job_hls(job_id, filename):
+    """Serve a job's HLS playlists and segments."""
+    if filename == MASTER_PLAYLIST:
+        # Count plays of the master playlist as use for storage eviction
+        get_job_store().touch_artifacts(job_id)
+    # VOD packages never change once written, so players and CDNs can cache them
+    return send_package_file(get_hls_dir(job_id), job_id, filename, max_age=86400)
+
+@bp.route('/jobs/<job_id>/live/<path:filename>', methods=['GET'])
+def get_job_live(job_id, filename):
+    """Serve a job's live playlist and the segments published so far."""
+    # The playlist grows while the job renders; segments never change
+    max_age = 0 if filename.endswith(".m3u8") else 86400
+    return send_package_file(get_live_dir(job_id), job_id, filename, max_age=max_age)
+
+@bp.route('/jobs/<job_id>/thumbnails/<filename>', methods=['GET'])
+def get_job_thumbnail(job_id, filename):
+    """Serve a job's poster frame (poster.jpg), sprite sheet (sprite.jpg) or its index (sprite.vtt)."""
+    thumbnail_dir = get_thumbnail_dir(job_id)
+    if filename in (POSTER, SPRITE, SPRITE_VTT) and not os.path.exists(os.path.join(thumbnail_dir, filename)):
+        ensure_thumbnails(job_id)
+    return send_package_file(thumbnail_dir, job_id, filename, max_age=86400)
+
+@bp.route('/jobs/<job_id>/profile/<filename>', methods=['GET'])
+def get_job_profile(job_id, filename):
+    """Serve a profiled job's cProfile stats (.prof) or collapsed stacks (.collapsed). Needs the admin token."""
+    if not is_admin_request():
+        return jsonify({"error": "Unauthorized"}), 401
+    directory = get_profile_dir(job_id)
+    if not is_profile_file(filename) or not os.path.exists(os.path.join(directory, filename)):
+        return jsonify({"error": "No such profile for this job"}), 404
+    mimetype = "text/plain" if filename.endswith(".collapsed") else "application/octet-stream"
+    return send_from_directory(directory, filename, mimetype=mimetype, as_attachment=True)
+
+@bp.route('/jobs/<job_id>/trace', methods=['GET'])
+def get_job_trace(job_id):
+    """
+    Get a job's span tree as OTLP/JSON, live while the job runs.
+
+    `?view=summary` gives the time per category and the slowest spans instead.
+    """
+    if not get_job_store().get_job(job_id):
+        return jsonify({"error": "Job not found"}), 404
+    trace = get_trace(job_id)
+    if trace is None:
+        return jsonify({"error": "No trace for this job"}), 404
+    if request.args.get('view') == 'summary':
+        return jsonify(summarize(trace)), 200
+    return jsonify(trace), 200
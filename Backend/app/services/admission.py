@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from . import metrics
+from .rate_limit import KeyedRateLimiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = metrics.histogram("admission_queue_wait_seconds", "Time spent waiting for a job or render slot")
+REJECTED = metrics.counter("admission_rejected_total", "Requests rejected by admission control")
+ACTIVE = metrics.gauge("admission_active", "Admitted jobs currently running")
+WAITING = metrics.gauge("admission_waiting", "Jobs waiting in the admission queue")
+RENDERS_ACTIVE = metrics.gauge("renders_active", "Renders currently running")
+
+# Longest Retry-After sent, e.g. when a client rate of 0 means its bucket never refills
+MAX_RETRY_AFTER_SECONDS = 3600
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted; maps to HTTP 429."""
+
+    def __init__(self, reason, retry_after):
+        retry_after = min(retry_after, MAX_RETRY_AFTER_SECONDS)
+        super().__init__(f"Server is busy ({reason}), retry after {int(retry_after)}s")
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+def get_available_memory():
+    """
+    Get the memory available for new work, in bytes.
+
+    Returns:
+        int: Available bytes, or None if it can't be determined
+    """
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def get_render_memory_bytes():
+    """Get the memory budgeted for one render."""
+    return int(float(os.environ.get("RENDER_MEMORY_MB", "1024")) * 1024 * 1024)
+
+def compute_render_limit():
+    """
+    Get the maximum number of concurrent renders for this host.
+
+    Uses MAX_CONCURRENT_RENDERS if set, otherwise one render per
+    RENDER_CPUS_PER_JOB cores, capped by available memory.
+    """
+    configured = os.environ.get("MAX_CONCURRENT_RENDERS")
+    if configured:
+        return max(1, int(configured))
+
+    cpus_per_render = max(1, int(os.environ.get("RENDER_CPUS_PER_JOB", "1")))
+    limit = max(1, (os.cpu_count() or 1) // cpus_per_render)
+    available = get_available_memory()
+    if available is not None:
+        limit = min(limit, max(1, available // get_render_memory_bytes()))
+    return limit
+
+class AdmissionController:
+    """
+    Bounded admission for generation jobs.
+
+    Limits the number of jobs running at once, queues a bounded number of
+    extra jobs, rejects the rest with a Retry-After estimate, and gates
+    renders on CPU and memory headroom.
+    """
+
+    def __init__(self, max_active=None, queue_depth=None, queue_timeout=None,
+                 client_rate_per_minute=None, client_burst=None, render_limit=None):
+        """
+        Initialize admission control. Unset arguments come from the environment.
+
+        Args:
+            max_active (int, optional): Jobs allowed to run at once (ADMISSION_MAX_ACTIVE)
+            queue_depth (int, optional): Jobs allowed to wait for a slot (ADMISSION_QUEUE_DEPTH)
+            queue_timeout (float, optional): Seconds a job may wait before being rejected
+                (ADMISSION_QUEUE_TIMEOUT)
+            client_rate_per_minute (float, optional): Sustained requests per client per minute
+                (CLIENT_RATE_PER_MINUTE); 0 turns the limit off
+            client_burst (float, optional): Requests a client may burst (CLIENT_BURST)
+            render_limit (int, optional): Concurrent renders. Defaults to compute_render_limit().
+        """
+        self.render_limit = render_limit or compute_render_limit()
+        self.max_active = max_active if max_active is not None else int(
+            os.environ.get("ADMISSION_MAX_ACTIVE", self.render_limit * 4))
+        self.queue_depth = queue_depth if queue_depth is not None else int(os.environ.get("ADMISSION_QUEUE_DEPTH", "16"))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(
+            os.environ.get("ADMISSION_QUEUE_TIMEOUT", "120"))
+        rate = client_rate_per_minute if client_rate_per_minute is not None else float(
+            os.environ.get("CLIENT_RATE_PER_MINUTE", "10"))
+        burst = client_burst if client_burst is not None else float(os.environ.get("CLIENT_BURST", "5"))
+        # A rate of 0 turns the per-client limit off
+        self.client_limiter = KeyedRateLimiter(rate / 60.0, burst) if rate > 0 else None
+
+        self._active = 0
+        self._waiting = 0
+        self._renders = 0
+        self._avg_job_seconds = 30.0
+        self._cond = threading.Condition()
+
+    def _estimate_retry_after(self):
+        """Estimate how long until a slot frees up, from the average job duration."""
+        backlog = self._waiting + 1
+        return self._avg_job_seconds * backlog / max(1, self.max_active)
+
+    def check_rate(self, client_id):
+        """
+        Apply the per-client rate limit.
+
+        Raises:
+            AdmissionRejected: If the client is over its rate limit
+        """
+        if self.client_limiter is None:
+            return
+        wait = self.client_limiter.try_acquire(client_id or "anonymous")
+        if wait > 0:
+            REJECTED.inc(reason="rate_limit")
+            raise AdmissionRejected("rate limit", wait)
+
+    def _enter_queue(self):
+        """Take a place in the wait queue, or reject if it is full. Call with the lock held."""
+        if self._waiting >= self.queue_depth:
+            REJECTED.inc(reason="queue_full")
+            raise AdmissionRejected("queue full", self._estimate_retry_after())
+        self._waiting += 1
+        WAITING.set(self._waiting)
+
+    def _leave_queue(self):
+        """Give up a place in the wait queue. Call with the lock held."""
+        self._waiting -= 1
+        WAITING.set(self._waiting)
+
+    def _start_job(self):
+        """Take a job slot. Call with the lock held."""
+        self._active += 1
+        ACTIVE.set(self._active)
+
+    def _end_job(self, job_started):
+        """Release a job slot and update the duration estimate."""
+        with self._cond:
+            self._active -= 1
+            ACTIVE.set(self._active)
+            # Exponentially weighted average of job duration for Retry-After estimates
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - job_started)
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self):
+        """
+        Hold a job slot for the duration of the block, queueing if needed.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        started = time.monotonic()
+        with self._cond:
+            if self._active >= self.max_active:
+                self._enter_queue()
+                try:
+                    deadline = started + self.queue_timeout
+                    while self._active >= self.max_active:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            REJECTED.inc(reason="queue_timeout")
+                            raise AdmissionRejected("queue timeout", self._estimate_retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self._leave_queue()
+            self._start_job()
+        QUEUE_WAIT.observe(time.monotonic() - started, stage="job")
+
+        job_started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._end_job(job_started)
+
+    @asynccontextmanager
+    async def async_admit(self, poll_interval=0.1):
+        """
+        Async version of admit for the event loop.
+
+        Queued coroutines poll for a free slot instead of blocking a thread.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        queued = False
+        try:
+            while True:
+                with self._cond:
+                    if self._active < self.max_active:
+                        self._start_job()
+                        break
+                    if not queued:
+                        self._enter_queue()
+                        queued = True
+                    if time.monotonic() >= deadline:
+                        REJECTED.inc(reason="queue_timeout")
+                        raise AdmissionRejected("queue timeout", self._estimate_retry_after())
+                await asyncio.sleep(poll_interval)
+        finally:
+            if queued:
+                with self._cond:
+                    self._leave_queue()
+        QUEUE_WAIT.observe(time.monotonic() - started, stage="job")
+
+        job_started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._end_job(job_started)
+
+    def _render_allowed(self):
+        """Check whether another render fits in the CPU and memory budget."""
+        if self._renders >= self.render_limit:
+            return False
+        if self._renders == 0:
+            # Always let one render through so the system keeps making progress
+            return True
+        available = get_available_memory()
+        return available is None or available >= get_render_memory_bytes()
+
+    @contextmanager
+    def render_slot(self):
+        """Hold a render slot for the duration of the block, waiting for headroom."""
+        started = time.monotonic()
+        with self._cond:
+            while not self._render_allowed():
+                # Poll periodically since memory can free up without a notification
+                self._cond.wait(1.0)
+            self._renders += 1
+            RENDERS_ACTIVE.set(self._renders)
+        QUEUE_WAIT.observe(time.monotonic() - started, stage="render")
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._renders -= 1
+                RENDERS_ACTIVE.set(self._renders)
+                self._cond.notify_all()
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission_controller():
+    """Get the shared admission controller."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+                logger.info(
+                    f"Admission control: {_controller.max_active} active jobs, queue depth "
+                    f"{_controller.queue_depth}, {_controller.render_limit} concurrent renders"
+                )
+    return _controller
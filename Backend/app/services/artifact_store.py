@@ -0,0 +1,90 @@
+import logging
+import os
+import shutil
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ArtifactStore:
+    """
+    Where render workers put finished files for the API to serve.
+
+    Keys are relative paths such as "videos/<job_id>/EducationalScene.mp4".
+    Implementations for shared or object storage provide put() and get().
+    """
+
+    def put(self, local_path, key):
+        """
+        Store a file.
+
+        Args:
+            local_path (str): File written by the worker
+            key (str): Relative artifact key
+
+        Returns:
+            str: The artifact key
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """
+        Get a stored file as a local path, fetching it if needed.
+
+        Returns:
+            str: Local path, or None if there is no such artifact
+        """
+        raise NotImplementedError
+
+class LocalArtifactStore(ArtifactStore):
+    """
+    Artifact store in a local or network-mounted directory.
+
+    With the default root (animation/output) a worker on the API host
+    writes straight into place and put() is a no-op.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Artifact key escapes the store: {key}")
+        return path
+
+    def put(self, local_path, key):
+        target = self._path(key)
+        if os.path.abspath(local_path) == target:
+            return key
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Copy next to the target and rename, so readers never see a partial file
+        temp_path = f"{target}.part"
+        shutil.copyfile(local_path, temp_path)
+        os.replace(temp_path, target)
+        logger.info(f"Stored artifact {key}")
+        return key
+
+    def get(self, key):
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_artifact_store():
+    """
+    Get the artifact store.
+
+    ARTIFACT_STORE_DIR sets the directory of the local store; it defaults to
+    animation/output, which is where the API serves files from.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+                default_root = os.path.join(project_root, "animation", "output")
+                _store = LocalArtifactStore(os.environ.get("ARTIFACT_STORE_DIR", default_root))
+    return _store
@@ -0,0 +1,124 @@
+import logging
+import os
+import shutil
+
+from .render_limits import run_with_timeout
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Named encoding profiles. `quality` is Manim's --quality flag, `quality_dir`
+# the directory Manim renders into for it, and `ffmpeg_args` the output
+# options used when re-encoding (None keeps Manim's own encode as is).
+#
+# Our scenes are mostly flat colours and text: x264's animation tuning plus a
+# long GOP lets static frames cost almost nothing.
+PROFILES = {
+    "fast-preview": {
+        "description": "480p15, fastest encode, for quick previews",
+        "quality": "l",
+        "manim_quality": "low_quality",
+        "quality_dir": "480p15",
+        "ffmpeg_args": [
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "30",
+            "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart",
+        ],
+    },
+    "delivery": {
+        "description": "1080p60 tuned for flat-colour animation and streaming",
+        "quality": "h",
+        "manim_quality": "high_quality",
+        "quality_dir": "1080p60",
+        "ffmpeg_args": [
+            "-c:v", "libx264", "-preset", "medium", "-tune", "animation", "-crf", "24",
+            "-g", "240", "-keyint_min", "60", "-bf", "3",
+            "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart",
+        ],
+    },
+    "archive": {
+        "description": "1080p60 near-lossless for long-term storage",
+        "quality": "h",
+        "manim_quality": "high_quality",
+        "quality_dir": "1080p60",
+        "ffmpeg_args": [
+            "-c:v", "libx264", "-preset", "slow", "-tune", "animation", "-crf", "16",
+            "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "192k", "-movflags", "+faststart",
+        ],
+    },
+    "passthrough": {
+        "description": "1080p60 exactly as Manim encoded it",
+        "quality": "h",
+        "manim_quality": "high_quality",
+        "quality_dir": "1080p60",
+        "ffmpeg_args": None,
+    },
+}
+
+def get_default_profile_name():
+    """
+    Get the profile used when a job doesn't ask for one.
+
+    Defaults to passthrough: every other profile encodes Manim's output a
+    second time, which costs CPU and quality on every job, so that is left
+    to jobs (or deployments) that ask for it.
+    """
+    return os.environ.get("ENCODER_PROFILE", "passthrough")
+
+def get_profile(name=None):
+    """
+    Get an encoder profile by name.
+
+    Args:
+        name (str, optional): Profile name. Defaults to ENCODER_PROFILE.
+
+    Returns:
+        dict: The profile, with its name under "name"
+
+    Raises:
+        ValueError: If the profile doesn't exist
+    """
+    name = name or get_default_profile_name()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoder profile: {name}")
+    return {"name": name, **PROFILES[name]}
+
+def encode_with_profile(src, dst, profile, timeout=None):
+    """
+    Encode a video with a profile's settings.
+
+    Writes to a temporary file next to dst and moves it into place, so a
+    failed encode never leaves a truncated output behind.
+
+    Args:
+        src (str): Input video
+        dst (str): Output path
+        profile (dict): Profile from get_profile
+        timeout (float, optional): Timeout in seconds. Defaults to FFMPEG_TIMEOUT.
+
+    Returns:
+        str: dst on success, or None if the encode failed
+    """
+    if not profile.get("ffmpeg_args"):
+        if os.path.abspath(src) != os.path.abspath(dst):
+            shutil.copyfile(src, dst)
+        return dst
+
+    timeout = timeout or float(os.environ.get("FFMPEG_TIMEOUT", "300"))
+    temp_path = f"{dst}.encoding.mp4"
+    cmd = ["ffmpeg", "-y", "-i", src, *profile["ffmpeg_args"], temp_path]
+    logger.info(f"Encoding with profile {profile['name']}: {' '.join(cmd)}")
+
+    try:
+        result = run_with_timeout(cmd, timeout)
+        if result.returncode != 0:
+            logger.error(f"FFmpeg encode failed: {result.stderr}")
+            return None
+        os.replace(temp_path, dst)
+        return dst
+    except Exception as e:
+        logger.error(f"Error encoding with profile {profile['name']}: {e}")
+        return None
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,460 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+# Upper bound for a single page of job history
+MAX_PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    settings TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    video_path TEXT,
+    audio_path TEXT,
+    hls_path TEXT,
+    poster_path TEXT,
+    script TEXT,
+    manim_code TEXT,
+    timings TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    batch_id TEXT,
+    parent_id TEXT,
+    degraded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_jobs_prompt_hash ON jobs (prompt_hash, status, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_accessed REAL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_job ON artifacts (job_id, kind);
+CREATE INDEX IF NOT EXISTS idx_artifacts_path ON artifacts (path);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id);
+
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    settings TEXT NOT NULL DEFAULT '{}',
+    priority TEXT NOT NULL,
+    items TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+"""
+
+# Columns added after the first release, applied to existing databases on startup
+MIGRATIONS = [
+    ("artifacts", "last_accessed", "REAL"),
+    ("jobs", "hls_path", "TEXT"),
+    ("jobs", "poster_path", "TEXT"),
+    ("jobs", "batch_id", "TEXT"),
+    ("jobs", "parent_id", "TEXT"),
+    ("jobs", "degraded", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Columns that may be changed through update_job
+UPDATABLE_COLUMNS = {
+    "status", "started_at", "finished_at", "video_path", "audio_path", "hls_path",
+    "poster_path", "script", "manim_code", "timings", "error", "degraded",
+}
+
+def normalize_prompt(prompt):
+    """
+    Normalize a prompt so trivially different spellings share a hash.
+
+    Lowercases, collapses whitespace and strips surrounding punctuation.
+    """
+    text = re.sub(r"\s+", " ", (prompt or "").lower()).strip()
+    return text.strip(" .!?;:,")
+
+def prompt_hash(prompt, settings=None):
+    """
+    Hash a normalized prompt together with the settings that affect its output.
+
+    Args:
+        prompt (str): User prompt
+        settings (dict, optional): Generation settings
+
+    Returns:
+        str: Hex digest identifying the prompt/settings combination
+    """
+    payload = json.dumps({"prompt": normalize_prompt(prompt), "settings": settings or {}}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _encode_cursor(created_at, job_id):
+    """Encode a keyset pagination position as an opaque cursor."""
+    raw = json.dumps([created_at, job_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor."""
+    try:
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(created_at), str(job_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+class JobStore:
+    """
+    SQLite-backed store for animation jobs, their results and artifacts.
+    """
+
+    def __init__(self, db_path):
+        """
+        Initialize the job store.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        self._migrate(conn)
+        conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _migrate(conn):
+        """Add columns that older databases are missing."""
+        for table, column, definition in MIGRATIONS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if columns and column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        """Get this thread's database connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row):
+        """Convert a database row into a job dict."""
+        if row is None:
+            return None
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"] or "{}")
+        job["timings"] = json.loads(job["timings"] or "{}")
+        if "degraded" in job:
+            job["degraded"] = bool(job["degraded"])
+        return job
+
+    def create_job(self, prompt, settings=None, job_id=None, status=STATUS_QUEUED, batch_id=None,
+                   parent_id=None):
+        """
+        Record a new job.
+
+        Args:
+            prompt (str): User prompt
+            settings (dict, optional): Generation settings
+            job_id (str, optional): Job id. Generated if not provided.
+            status (str): Initial status
+            batch_id (str, optional): Batch the job belongs to
+            parent_id (str, optional): Job this one is an edit of
+
+        Returns:
+            dict: The created job
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with self._connect() as conn:
+            self._insert_job(conn, job_id, prompt, settings, status, batch_id, parent_id)
+        return self.get_job(job_id)
+
+    @staticmethod
+    def _insert_job(conn, job_id, prompt, settings, status, batch_id=None, parent_id=None):
+        now = time.time()
+        conn.execute(
+            """INSERT INTO jobs (id, prompt, prompt_hash, settings, status, created_at, updated_at, batch_id,
+                                 parent_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (job_id, prompt, prompt_hash(prompt, settings), json.dumps(settings or {}, sort_keys=True),
+             status, now, now, batch_id, parent_id),
+        )
+
+    def create_batch(self, items, settings=None, priority="batch"):
+        """
+        Record a batch and queue a job for each of its items that needs one.
+
+        Args:
+            items (list): Dicts with the item's "prompt", its "job_id" and whether
+                that job is "reused" (an earlier job that already answers it).
+                Items may share a job id; its job is created once.
+            settings (dict, optional): Generation settings shared by all items
+            priority (str): Render priority class of the batch
+
+        Returns:
+            dict: The batch
+        """
+        batch_id = uuid.uuid4().hex
+        items = [
+            {"prompt": item["prompt"], "job_id": item["job_id"], "reused": bool(item.get("reused"))}
+            for item in items
+        ]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO batches (id, settings, priority, items, created_at) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, json.dumps(settings or {}, sort_keys=True), priority, json.dumps(items), time.time()),
+            )
+            # One transaction for the whole batch instead of one per job
+            created = set()
+            for item in items:
+                if not item["reused"] and item["job_id"] not in created:
+                    self._insert_job(conn, item["job_id"], item["prompt"], settings, STATUS_QUEUED, batch_id)
+                    created.add(item["job_id"])
+        return self.get_batch(batch_id)
+
+    def update_batch(self, batch_id, **fields):
+        """Set a batch's started_at or finished_at."""
+        unknown = set(fields) - {"started_at", "finished_at"}
+        if unknown:
+            raise ValueError(f"Cannot update batch columns: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE batches SET {assignments} WHERE id = ?", (*fields.values(), batch_id))
+
+    def get_batch(self, batch_id):
+        """Get a batch by id, or None if it doesn't exist."""
+        row = self._connect().execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        batch = dict(row)
+        batch["settings"] = json.loads(batch["settings"] or "{}")
+        batch["items"] = json.loads(batch["items"])
+        return batch
+
+    def get_jobs(self, job_ids):
+        """
+        Get the status columns of many jobs in one query.
+
+        Returns:
+            dict: job id -> job dict (without code and script)
+        """
+        if not job_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in job_ids)
+        rows = self._connect().execute(
+            f"""SELECT id, prompt, status, created_at, started_at, finished_at,
+                       video_path, audio_path, hls_path, poster_path, settings, timings, error
+                FROM jobs WHERE id IN ({placeholders})""",
+            list(job_ids),
+        ).fetchall()
+        return {row["id"]: self._row_to_job(row) for row in rows}
+
+    def update_job(self, job_id, **fields):
+        """
+        Update columns of an existing job.
+
+        Args:
+            job_id (str): Job id
+            **fields: Column values to set. `timings` may be a dict.
+        """
+        unknown = set(fields) - UPDATABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Cannot update job columns: {', '.join(sorted(unknown))}")
+        if "timings" in fields and not isinstance(fields["timings"], str):
+            fields["timings"] = json.dumps(fields["timings"])
+        fields["updated_at"] = time.time()
+
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get_job(self, job_id):
+        """Get a job by id, or None if it doesn't exist."""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def find_completed_by_prompt(self, prompt, settings=None):
+        """
+        Find the most recent completed job for the same normalized prompt and settings.
+
+        Edits are not matched: they answer their edit, not the prompt. Nor are
+        degraded jobs (fallback template or mock video), so an outage doesn't
+        stick to the prompt.
+
+        Returns:
+            dict: The matching job, or None
+        """
+        row = self._connect().execute(
+            """SELECT * FROM jobs WHERE prompt_hash = ? AND status = ? AND parent_id IS NULL AND degraded = 0
+               ORDER BY created_at DESC LIMIT 1""",
+            (prompt_hash(prompt, settings), STATUS_COMPLETED),
+        ).fetchone()
+        return self._row_to_job(row)
+
+    def list_jobs(self, limit=50, cursor=None, status=None):
+        """
+        List jobs newest first using keyset pagination.
+
+        Args:
+            limit (int): Maximum number of jobs to return
+            cursor (str, optional): Cursor returned by a previous call
+            status (str, optional): Only return jobs in this status
+
+        Returns:
+            tuple: (list of job dicts, next cursor or None)
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, job_id = _decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([created_at, created_at, job_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"""SELECT id, prompt, status, created_at, updated_at, finished_at,
+                       video_path, audio_path, settings, timings, error, degraded
+                FROM jobs {where}
+                ORDER BY created_at DESC, id DESC LIMIT ?""",
+            (*params, limit + 1),
+        ).fetchall()
+
+        jobs = [self._row_to_job(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = jobs[-1]
+            next_cursor = _encode_cursor(last["created_at"], last["id"])
+        return jobs, next_cursor
+
+    def iter_completed_prompts(self, batch_size=1000):
+        """
+        Iterate over (job id, prompt) of all completed jobs except edits and degraded ones, oldest first, in batches.
+
+        Yields:
+            tuple: (job id, prompt)
+        """
+        conn = self._connect()
+        position = (-1.0, "")
+        while True:
+            rows = conn.execute(
+                """SELECT id, prompt, created_at FROM jobs
+                   WHERE status = ? AND parent_id IS NULL AND degraded = 0 AND (created_at > ? OR (created_at = ? AND id > ?))
+                   ORDER BY created_at, id LIMIT ?""",
+                (STATUS_COMPLETED, position[0], position[0], position[1], batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row["id"], row["prompt"]
+            position = (rows[-1]["created_at"], rows[-1]["id"])
+
+    def add_artifact(self, job_id, kind, path):
+        """
+        Record a file produced for a job.
+
+        Args:
+            job_id (str): Job id
+            kind (str): Artifact kind (e.g. "video", "audio", "code")
+            path (str): Path of the file
+        """
+        size = os.path.getsize(path) if path and os.path.exists(path) else 0
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT INTO artifacts (job_id, kind, path, bytes, created_at, last_accessed)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (job_id, kind, path, size, now, now),
+            )
+
+    def list_artifacts(self, job_id):
+        """List the artifacts recorded for a job."""
+        rows = self._connect().execute(
+            "SELECT kind, path, bytes, created_at, last_accessed FROM artifacts WHERE job_id = ? ORDER BY id",
+            (job_id,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def touch_artifacts(self, job_id):
+        """Mark a job's artifacts as used now, e.g. when its result is reused or served."""
+        with self._connect() as conn:
+            conn.execute("UPDATE artifacts SET last_accessed = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def get_artifact_usage(self):
+        """
+        Get the last use time of every tracked artifact path.
+
+        Returns:
+            dict: path -> (last accessed timestamp, whether the path is protected)
+        """
+        rows = self._connect().execute(
+            """SELECT a.path, COALESCE(a.last_accessed, a.created_at) AS used,
+                      j.status IN (?, ?) AS active
+               FROM artifacts a JOIN jobs j ON j.id = a.job_id""",
+            (STATUS_QUEUED, STATUS_RUNNING),
+        ).fetchall()
+        return {row["path"]: (row["used"], bool(row["active"])) for row in rows}
+
+    def remove_artifact_path(self, path):
+        """Forget artifacts whose file has been deleted."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+
+_store = None
+_store_lock = threading.Lock()
+
+def init_app(app):
+    """Create the job store for a Flask app using its DATABASE setting."""
+    global _store
+    with _store_lock:
+        _store = JobStore(app.config["DATABASE"])
+    app.extensions["job_store"] = _store
+    return _store
+
+def get_job_store():
+    """
+    Get the shared job store.
+
+    Falls back to the JOB_DATABASE environment variable (or instance/cartoonimations.sqlite)
+    when no Flask app has initialized it, e.g. in scripts and workers.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+                default_path = os.path.join(project_root, "instance", "cartoonimations.sqlite")
+                _store = JobStore(os.environ.get("JOB_DATABASE", default_path))
+    return _store
@@ -0,0 +1,171 @@
+import logging
+import math
+import os
+import threading
+import time
+
+from . import metrics
+from .packaging_service import probe_duration
+from .render_limits import run_with_timeout
+from .scene_cost import get_scene_limits
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LIVE_PLAYLIST = "index.m3u8"
+
+SEGMENTS_PUBLISHED = metrics.counter("live_segments_published_total", "Partial movies published to live playlists")
+FIRST_SEGMENT = metrics.histogram(
+    "live_first_segment_seconds", "Time from render start until the first live segment was published"
+)
+
+def live_streaming_enabled():
+    """Whether jobs publish a live playlist while rendering when the request doesn't say."""
+    return os.environ.get("LIVE_STREAMING_ENABLED", "false").lower() in ["true", "1", "yes"]
+
+def get_live_dir(job_id):
+    """Get the live playlist directory of a job."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, "animation", "output", "live", job_id)
+
+class LivePublisher:
+    """
+    Publishes a render's partial movies to an HLS EVENT playlist as they finish.
+
+    Manim writes one partial movie per play/wait call, one after another, so
+    a partial is complete once the next one appears; the last one is
+    published when the render ends. Each partial is remuxed (not re-encoded)
+    into a TS segment whose timestamps continue from the previous one.
+    """
+
+    def __init__(self, job_id, partial_dir, poll_interval=None):
+        """
+        Initialize a publisher for one render.
+
+        Args:
+            job_id (str): Job id
+            partial_dir (str): Directory Manim writes this render's partial movies to
+            poll_interval (float, optional): Seconds between directory scans (LIVE_POLL_INTERVAL)
+        """
+        self.job_id = job_id
+        self.partial_dir = partial_dir
+        self.output_dir = get_live_dir(job_id)
+        self.poll_interval = poll_interval or float(os.environ.get("LIVE_POLL_INTERVAL", "0.5"))
+        # EVENT playlists may not change their target duration, so use the longest a single call can be
+        limits = get_scene_limits()
+        self.target_duration = math.ceil(max(limits["max_wait_seconds"], limits["max_run_time_seconds"]))
+
+        self._published = set()
+        self._segments = []
+        self._offset = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started = None
+
+    @property
+    def playlist_path(self):
+        return os.path.join(self.output_dir, LIVE_PLAYLIST)
+
+    def start(self):
+        """Open the playlist and start watching for partial movies."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._started = time.monotonic()
+        self._write_playlist(ended=False)
+        self._thread = threading.Thread(target=self._run, name=f"live-{self.job_id[:8]}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.publish_ready(final=False)
+            except Exception as e:
+                logger.error(f"Error publishing live segments for job {self.job_id}: {e}")
+
+    def _pending_partials(self):
+        """Unpublished partial movies in the order they were written."""
+        if not os.path.isdir(self.partial_dir):
+            return []
+        files = []
+        for entry in os.scandir(self.partial_dir):
+            if not entry.name.endswith(".mp4") or "temp" in entry.name or entry.name in self._published:
+                continue
+            try:
+                files.append((entry.stat().st_mtime, entry.name))
+            except OSError:
+                continue
+        return [name for _, name in sorted(files)]
+
+    def publish_ready(self, final=False):
+        """
+        Publish every partial movie that is known to be complete.
+
+        Args:
+            final (bool): The render has ended, so the newest partial is complete too
+        """
+        with self._lock:
+            pending = self._pending_partials()
+            if not final:
+                # The newest partial may still be being written
+                pending = pending[:-1]
+            for name in pending:
+                self._publish(name)
+
+    def _publish(self, name):
+        """Remux one partial movie into the next segment and append it to the playlist."""
+        self._published.add(name)
+        source = os.path.join(self.partial_dir, name)
+        duration = probe_duration(source)
+        if not duration:
+            logger.warning(f"Skipping unreadable partial movie {source}")
+            return
+
+        segment = f"seg_{len(self._segments):05d}.ts"
+        cmd = [
+            "ffmpeg", "-y", "-i", source, "-map", "0", "-c", "copy",
+            "-output_ts_offset", f"{self._offset:.6f}", "-f", "mpegts",
+            os.path.join(self.output_dir, segment),
+        ]
+        result = run_with_timeout(cmd, float(os.environ.get("FFMPEG_TIMEOUT", "300")))
+        if result.returncode != 0:
+            logger.error(f"Failed to remux {source}: {result.stderr}")
+            return
+
+        if not self._segments:
+            FIRST_SEGMENT.observe(time.monotonic() - self._started)
+        self._segments.append((segment, duration))
+        self._offset += duration
+        SEGMENTS_PUBLISHED.inc()
+        self._write_playlist(ended=False)
+
+    def _write_playlist(self, ended):
+        """Rewrite the playlist atomically so readers never see a partial file."""
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for segment, duration in self._segments:
+            lines += [f"#EXTINF:{duration:.3f},", segment]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        temp_path = f"{self.playlist_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.playlist_path)
+
+    def finish(self):
+        """Stop watching, publish the remaining partials and close the playlist."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.publish_ready(final=True)
+        finally:
+            with self._lock:
+                self._write_playlist(ended=True)
+        logger.info(f"Live playlist for job {self.job_id} closed after {len(self._segments)} segments")
@@ -0,0 +1,409 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from . import metrics
+from .rate_limit import TokenBucket
+from .tracing import start_span, record_span, CATEGORY_LLM, CATEGORY_QUEUE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = metrics.histogram("llm_gateway_queue_seconds", "Time LLM calls waited for rate limit and concurrency")
+INFLIGHT = metrics.gauge("llm_gateway_inflight", "LLM calls currently in flight")
+REQUESTS = metrics.counter("llm_gateway_requests_total", "LLM calls by outcome")
+RETRIES = metrics.counter("llm_gateway_retries_total", "LLM call retries by reason")
+TOKENS = metrics.counter("llm_gateway_tokens_total", "LLM tokens used by kind")
+
+DEFAULT_MODEL = "llama3-70b-8192"
+
+# Usage totals of the current unit of work, see track_usage
+_usage = contextvars.ContextVar("llm_usage", default=None)
+
+@contextmanager
+def track_usage():
+    """
+    Total the LLM calls and tokens made inside the block.
+
+        with track_usage() as usage:
+            chain.invoke(...)
+        usage["input_tokens"], usage["output_tokens"], usage["calls"]
+    """
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+# Provider responses worth retrying: rate limits and transient server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def _is_retryable(error):
+    """Check whether an LLM error is a rate limit or transient failure."""
+    if _status_code(error) in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS or isinstance(error, (TimeoutError, ConnectionError))
+
+def _retry_after(error):
+    """Get the provider's Retry-After in seconds from an error, if it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _input_text(llm_input):
+    if hasattr(llm_input, "to_string"):
+        return llm_input.to_string()
+    return str(llm_input)
+
+class LLMGateway:
+    """
+    Shared gate in front of the LLM provider.
+
+    Calls wait for request and token budgets (token buckets refilled per
+    minute) and a concurrency slot before they are sent. Rate limit and
+    transient errors are retried with jittered exponential backoff; a
+    Retry-After from the provider pauses every caller, not just the one
+    that was limited.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_concurrency=None,
+                 max_retries=None, base_delay=None, max_delay=None, expected_output_tokens=None):
+        """
+        Initialize the gateway. Unset arguments come from the environment.
+
+        Args:
+            requests_per_minute (float, optional): Request budget (LLM_REQUESTS_PER_MINUTE)
+            tokens_per_minute (float, optional): Token budget (LLM_TOKENS_PER_MINUTE)
+            max_concurrency (int, optional): Calls allowed in flight (LLM_MAX_CONCURRENCY)
+            max_retries (int, optional): Retries per call (LLM_MAX_RETRIES)
+            base_delay (float, optional): First backoff step in seconds (LLM_RETRY_BASE_DELAY)
+            max_delay (float, optional): Longest backoff in seconds (LLM_RETRY_MAX_DELAY)
+            expected_output_tokens (int, optional): Completion tokens reserved per call before
+                the real usage is known (LLM_EXPECTED_OUTPUT_TOKENS)
+        """
+        rpm = requests_per_minute or float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "30"))
+        tpm = tokens_per_minute or float(os.environ.get("LLM_TOKENS_PER_MINUTE", "6000"))
+        self.requests = TokenBucket(rpm / 60.0, rpm)
+        self.tokens = TokenBucket(tpm / 60.0, tpm)
+        self.max_concurrency = max_concurrency or int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("LLM_MAX_RETRIES", "4"))
+        self.base_delay = base_delay or float(os.environ.get("LLM_RETRY_BASE_DELAY", "1"))
+        self.max_delay = max_delay or float(os.environ.get("LLM_RETRY_MAX_DELAY", "30"))
+        self.expected_output_tokens = expected_output_tokens or int(os.environ.get("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+
+        self._active = 0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    def estimate_tokens(self, llm_input):
+        """Rough token count of a call: about four characters per prompt token plus the expected completion."""
+        return len(_input_text(llm_input)) // 4 + self.expected_output_tokens
+
+    def _reserve(self, tokens):
+        """Take request and token budget, returning the seconds to wait before sending."""
+        waits = [
+            self.requests.reserve(1),
+            self.tokens.reserve(tokens),
+            self._blocked_until - time.monotonic(),
+        ]
+        return max(0.0, *waits)
+
+    def _try_take_slot(self):
+        with self._cond:
+            if self._active >= self.max_concurrency:
+                return False
+            self._active += 1
+            INFLIGHT.set(self._active)
+            return True
+
+    def _take_slot(self):
+        with self._cond:
+            while self._active >= self.max_concurrency:
+                self._cond.wait()
+            self._active += 1
+            INFLIGHT.set(self._active)
+
+    def _release_slot(self):
+        with self._cond:
+            self._active -= 1
+            INFLIGHT.set(self._active)
+            self._cond.notify()
+
+    def _record_usage(self, message, estimate):
+        """Count tokens used and settle the token bucket against the estimate."""
+        usage = getattr(message, "usage_metadata", None) or {}
+        tracked = _usage.get()
+        if tracked is not None:
+            tracked["calls"] += 1
+            tracked["input_tokens"] += usage.get("input_tokens", 0)
+            tracked["output_tokens"] += usage.get("output_tokens", 0)
+        if not usage:
+            return
+        TOKENS.inc(usage.get("input_tokens", 0), kind="input")
+        TOKENS.inc(usage.get("output_tokens", 0), kind="output")
+        total = usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        # A negative difference hands unused tokens back; the bucket is capped again on its next refill
+        self.tokens.reserve(total - estimate)
+
+    def _backoff(self, attempt, error):
+        """Get the delay before the next attempt and pause everyone if the provider asked us to."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            with self._cond:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            # Jitter on top so the paused callers don't all return at once
+            delay = retry_after + random.uniform(0, self.base_delay)
+        reason = "rate_limit" if _status_code(error) == 429 else type(error).__name__
+        RETRIES.inc(reason=reason)
+        logger.warning(f"LLM call failed ({reason}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    @staticmethod
+    def _start_call(llm):
+        """Start the trace span of one gated call, attempts and waits included."""
+        return start_span("llm.call", model=getattr(llm, "model_name", None) or getattr(llm, "model", None))
+
+    @staticmethod
+    def _record_attempt(call, queued_ns, sent_ns, attempt, message=None, error=None, **attributes):
+        """Record an attempt's wait for budget and a slot, and the request itself, in the call's trace."""
+        record_span("llm.queue_wait", queued_ns, sent_ns, category=CATEGORY_QUEUE, parent=call, attempt=attempt)
+        usage = getattr(message, "usage_metadata", None) or {}
+        request = start_span("llm.request", CATEGORY_LLM, parent=call, start_ns=sent_ns, attempt=attempt,
+                             input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"),
+                             **attributes)
+        if error is not None:
+            request.record_error(error)
+        request.end()
+
+    @staticmethod
+    def _end_call(call, attempt, error=None):
+        if error is not None:
+            call.record_error(error)
+        call.end(attempts=attempt + 1)
+
+    def invoke(self, llm, llm_input, config=None):
+        """
+        Call llm.invoke through the gate.
+
+        Args:
+            llm: LangChain chat model
+            llm_input: Prompt value or messages
+            config (dict, optional): Runnable config
+
+        Returns:
+            The model's message
+        """
+        call = self._start_call(llm)
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            queued_ns = time.time_ns()
+            estimate = self.estimate_tokens(llm_input)
+            time.sleep(self._reserve(estimate))
+            self._take_slot()
+            QUEUE_WAIT.observe(time.monotonic() - queued)
+            sent_ns = time.time_ns()
+            try:
+                message = llm.invoke(llm_input, config)
+            except Exception as e:
+                self._record_attempt(call, queued_ns, sent_ns, attempt, error=e)
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    REQUESTS.inc(outcome="error")
+                    self._end_call(call, attempt, e)
+                    raise
+                delay = self._backoff(attempt, e)
+            else:
+                self._record_usage(message, estimate)
+                self._record_attempt(call, queued_ns, sent_ns, attempt, message)
+                REQUESTS.inc(outcome="ok")
+                self._end_call(call, attempt)
+                return message
+            finally:
+                self._release_slot()
+            backoff_ns = time.time_ns()
+            time.sleep(delay)
+            record_span("llm.backoff", backoff_ns, category=CATEGORY_QUEUE, parent=call, attempt=attempt)
+
+    async def ainvoke(self, llm, llm_input, config=None, poll_interval=0.05):
+        """Async version of invoke; waiting callers hold no thread."""
+        call = self._start_call(llm)
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            queued_ns = time.time_ns()
+            estimate = self.estimate_tokens(llm_input)
+            await asyncio.sleep(self._reserve(estimate))
+            while not self._try_take_slot():
+                await asyncio.sleep(poll_interval)
+            QUEUE_WAIT.observe(time.monotonic() - queued)
+            sent_ns = time.time_ns()
+            try:
+                message = await llm.ainvoke(llm_input, config)
+            except Exception as e:
+                self._record_attempt(call, queued_ns, sent_ns, attempt, error=e)
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    REQUESTS.inc(outcome="error")
+                    self._end_call(call, attempt, e)
+                    raise
+                delay = self._backoff(attempt, e)
+            else:
+                self._record_usage(message, estimate)
+                self._record_attempt(call, queued_ns, sent_ns, attempt, message)
+                REQUESTS.inc(outcome="ok")
+                self._end_call(call, attempt)
+                return message
+            finally:
+                self._release_slot()
+            backoff_ns = time.time_ns()
+            await asyncio.sleep(delay)
+            record_span("llm.backoff", backoff_ns, category=CATEGORY_QUEUE, parent=call, attempt=attempt)
+
+    def stream(self, llm, llm_input, config=None):
+        """
+        Stream llm.stream through the gate, yielding message chunks.
+
+        A call is only retried if it fails before its first chunk; once
+        output has been handed on, errors are raised.
+        """
+        # The call span is never made current: the consumer runs between chunks
+        call = self._start_call(llm)
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            queued_ns = time.time_ns()
+            estimate = self.estimate_tokens(llm_input)
+            time.sleep(self._reserve(estimate))
+            self._take_slot()
+            QUEUE_WAIT.observe(time.monotonic() - queued)
+            sent_ns = time.time_ns()
+            first_chunk = None
+            message = None
+            try:
+                for chunk in llm.stream(llm_input, config):
+                    if first_chunk is None:
+                        first_chunk = (time.time_ns() - sent_ns) / 1e9
+                    message = chunk if message is None else message + chunk
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped reading
+                self._end_call(call, attempt)
+                raise
+            except Exception as e:
+                self._record_attempt(call, queued_ns, sent_ns, attempt, error=e, first_chunk_seconds=first_chunk)
+                if message is not None or attempt >= self.max_retries or not _is_retryable(e):
+                    REQUESTS.inc(outcome="error")
+                    self._end_call(call, attempt, e)
+                    raise
+                delay = self._backoff(attempt, e)
+            else:
+                self._record_usage(message, estimate)
+                self._record_attempt(call, queued_ns, sent_ns, attempt, message, first_chunk_seconds=first_chunk)
+                REQUESTS.inc(outcome="ok")
+                self._end_call(call, attempt)
+                return
+            finally:
+                self._release_slot()
+            backoff_ns = time.time_ns()
+            time.sleep(delay)
+            record_span("llm.backoff", backoff_ns, category=CATEGORY_QUEUE, parent=call, attempt=attempt)
+
+    def wrap(self, llm):
+        """
+        Wrap a chat model so every call goes through the gate.
+
+        Returns:
+            Runnable: Drop-in replacement for llm in `prompt | llm | parser` chains
+        """
+        from langchain_core.runnables import RunnableLambda
+
+        def call(llm_input, config):
+            return self.invoke(llm, llm_input, config)
+
+        async def acall(llm_input, config):
+            return await self.ainvoke(llm, llm_input, config)
+
+        return RunnableLambda(call, afunc=acall, name="llm_gateway")
+
+    def wrap_stream(self, llm):
+        """
+        Wrap a chat model for streaming through the gate.
+
+        Returns:
+            Runnable: Drop-in replacement for llm whose stream() yields chunks as they arrive
+        """
+        from langchain_core.runnables import RunnableGenerator
+
+        def transform(inputs):
+            # The prompt arrives as a single value
+            llm_input = None
+            for llm_input in inputs:
+                pass
+            yield from self.stream(llm, llm_input)
+
+        return RunnableGenerator(transform, name="llm_gateway_stream")
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway():
+    """Get the shared LLM gateway."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+def create_chat_model(temperature=0.7, api_key=None, model=None, json_mode=False, streaming=False):
+    """
+    Create the Groq chat model used by the workflow, behind the shared gateway.
+
+    GROQ_BASE_URL points the client at another server, e.g. the mock in
+    scripts/mock_llm_server.py. LLM_GATEWAY_ENABLED=false returns the bare
+    client with its own retries.
+
+    Args:
+        temperature (float): Sampling temperature
+        api_key (str, optional): Groq API key. Defaults to GROQ_API_KEY.
+        model (str, optional): Model name. Defaults to GROQ_MODEL.
+        json_mode (bool): Ask the provider for a single JSON object
+        streaming (bool): Gate stream() calls chunk by chunk instead of invoke()
+
+    Returns:
+        Runnable: Chat model
+    """
+    from langchain_groq import ChatGroq
+
+    gated = os.environ.get("LLM_GATEWAY_ENABLED", "true").lower() in ["true", "1", "yes"]
+    options = {
+        "model": model or os.environ.get("GROQ_MODEL", DEFAULT_MODEL),
+        "temperature": temperature,
+        "groq_api_key": api_key or os.environ.get("GROQ_API_KEY"),
+    }
+    if json_mode:
+        options["model_kwargs"] = {"response_format": {"type": "json_object"}}
+    if os.environ.get("GROQ_BASE_URL"):
+        options["base_url"] = os.environ["GROQ_BASE_URL"]
+    if gated:
+        # Retries are the gateway's job, so they respect the shared budgets
+        options["max_retries"] = 0
+    llm = ChatGroq(**options)
+    if not gated:
+        return llm
+    return get_llm_gateway().wrap_stream(llm) if streaming else get_llm_gateway().wrap(llm)
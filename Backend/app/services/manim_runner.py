@@ -0,0 +1,31 @@
+"""
+Entry point for Manim render subprocesses.
+
+Applies the resource limits passed in RENDER_LIMITS, installs the
+render-side hooks (shared text cache, render checkpoints) and then hands
+over to Manim's own command line, under the profiler if RENDER_PROFILE_DIR
+is set. Usage mirrors `python -m manim`:
+
+    python -m app.services.manim_runner scene.py EducationalScene --quality h
+"""
+import sys
+
+from .render_limits import apply_render_limits_from_env
+from .text_cache import install_manim_text_cache
+from .render_checkpoint import install_checkpoint_hook
+from .profiling import profile_render
+
+def main(argv=None):
+    """Apply limits, install render hooks and run the Manim CLI with the given arguments."""
+    apply_render_limits_from_env()
+    install_manim_text_cache()
+    install_checkpoint_hook()
+
+    from manim.__main__ import main as manim_main
+
+    sys.argv = ["manim"] + list(sys.argv[1:] if argv is None else argv)
+    with profile_render("render"):
+        return manim_main()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ import tempfile
 import ast
 import re
 import textwrap
+import traceback
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +13,9 @@ logger = logging.getLogger(__name__)
 # Define a constant for the scene class name to ensure consistency
 SCENE_CLASS_NAME = "EducationalScene"
 
+# Comment in the fallback template, so a job that fell back to it isn't served as an answer
+FALLBACK_MARKER = "# template: fallback"
+
 def generate_manim_code(prompt):
     """Generate Manim code from a user prompt using the Groq API."""
     logger.info(f"Generating Manim code for prompt: {prompt}")
@@ -20,9 +24,8 @@ def generate_manim_code(prompt):
         # Import required libraries
         from langchain_core.prompts import PromptTemplate
         from langchain_core.output_parsers import StrOutputParser
-        from langchain_groq import ChatGroq
+        from .llm_gateway import create_chat_model
         import os
-        import traceback
         
         # Get API key from environment
         api_key = os.environ.get("GROQ_API_KEY")
@@ -30,11 +33,10 @@ def generate_manim_code(prompt):
             logger.error("GROQ_API_KEY not found in environment variables")
             return get_fallback_template(title=prompt)
         
-        # Create Groq LLM instance with llama3-70b model
-        llm = ChatGroq(
-            api_key=api_key,
-            model="llama3-70b-8192",
-            temperature=0.2  # Lower temperature for more predictable code
+        # Create Groq LLM instance behind the shared rate limit gateway
+        llm = create_chat_model(
+            temperature=0.2,  # Lower temperature for more predictable code
+            api_key=api_key
         )
         output_parser = StrOutputParser()
         
@@ -159,6 +161,10 @@ def sanitize_manim_code(code):
 
     return code
  
+def is_fallback_code(code):
+    """Check whether scene code is the fallback template rather than generated for its prompt."""
+    return FALLBACK_MARKER in (code or "")
+
 def get_fallback_template(title="Educational Topic", animation_code=None):
     """
     Return a fallback Manim template that's guaranteed to work.
@@ -182,6 +188,7 @@ from manim import *
 
 class {SCENE_CLASS_NAME}(Scene):
     def construct(self):
+        {FALLBACK_MARKER}
         # Title
         title = Text("{title}").scale(0.8)
         title.to_edge(UP)
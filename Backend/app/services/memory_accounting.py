@@ -0,0 +1,212 @@
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from . import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+PROCESS_RSS = metrics.gauge("process_resident_memory_bytes", "Resident set size of this process")
+JOB_RSS_DELTA = metrics.histogram(
+    "job_rss_delta_bytes", "Change in process RSS over a job",
+    buckets=(-64 * MB, -8 * MB, -1 * MB, 0, 1 * MB, 8 * MB, 64 * MB, 256 * MB),
+)
+
+def get_rss_bytes():
+    """
+    Get the resident set size of this process.
+
+    Read from /proc on Linux. Elsewhere the peak RSS is the best there is,
+    which only ever grows, so it still shows leaks but not recovery.
+
+    Returns:
+        int: RSS in bytes, or 0 if it can't be read
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        rss = peak if sys.platform == "darwin" else peak * 1024
+    PROCESS_RSS.set(rss)
+    return rss
+
+class JobMemory:
+    """
+    Process RSS at the start and end of each job.
+
+    RSS belongs to the whole process, so with several jobs in flight a
+    job's delta includes what the others allocated meanwhile. Deltas that
+    stay positive job after job are what points at a leak.
+    """
+
+    def __init__(self):
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def begin(self, job_id):
+        """Record the RSS a job starts with."""
+        with self._lock:
+            self._started[job_id] = get_rss_bytes()
+
+    def end(self, job_id):
+        """
+        Record the RSS a job ends with.
+
+        Returns:
+            dict: rss_before, rss_after and rss_delta in bytes, or None if
+                the job's start wasn't recorded
+        """
+        with self._lock:
+            before = self._started.pop(job_id, None)
+        if before is None:
+            return None
+        after = get_rss_bytes()
+        JOB_RSS_DELTA.observe(after - before)
+        return {"rss_before": before, "rss_after": after, "rss_delta": after - before}
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._started)
+
+class AllocationTracer:
+    """
+    tracemalloc snapshots taken on demand.
+
+    Tracing slows allocation down noticeably, so it is off until started
+    (e.g. through the admin API) and should be stopped again once the
+    suspect allocations have been found. Each snapshot is compared with the
+    previous one, so two snapshots some jobs apart show what grew.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def start(self, frames=None):
+        """
+        Start tracing allocations.
+
+        Args:
+            frames (int, optional): Stack frames kept per allocation (TRACEMALLOC_FRAMES)
+        """
+        frames = frames or int(os.environ.get("TRACEMALLOC_FRAMES", "10"))
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._previous = None
+                logger.info(f"Started tracing allocations with {frames} frames")
+
+    def stop(self):
+        """Stop tracing and drop the traces."""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("Stopped tracing allocations")
+            self._previous = None
+
+    def snapshot(self, limit=20, key_type="lineno"):
+        """
+        Take a snapshot and report the largest allocations and what grew.
+
+        Args:
+            limit (int): Entries per list
+            key_type (str): Grouping: "lineno", "filename" or "traceback"
+
+        Returns:
+            dict: Traced totals, "top" allocations and "growth" since the
+                previous snapshot (None for the first one)
+
+        Raises:
+            RuntimeError: If tracing isn't running
+        """
+        if key_type not in ("lineno", "filename", "traceback"):
+            raise ValueError(f"Unknown key_type: {key_type}")
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("Allocation tracing is not running")
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ])
+            previous, self._previous = self._previous, snapshot
+            current, peak = tracemalloc.get_traced_memory()
+
+        def describe(stat, size_diff=False):
+            entry = {
+                "where": [str(frame) for frame in stat.traceback.format()] if key_type == "traceback"
+                else str(stat.traceback[0]),
+                "bytes": stat.size,
+                "count": stat.count,
+            }
+            if size_diff:
+                entry.update(bytes_diff=stat.size_diff, count_diff=stat.count_diff)
+            return entry
+
+        growth = None
+        if previous is not None:
+            growth = [describe(stat, True) for stat in snapshot.compare_to(previous, key_type)[:limit]]
+        return {
+            "taken_at": time.time(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [describe(stat) for stat in snapshot.statistics(key_type)[:limit]],
+            "growth": growth,
+        }
+
+    def status(self):
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+        }
+
+_job_memory = JobMemory()
+_tracer = AllocationTracer()
+
+def get_job_memory():
+    """Get the per-job memory accounting of this process."""
+    return _job_memory
+
+def get_allocation_tracer():
+    """Get the tracemalloc snapshot helper of this process."""
+    return _tracer
+
+def memory_report():
+    """
+    Summarize this process's memory use.
+
+    Returns:
+        dict: RSS, garbage collector state, thread count, jobs in flight and tracing status
+    """
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": get_rss_bytes(),
+        "gc": {
+            "counts": gc.get_count(),
+            "objects": len(gc.get_objects()),
+            # Objects the collector found but couldn't free
+            "uncollectable": len(gc.garbage),
+        },
+        "threads": threading.active_count(),
+        "jobs_in_flight": _job_memory.in_flight(),
+        "tracemalloc": _tracer.status(),
+    }
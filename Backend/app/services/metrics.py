@@ -0,0 +1,149 @@
+import bisect
+import threading
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _label_key(labels):
+    """Turn a labels dict into a hashable, ordered key."""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key, extra=None):
+    """Format a label key in Prometheus exposition syntax."""
+    pairs = list(key) + list(extra or [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in pairs)
+    return "{" + body + "}"
+
+class Metric:
+    """Base class for in-process metrics exported at /api/metrics."""
+
+    type_name = "untyped"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """Yield (suffix, label key, extra labels, value) tuples for exposition."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", key, None, value
+
+    def value(self, **labels):
+        """Get the current value for a set of labels."""
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed buckets."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def value(self, **labels):
+        """Get (count, sum) for a set of labels."""
+        with self._lock:
+            state = self._values.get(_label_key(labels))
+            return (state["count"], state["sum"]) if state else (0, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, dict(state, counts=list(state["counts"]))) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                yield "_bucket", key, [("le", repr(float(bound)))], cumulative
+            yield "_bucket", key, [("le", "+Inf")], state["count"]
+            yield "_sum", key, None, state["sum"]
+            yield "_count", key, None, state["count"]
+
+def _get_or_create(cls, name, help_text, **kwargs):
+    """Register a metric once and return the same instance on later calls."""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help_text, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type_name}")
+        return metric
+
+def counter(name, help_text):
+    """Get or create a counter."""
+    return _get_or_create(Counter, name, help_text)
+
+def gauge(name, help_text):
+    """Get or create a gauge."""
+    return _get_or_create(Gauge, name, help_text)
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """Get or create a histogram."""
+    return _get_or_create(Histogram, name, help_text, buckets=buckets)
+
+def render_latest():
+    """
+    Render all registered metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics text
+    """
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        for suffix, key, extra, value in metric.samples():
+            lines.append(f"{metric.name}{suffix}{_format_labels(key, extra)} {value}")
+    return "\n".join(lines) + "\n"
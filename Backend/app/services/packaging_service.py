@@ -0,0 +1,220 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from . import metrics
+from .render_limits import run_with_timeout
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PACKAGING_SECONDS = metrics.histogram("hls_packaging_seconds", "Time spent packaging videos for HLS")
+
+MASTER_PLAYLIST = "master.m3u8"
+
+# Rendition ladder, lowest first. Bitrates are generous peaks for flat-colour
+# animation; x264 stays well below them on mostly static scenes.
+RENDITIONS = {
+    "480p": {"height": 480, "fps": 30, "bitrate": "1000k", "maxrate": "1200k", "bufsize": "2000k"},
+    "720p": {"height": 720, "fps": 30, "bitrate": "2000k", "maxrate": "2400k", "bufsize": "4000k"},
+    "1080p": {"height": 1080, "fps": 60, "bitrate": "4000k", "maxrate": "4800k", "bufsize": "8000k"},
+}
+
+# Content types for the files a package contains
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".jpg": "image/jpeg",
+    ".vtt": "text/vtt",
+}
+
+def hls_packaging_enabled():
+    """Whether jobs are packaged for HLS when the request doesn't say."""
+    return os.environ.get("HLS_PACKAGING_ENABLED", "false").lower() in ["true", "1", "yes"]
+
+def get_hls_root():
+    """Get the directory HLS packages are written to."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, "animation", "output", "hls")
+
+def get_hls_dir(job_id):
+    """Get the HLS package directory of a job."""
+    return os.path.join(get_hls_root(), job_id)
+
+def _playlist_uris(path):
+    """Get the files a playlist refers to, or None if it can't be read."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return None
+    uris = [line for line in lines if line and not line.startswith("#")]
+    # fMP4 renditions keep their init segment in an EXT-X-MAP tag
+    uris += [line.split('URI="', 1)[1].split('"', 1)[0] for line in lines
+             if line.startswith("#EXT-X-MAP:") and 'URI="' in line]
+    return uris
+
+def hls_package_complete(master_path):
+    """
+    Check that an HLS package has its master playlist, every variant playlist and every segment.
+
+    Args:
+        master_path (str): Path of the master playlist
+
+    Returns:
+        bool: Whether the package can be played
+    """
+    if not master_path:
+        return False
+    directory = os.path.dirname(master_path)
+    variants = _playlist_uris(master_path)
+    if not variants:
+        return False
+    for variant in variants:
+        segments = _playlist_uris(os.path.join(directory, variant))
+        if segments is None:
+            return False
+        variant_dir = os.path.dirname(os.path.join(directory, variant))
+        if not all(os.path.exists(os.path.join(variant_dir, segment)) for segment in segments):
+            return False
+    return True
+
+def get_ladder(names=None):
+    """
+    Get the renditions to package, lowest first.
+
+    Args:
+        names (list, optional): Rendition names. Defaults to HLS_RENDITIONS.
+
+    Returns:
+        list: (name, rendition) tuples
+    """
+    if names is None:
+        names = [n.strip() for n in os.environ.get("HLS_RENDITIONS", "480p,720p,1080p").split(",") if n.strip()]
+    unknown = [n for n in names if n not in RENDITIONS]
+    if unknown:
+        raise ValueError(f"Unknown HLS renditions: {', '.join(unknown)}")
+    return sorted(((n, RENDITIONS[n]) for n in names), key=lambda item: item[1]["height"])
+
+def probe_video_size(path):
+    """Get the (width, height) of a video's first stream, or None if ffprobe can't tell."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=30
+        )
+        if result.returncode != 0:
+            return None
+        width, height = result.stdout.strip().split(",")[:2]
+        return int(width), int(height)
+    except Exception:
+        return None
+
+def probe_video_height(path):
+    """Get the height of a video's first stream, or None if ffprobe can't tell."""
+    size = probe_video_size(path)
+    return size[1] if size else None
+
+def probe_duration(path):
+    """Get a media file's duration in seconds, or None if ffprobe can't tell."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=30
+        )
+        return float(result.stdout.strip()) if result.returncode == 0 else None
+    except Exception:
+        return None
+
+def build_hls_command(src, work_dir, ladder, segment_seconds, segment_type="mpegts"):
+    """
+    Build the FFmpeg command that encodes the whole ladder in one pass.
+
+    Keyframes are forced on segment boundaries so every rendition switches
+    cleanly and playback can start after the first segment.
+    """
+    count = len(ladder)
+    split = f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))
+    scales = [
+        f"[v{i}]fps={r['fps']},scale=-2:{r['height']}[v{i}out]"
+        for i, (_, r) in enumerate(ladder)
+    ]
+    cmd = ["ffmpeg", "-y", "-i", src, "-filter_complex", ";".join([split] + scales)]
+    for i, (_, r) in enumerate(ladder):
+        cmd += [
+            "-map", f"[v{i}out]",
+            f"-b:v:{i}", r["bitrate"], f"-maxrate:v:{i}", r["maxrate"], f"-bufsize:v:{i}", r["bufsize"],
+        ]
+
+    extension = "m4s" if segment_type == "fmp4" else "ts"
+    cmd += [
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "animation", "-pix_fmt", "yuv420p",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments", "-hls_segment_type", segment_type,
+        "-hls_segment_filename", os.path.join(work_dir, f"%v_%05d.{extension}"),
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(f"v:{i},name:{name}" for i, (name, _) in enumerate(ladder)),
+    ]
+    if segment_type == "fmp4":
+        cmd += ["-hls_fmp4_init_filename", "%v_init.mp4"]
+    cmd.append(os.path.join(work_dir, "%v.m3u8"))
+    return cmd
+
+def package_hls(video_path, job_id, renditions=None, segment_seconds=None, timeout=None):
+    """
+    Package a finished video as HLS with a rendition ladder and master playlist.
+
+    Renditions taller than the source are skipped. The package is built in
+    a scratch directory and moved into place when complete.
+
+    Args:
+        video_path (str): Finished video
+        job_id (str): Job the package belongs to
+        renditions (list, optional): Rendition names. Defaults to HLS_RENDITIONS.
+        segment_seconds (float, optional): Target segment length (HLS_SEGMENT_SECONDS)
+        timeout (float, optional): Timeout in seconds. Defaults to FFMPEG_TIMEOUT.
+
+    Returns:
+        str: Path of the master playlist, or None if packaging failed
+    """
+    segment_seconds = segment_seconds or float(os.environ.get("HLS_SEGMENT_SECONDS", "4"))
+    segment_type = os.environ.get("HLS_SEGMENT_TYPE", "mpegts")
+    timeout = timeout or float(os.environ.get("FFMPEG_TIMEOUT", "300"))
+
+    ladder = get_ladder(renditions)
+    source_height = probe_video_height(video_path)
+    if source_height:
+        ladder = [item for item in ladder if item[1]["height"] <= source_height] or ladder[:1]
+
+    output_dir = get_hls_dir(job_id)
+    work_dir = f"{output_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+
+    cmd = build_hls_command(video_path, work_dir, ladder, segment_seconds, segment_type)
+    logger.info(f"Packaging job {job_id} for HLS: {', '.join(name for name, _ in ladder)}")
+    started = time.perf_counter()
+    try:
+        result = run_with_timeout(cmd, timeout)
+        if result.returncode != 0 or not os.path.exists(os.path.join(work_dir, MASTER_PLAYLIST)):
+            logger.error(f"HLS packaging failed: {result.stderr}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return None
+    except Exception as e:
+        logger.error(f"Error packaging job {job_id} for HLS: {e}")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return None
+    finally:
+        PACKAGING_SECONDS.observe(time.perf_counter() - started)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(work_dir, output_dir)
+    logger.info(f"HLS package written to {output_dir}")
+    return os.path.join(output_dir, MASTER_PLAYLIST)
@@ -0,0 +1,386 @@
+import contextvars
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from . import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Request header that asks for a job to be profiled
+PROFILE_HEADER = "X-Profile"
+
+# Environment variable used to hand the profile directory to render subprocesses
+PROFILE_ENV_VAR = "RENDER_PROFILE_DIR"
+
+# Files a finished job profile is merged into
+PSTATS_FILE = "profile.prof"
+COLLAPSED_FILE = "profile.collapsed"
+
+# Seconds between writes of the collapsed stacks while a stage runs, so a
+# render killed at its timeout still leaves the stacks it had sampled
+FLUSH_INTERVAL = 2.0
+
+PROFILED_JOBS = metrics.counter("profiled_jobs_total", "Jobs run with profiling by trigger")
+
+def get_profile_mode():
+    """Get the profilers to run: "both" (default), "cprofile" or "sampling"."""
+    return os.environ.get("PROFILE_MODE", "both").lower()
+
+def get_sample_interval():
+    """Get the sampling interval in seconds (PROFILE_SAMPLE_INTERVAL_MS)."""
+    return float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+def get_profile_dir(job_id):
+    """Get the directory a job's profiles are written to."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, "media", "profiles", job_id)
+
+def is_profile_file(filename):
+    """Check whether a file name is one of the profile files a job can have."""
+    return bool(re.fullmatch(r"[\w.-]+\.(prof|collapsed)", filename))
+
+def _frame_label(code):
+    """Name a frame as `function (package/module.py:line)`."""
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler for one thread.
+
+    Every interval the thread's current stack is read from
+    sys._current_frames() and counted, whether the thread is computing or
+    waiting on an LLM call, a subprocess or a lock; that is what makes a
+    job slow. The counts are written in the collapsed stack format
+    (`root;caller;callee count`) read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, root, path, interval=None):
+        self.thread_id = thread_id
+        self.root = root
+        self.path = path
+        self.interval = interval or get_sample_interval()
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"sampler-{self.root}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and write the stacks."""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        flushed = time.monotonic()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(self.root)
+            self.samples[";".join(reversed(stack))] += 1
+            if time.monotonic() - flushed >= FLUSH_INTERVAL:
+                flushed = time.monotonic()
+                self.flush()
+
+    def flush(self):
+        """Write the stacks sampled so far, replacing the previous write."""
+        write_collapsed(self.path, self.samples)
+
+def write_collapsed(path, samples):
+    """Write collapsed stacks atomically."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(temp_path, path)
+
+def read_collapsed(path):
+    """Read collapsed stacks into a Counter."""
+    samples = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                samples[stack] += int(count)
+    return samples
+
+@contextmanager
+def profile_to(directory, name):
+    """
+    Profile the current thread while the block runs.
+
+    Writes <name>.prof (cProfile, for pstats or snakeviz) and
+    <name>.collapsed (sampled stacks rooted at <name>) into directory,
+    depending on PROFILE_MODE. If cProfile is already running in another
+    thread and the interpreter allows only one, only the samples are taken.
+
+    Args:
+        directory (str): Output directory
+        name (str): Stage name, used as file name and root frame
+    """
+    mode = get_profile_mode()
+    os.makedirs(directory, exist_ok=True)
+    sampler = profiler = None
+    if mode in ("both", "cprofile"):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one cProfile per process; overlapping profiled
+            # jobs fall back to sampling rather than failing the stage
+            logger.warning(f"cProfile unavailable for {name}, sampling only: {e}")
+            profiler = None
+            mode = "sampling"
+    if mode in ("both", "sampling"):
+        sampler = StackSampler(threading.get_ident(), name, os.path.join(directory, f"{name}.collapsed"))
+        sampler.start()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            try:
+                profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+            except Exception as e:
+                logger.warning(f"Could not write profile {name}: {e}")
+        if sampler is not None:
+            try:
+                sampler.stop()
+            except Exception as e:
+                logger.warning(f"Could not write sampled stacks {name}: {e}")
+
+class JobProfiler:
+    """
+    Profiles of one job's stages, merged into one profile when the job ends.
+
+    Each stage (a workflow node, the render, thumbnails, voiceover) is
+    profiled on its own thread. Stages don't nest: cProfile hooks a whole
+    thread, so a stage started inside another one is left to the outer one.
+    """
+
+    def __init__(self, job_id, directory=None):
+        self.job_id = job_id
+        self.directory = directory or get_profile_dir(job_id)
+        self._names = Counter()
+        self._active = threading.local()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """
+        Profile a stage of the job.
+
+        Args:
+            name (str): Stage name; repeats get a numbered suffix
+
+        Returns:
+            A context manager
+        """
+        if getattr(self._active, "stage", None):
+            return nullcontext()
+        with self._lock:
+            self._names[name] += 1
+            if self._names[name] > 1:
+                name = f"{name}-{self._names[name]}"
+        return self._run_stage(name)
+
+    @contextmanager
+    def _run_stage(self, name):
+        self._active.stage = name
+        try:
+            with profile_to(self.directory, name):
+                yield
+        finally:
+            self._active.stage = None
+
+    def finish(self):
+        """
+        Merge the stage profiles, including the render's, into profile.prof and profile.collapsed.
+
+        Returns:
+            list: Paths of the merged files
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        stage_files = sorted(f for f in os.listdir(self.directory)
+                             if is_profile_file(f) and f not in (PSTATS_FILE, COLLAPSED_FILE))
+        paths = []
+
+        stats = None
+        for filename in (f for f in stage_files if f.endswith(".prof")):
+            try:
+                path = os.path.join(self.directory, filename)
+                if stats is None:
+                    stats = pstats.Stats(path)
+                else:
+                    stats.add(path)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable profile {filename}: {e}")
+        if stats is not None:
+            stats.dump_stats(os.path.join(self.directory, PSTATS_FILE))
+            paths.append(os.path.join(self.directory, PSTATS_FILE))
+
+        samples = Counter()
+        for filename in (f for f in stage_files if f.endswith(".collapsed")):
+            samples.update(read_collapsed(os.path.join(self.directory, filename)))
+        if samples:
+            write_collapsed(os.path.join(self.directory, COLLAPSED_FILE), samples)
+            paths.append(os.path.join(self.directory, COLLAPSED_FILE))
+
+        logger.info(f"Profiled job {self.job_id}: {len(stage_files)} stage files, {sum(samples.values())} samples")
+        return paths
+
+class ProfilingSwitch:
+    """
+    Admin toggle that profiles the next jobs started in this process.
+
+    Either a number of jobs or every job until it is turned off.
+    """
+
+    def __init__(self):
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+    def enable(self, jobs=None):
+        """
+        Profile the next jobs.
+
+        Args:
+            jobs (int, optional): Jobs to profile; every job until disabled if not given
+        """
+        with self._lock:
+            self._remaining = -1 if jobs is None else max(int(jobs), 0)
+
+    def disable(self):
+        with self._lock:
+            self._remaining = 0
+
+    def take(self):
+        """Check whether the next job is to be profiled, counting it if so."""
+        if not self._remaining:
+            return False
+        with self._lock:
+            if not self._remaining:
+                return False
+            if self._remaining > 0:
+                self._remaining -= 1
+            return True
+
+    def status(self):
+        with self._lock:
+            remaining = self._remaining
+        return {"enabled": remaining != 0, "remaining_jobs": None if remaining < 0 else remaining,
+                "mode": get_profile_mode(), "sample_interval_ms": get_sample_interval() * 1000}
+
+_switch = ProfilingSwitch()
+_profilers = {}
+_profilers_lock = threading.Lock()
+# Profiler of the job the current code runs for, for code that isn't passed the job id
+_current = contextvars.ContextVar("job_profiler", default=None)
+
+def get_profiling_switch():
+    """Get the admin profiling toggle of this process."""
+    return _switch
+
+def profiling_requested(header_value):
+    """Check whether an X-Profile header value asks for profiling."""
+    return (header_value or "").lower() in ["true", "1", "yes"]
+
+def start_job_profiling(job_id, requested=False):
+    """
+    Start profiling a job if it was requested or the admin toggle is on.
+
+    Returns:
+        JobProfiler: The job's profiler, or None if the job isn't profiled
+    """
+    if requested:
+        PROFILED_JOBS.inc(trigger="request")
+    elif _switch.take():
+        PROFILED_JOBS.inc(trigger="admin")
+    else:
+        return None
+    profiler = JobProfiler(job_id)
+    with _profilers_lock:
+        _profilers[job_id] = profiler
+    logger.info(f"Profiling job {job_id} into {profiler.directory}")
+    return profiler
+
+def get_job_profiler(job_id):
+    """Get the profiler of a job, or None if it isn't profiled."""
+    if not _profilers:
+        return None
+    with _profilers_lock:
+        return _profilers.get(job_id)
+
+def finish_job_profiling(job_id):
+    """
+    Stop tracking a job's profiler and merge its profiles.
+
+    Returns:
+        list: Paths of the merged profile files, empty if the job wasn't profiled
+    """
+    with _profilers_lock:
+        profiler = _profilers.pop(job_id, None)
+    if profiler is None:
+        return []
+    try:
+        return profiler.finish()
+    except Exception as e:
+        logger.error(f"Error merging profiles of job {job_id}: {e}")
+        return []
+
+def job_stage(job_id, name):
+    """Profile a stage of a job if the job is profiled; a no-op otherwise."""
+    profiler = get_job_profiler(job_id)
+    return profiler.stage(name) if profiler else nullcontext()
+
+@contextmanager
+def job_context(job_id):
+    """Make a job's profiler the current one for current_stage() calls in the block."""
+    token = _current.set(get_job_profiler(job_id))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def current_stage(name):
+    """Profile a stage of the current job (see job_context) if it is profiled; a no-op otherwise."""
+    profiler = _current.get()
+    return profiler.stage(name) if profiler else nullcontext()
+
+def profiling_env(env, directory):
+    """Add the profile directory to a render subprocess environment."""
+    if directory:
+        env[PROFILE_ENV_VAR] = directory
+    return env
+
+def profile_render(name, directory=None):
+    """
+    Profile a render process if it was given a profile directory.
+
+    Args:
+        name (str): Stage name, e.g. "render"
+        directory (str, optional): Profile directory. Defaults to RENDER_PROFILE_DIR.
+
+    Returns:
+        A context manager
+    """
+    directory = directory or os.environ.get(PROFILE_ENV_VAR)
+    return profile_to(directory, name) if directory else nullcontext()
@@ -0,0 +1,239 @@
+import logging
+import os
+import re
+import threading
+import zlib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# MinHash signature length and LSH banding (bands * rows must equal NUM_PERM).
+# 16 bands of 8 rows put the LSH candidate threshold at roughly 0.7 Jaccard,
+# the default similarity threshold; a lower one lets unrelated prompts that
+# share common character n-grams through as candidates, which dominates
+# query time in a large index (scripts/bench_prompt_index.py).
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = 8
+
+# Largest prime below 2**32, so (a * x + b) never overflows uint64
+_MERSENNE_PRIME = 4294967291
+
+# Words that describe the request rather than the topic
+STOPWORDS = {
+    "a", "an", "and", "about", "animate", "animation", "can", "describe", "demonstrate",
+    "explain", "explained", "explaining", "explanation", "for", "how", "i", "in", "is",
+    "it", "me", "of", "on", "please", "show", "showing", "the", "to", "video", "visual",
+    "visualize", "visually", "what", "with", "works", "you",
+}
+
+# Crude suffix stripping so "pythagoras" and "pythagorean" share a stem
+SUFFIXES = ("ations", "ation", "ean", "ian", "ing", "ed", "es", "as", "s")
+
+def get_similarity_threshold():
+    """Get the minimum estimated similarity for reusing a previous animation."""
+    return float(os.environ.get("PROMPT_SIMILARITY_THRESHOLD", "0.7"))
+
+def get_reuse_mode():
+    """
+    Get how near-duplicate prompts are handled by /api/generate.
+
+    Returns:
+        str: "return" (default) to return the existing video, "offer" to
+            return the match without generating, or "off" to always generate
+    """
+    return os.environ.get("PROMPT_REUSE_MODE", "return").lower()
+
+def normalize_for_similarity(prompt):
+    """
+    Reduce a prompt to its topic words.
+
+    Lowercases, strips punctuation, drops request filler words and applies
+    light suffix stripping.
+
+    Returns:
+        list: Normalized tokens
+    """
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (prompt or "").lower()):
+        if word in STOPWORDS:
+            continue
+        for suffix in SUFFIXES:
+            if len(word) - len(suffix) >= 4 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+def same_word_order(prompt, other):
+    """
+    Check whether two prompts use the topic words they share in the same order.
+
+    Similarity is computed over sets of words, so "convert celsius to
+    fahrenheit" and "convert fahrenheit to celsius" match perfectly; this
+    tells them apart before a match is returned as the answer.
+    """
+    tokens, other_tokens = normalize_for_similarity(prompt), normalize_for_similarity(other)
+    shared = set(tokens) & set(other_tokens)
+
+    def ordered(words):
+        return list(dict.fromkeys(word for word in words if word in shared))
+
+    return ordered(tokens) == ordered(other_tokens)
+
+def shingles(tokens, n=3):
+    """Get word tokens plus character n-grams of each token as hashed shingles."""
+    import numpy as np
+
+    features = set(tokens)
+    for token in tokens:
+        padded = f"^{token}$"
+        features.update(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint64, count=len(features))
+
+class PromptIndex:
+    """
+    In-memory MinHash/LSH index over previous prompts.
+
+    Inserts are incremental; queries hash the prompt once, look up its LSH
+    bands and only compare signatures of the resulting candidates. numpy is
+    imported on first use, so it isn't loaded at app startup.
+    """
+
+    def __init__(self, seed=1):
+        import numpy as np
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32 - 1, size=NUM_PERM, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32 - 1, size=NUM_PERM, dtype=np.uint64)
+        self._prime = np.uint64(_MERSENNE_PRIME)
+        # Signatures are kept as 16-bit values, which only compare equal by
+        # chance once in 65536 rows but halve the memory per prompt
+        self._signatures = np.empty((1024, NUM_PERM), dtype=np.uint16)
+        self._job_ids = []
+        self._buckets = [dict() for _ in range(LSH_BANDS)]
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._job_ids)
+
+    def signature(self, prompt):
+        """
+        Compute the MinHash signature for a prompt.
+
+        Returns:
+            numpy.ndarray: Signature, or None if the prompt has no topic words
+        """
+        features = shingles(normalize_for_similarity(prompt))
+        if features.size == 0:
+            return None
+        import numpy as np
+
+        hashed = (np.outer(features, self._a) + self._b) % self._prime
+        return hashed.min(axis=0).astype(np.uint16)
+
+    @staticmethod
+    def _band_keys(signature):
+        """Hash each LSH band of a signature."""
+        return [hash(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()) for band in range(LSH_BANDS)]
+
+    def add(self, prompt, job_id):
+        """
+        Insert a prompt into the index.
+
+        Args:
+            prompt (str): Prompt of a completed job
+            job_id (str): Id of the job that produced it
+        """
+        import numpy as np
+
+        signature = self.signature(prompt)
+        if signature is None:
+            return
+        with self._lock:
+            position = len(self._job_ids)
+            if position == len(self._signatures):
+                grown = np.empty((len(self._signatures) * 2, NUM_PERM), dtype=np.uint16)
+                grown[:position] = self._signatures
+                self._signatures = grown
+            self._signatures[position] = signature
+            self._job_ids.append(job_id)
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                existing = bucket.get(key)
+                if existing is None:
+                    bucket[key] = position
+                elif isinstance(existing, list):
+                    existing.append(position)
+                else:
+                    bucket[key] = [existing, position]
+
+    def query(self, prompt, threshold=None, limit=5):
+        """
+        Find previous prompts similar to this one.
+
+        Args:
+            prompt (str): Prompt to look up
+            threshold (float, optional): Minimum estimated Jaccard similarity.
+                Defaults to PROMPT_SIMILARITY_THRESHOLD.
+            limit (int): Maximum number of matches
+
+        Returns:
+            list: (job_id, similarity) tuples, most similar first
+        """
+        import numpy as np
+
+        threshold = get_similarity_threshold() if threshold is None else threshold
+        signature = self.signature(prompt)
+        if signature is None:
+            return []
+
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                found = bucket.get(key)
+                if found is None:
+                    continue
+                if isinstance(found, list):
+                    candidates.update(found)
+                else:
+                    candidates.add(found)
+            if not candidates:
+                return []
+            positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            scores = (self._signatures[positions] == signature).mean(axis=1)
+            job_ids = [self._job_ids[p] for p in positions]
+
+        order = np.argsort(-scores)
+        return [(job_ids[i], float(scores[i])) for i in order[:limit] if scores[i] >= threshold]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_prompt_index():
+    """
+    Get the shared prompt index.
+
+    On first use the index is created and filled from completed jobs in the
+    job store on a background thread, so startup isn't blocked by large histories.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PromptIndex()
+                threading.Thread(target=_load_from_job_store, args=(_index,), daemon=True).start()
+    return _index
+
+def _load_from_job_store(index):
+    """Fill the index with the prompts of completed jobs."""
+    from .job_store import get_job_store
+
+    try:
+        count = 0
+        for job_id, prompt in get_job_store().iter_completed_prompts():
+            index.add(prompt, job_id)
+            count += 1
+        logger.info(f"Loaded {count} prompts into the similarity index")
+    except Exception as e:
+        logger.error(f"Error loading prompt similarity index: {e}")
@@ -0,0 +1,97 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Initialize the bucket full.
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Add the tokens earned since the last update."""
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1.0):
+        """
+        Take tokens if they are available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until they will be available
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (min(tokens, self.capacity) - self._tokens) / self.rate
+
+    def reserve(self, tokens=1.0):
+        """
+        Take tokens now, going into debt if needed.
+
+        Returns:
+            float: Seconds the caller should wait before using the tokens
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0 or self.rate <= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def is_full(self):
+        """Check whether the bucket has refilled completely."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= self.capacity
+
+class KeyedRateLimiter:
+    """Independent token buckets per key (e.g. per client)."""
+
+    # Prune idle buckets once this many keys are tracked
+    MAX_KEYS = 10000
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key, tokens=1.0):
+        """
+        Take tokens from the bucket for a key.
+
+        Returns:
+            float: 0 if allowed, otherwise the seconds until the key may retry
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.MAX_KEYS:
+                    self._prune()
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+        return bucket.try_acquire(tokens)
+
+    def _prune(self):
+        """Drop buckets that have refilled, which behave the same as new ones."""
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full()]:
+            del self._buckets[key]
@@ -0,0 +1,166 @@
+import ast
+import bisect
+import hashlib
+import logging
+import os
+import re
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Mobjects whose rendering is cached per string: LaTeX goes through the Tex
+# cache (a LaTeX compile per miss), plain text through the text cache
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex", "Title", "BulletedList"}
+TEXT_CLASSES = {"Text", "MarkupText", "Paragraph"}
+
+# Scene base classes that say nothing about which template was used
+PLAIN_SCENES = {"Scene", "MovingCameraScene", "ThreeDScene", "ZoomedScene"}
+
+# Marker put in template scenes, see manim_service.get_fallback_template
+TEMPLATE_MARKER = re.compile(r"#\s*template:\s*([\w.-]+)")
+
+# Relative value of keeping each kind of cache warm: a template shares all
+# its cached parts, a LaTeX miss costs a compile, a text miss a Pango render
+KEY_WEIGHTS = {"template": 5, "tex": 3, "text": 1}
+
+def _call_name(node):
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+def extract_cache_keys(manim_code):
+    """
+    Find the cacheable strings and the template a scene uses.
+
+    Args:
+        manim_code (str): Manim scene code
+
+    Returns:
+        list: (kind, value) pairs in order of appearance, kind being
+            "template", "tex" or "text"
+    """
+    keys = [("template", name) for name in TEMPLATE_MARKER.findall(manim_code or "")]
+    try:
+        tree = ast.parse(manim_code or "")
+    except SyntaxError:
+        return keys
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                name = base.id if isinstance(base, ast.Name) else getattr(base, "attr", None)
+                if name and name not in PLAIN_SCENES:
+                    keys.append(("template", name))
+        elif isinstance(node, ast.Call):
+            name = _call_name(node)
+            kind = "tex" if name in TEX_CLASSES else "text" if name in TEXT_CLASSES else None
+            if not kind:
+                continue
+            strings = [
+                arg.value for arg in node.args
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+            ]
+            if strings:
+                keys.append((kind, " ".join(strings)))
+    return keys
+
+def affinity_key(manim_code):
+    """
+    Pick the cache key a render is routed by.
+
+    The key whose warm cache saves the most render work wins: its weight
+    times how often it occurs, earliest first on ties.
+
+    Args:
+        manim_code (str): Manim scene code
+
+    Returns:
+        str: "kind:value" key, or None if the scene uses nothing cacheable
+    """
+    scores = {}
+    for position, (kind, value) in enumerate(extract_cache_keys(manim_code)):
+        score, first = scores.get((kind, value), (0, position))
+        scores[(kind, value)] = (score + KEY_WEIGHTS[kind], first)
+    if not scores:
+        return None
+    kind, value = min(scores, key=lambda key: (-scores[key][0], scores[key][1]))
+    return f"{kind}:{value}"
+
+def _hash(value):
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+class HashRing:
+    """
+    Consistent hash ring over render nodes.
+
+    Each node gets many points on the ring, so adding or removing a node
+    only moves the keys next to its points and the others keep their
+    warm caches.
+    """
+
+    def __init__(self, nodes, replicas=None):
+        """
+        Args:
+            nodes (iterable): Node names
+            replicas (int, optional): Points per node (RENDER_AFFINITY_REPLICAS)
+        """
+        replicas = replicas or int(os.environ.get("RENDER_AFFINITY_REPLICAS", "64"))
+        self.nodes = sorted(set(nodes))
+        self._points = sorted((_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(replicas))
+        self._hashes = [point for point, _ in self._points]
+
+    def preferred(self, key):
+        """
+        Get every node in order of preference for a key.
+
+        Returns:
+            list: Node names, the key's owner first
+        """
+        if not self._points:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key))
+        order = []
+        for offset in range(len(self._points)):
+            node = self._points[(start + offset) % len(self._points)][1]
+            if node not in order:
+                order.append(node)
+                if len(order) == len(self.nodes):
+                    break
+        return order
+
+def choose_placement(key, node, ring, capacity, active, waited, max_wait=None):
+    """
+    Decide whether a node should take a render.
+
+    A render goes to the first node in its preference order that has a free
+    slot: its owner if the owner isn't saturated, else it spills over to
+    the next one. Renders without a key, and renders that have waited longer
+    than max_wait, go to whichever node asks.
+
+    Args:
+        key (str): The render's affinity key, or None
+        node (str): The asking node
+        ring (HashRing): Ring over the live nodes
+        capacity (dict): Node -> live workers
+        active (dict): Node -> renders in progress
+        waited (float): Seconds the render has been queued
+        max_wait (float, optional): Seconds before affinity is ignored (RENDER_AFFINITY_MAX_WAIT)
+
+    Returns:
+        str: "preferred", "spill" or "any" if the node should take it, else None
+    """
+    if max_wait is None:
+        max_wait = float(os.environ.get("RENDER_AFFINITY_MAX_WAIT", "30"))
+    if not key or len(ring.nodes) < 2 or node not in ring.nodes or waited > max_wait:
+        return "any"
+    preferred = ring.preferred(key)
+    for candidate in preferred:
+        if active.get(candidate, 0) < capacity.get(candidate, 0):
+            if candidate != node:
+                return None
+            return "preferred" if candidate == preferred[0] else "spill"
+    # Everyone is saturated, so this node has just freed a slot
+    return "spill"
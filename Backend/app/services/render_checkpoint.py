@@ -0,0 +1,273 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from .render_limits import run_with_timeout
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Environment variable used to hand the checkpoint directory to render subprocesses
+CHECKPOINT_ENV_VAR = "RENDER_CHECKPOINT_DIR"
+
+MANIFEST = "manifest.json"
+
+def checkpoints_enabled():
+    """Check whether renders record finished partial movies so a retry can resume."""
+    return os.environ.get("RENDER_CHECKPOINTS_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+def get_checkpoint_dir(job_id):
+    """Get the checkpoint directory of a job's render."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, "media", "checkpoints", job_id)
+
+def _segment_name(index):
+    return f"segment_{index:05d}.mp4"
+
+class RenderCheckpoint:
+    """
+    Manifest of the partial movies a job's render has finished, in animation order.
+
+    Manim writes one partial movie per play/wait call. The render process
+    copies each one here under its animation index as soon as it is closed,
+    so a render that dies partway can be retried from the first missing
+    index and the final video concatenated from the segments in order.
+    The manifest is tied to the scene code and quality; a render of
+    different code starts over, unless it was seeded with the animations
+    it shares with an earlier job (see seed()).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST)
+
+    @classmethod
+    def for_job(cls, job_id, manim_code, quality):
+        """
+        Open a job's checkpoint, discarding it if it belongs to other code or quality.
+
+        Args:
+            job_id (str): Job id
+            manim_code (str): Scene code being rendered
+            quality (str): Manim quality of the render
+
+        Returns:
+            RenderCheckpoint: The checkpoint
+        """
+        checkpoint = cls(get_checkpoint_dir(job_id))
+        code_hash = hashlib.sha256(manim_code.encode("utf-8")).hexdigest()
+        manifest = checkpoint.load()
+        if manifest.get("code_hash") != code_hash or manifest.get("quality") != quality:
+            if manifest.get("segments"):
+                logger.info(f"Discarding checkpoint of job {job_id}, the scene changed")
+            checkpoint.clear()
+            checkpoint._save({"code_hash": code_hash, "quality": quality, "segments": {}, "plays": None,
+                              "created_at": time.time()})
+        return checkpoint
+
+    def load(self):
+        """Read the manifest, empty if there is none."""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, manifest):
+        """Write the manifest atomically so readers never see a partial file."""
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def record(self, index, partial_path):
+        """
+        Keep a finished partial movie as the segment of an animation index.
+
+        Called in the render process when Manim closes a partial movie.
+
+        Args:
+            index (int): Animation index (play/wait call number)
+            partial_path (str): The partial movie Manim wrote
+        """
+        target = os.path.join(self.directory, _segment_name(index))
+        temp_path = f"{target}.part"
+        shutil.copyfile(partial_path, temp_path)
+        os.replace(temp_path, target)
+        manifest = self.load()
+        manifest.setdefault("segments", {})[str(index)] = {
+            "file": _segment_name(index),
+            "bytes": os.path.getsize(target),
+        }
+        self._save(manifest)
+
+    def seed(self, source, count):
+        """
+        Take over the first animations of another render's checkpoint.
+
+        Used when an edited scene shares its leading animations with the
+        job it was edited from. Segments are never rewritten, so they are
+        hard-linked where the filesystem allows it.
+
+        Args:
+            source (RenderCheckpoint): Checkpoint of the earlier render
+            count (int): Leading animations to take over
+
+        Returns:
+            int: Segments taken over, fewer if the source is missing some,
+                none if it was rendered at another quality
+        """
+        manifest = self.load()
+        if source.load().get("quality") != manifest.get("quality"):
+            return 0
+        segments = source.segments()[:count]
+        recorded = manifest.setdefault("segments", {})
+        os.makedirs(self.directory, exist_ok=True)
+        for index, path in enumerate(segments):
+            target = os.path.join(self.directory, _segment_name(index))
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)
+            recorded[str(index)] = {"file": _segment_name(index), "bytes": os.path.getsize(target)}
+        self._save(manifest)
+        return len(segments)
+
+    def finish(self, plays):
+        """Record that the render reached its end after this many animations."""
+        manifest = self.load()
+        manifest["plays"] = plays
+        self._save(manifest)
+
+    def segments(self):
+        """
+        Get the finished segments from animation 0 up to the first missing one.
+
+        Returns:
+            list: Segment paths in animation order
+        """
+        recorded = self.load().get("segments", {})
+        paths = []
+        while str(len(paths)) in recorded:
+            path = os.path.join(self.directory, recorded[str(len(paths))]["file"])
+            if not os.path.exists(path):
+                break
+            paths.append(path)
+        return paths
+
+    def resume_index(self):
+        """Get the first animation index a retry has to render."""
+        return len(self.segments())
+
+    def is_complete(self):
+        """Check whether every animation of a finished render has its segment."""
+        plays = self.load().get("plays")
+        return plays is not None and len(self.segments()) >= plays
+
+    def assemble(self, output_path):
+        """
+        Concatenate the segments in animation order.
+
+        Every segment comes from the same render settings, so the streams are
+        copied rather than re-encoded.
+
+        Args:
+            output_path (str): Where to write the joined video
+
+        Returns:
+            str: output_path, or None if there are no segments or FFmpeg failed
+        """
+        segments = self.segments()
+        plays = self.load().get("plays")
+        if plays is not None:
+            segments = segments[:plays]
+        if not segments:
+            return None
+        file_list_path = os.path.join(self.directory, "segments.txt")
+        with open(file_list_path, "w", encoding="utf-8") as f:
+            for path in segments:
+                clean_path = path.replace('\\', '/')
+                f.write(f"file '{clean_path}'\n")
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", file_list_path,
+               "-c", "copy", output_path]
+        try:
+            result = run_with_timeout(cmd, float(os.environ.get("FFMPEG_TIMEOUT", "300")))
+        except Exception as e:
+            logger.error(f"Error assembling checkpoint segments: {e}")
+            return None
+        if result.returncode != 0 or not os.path.exists(output_path):
+            logger.error(f"FFmpeg failed to assemble checkpoint segments: {result.stderr}")
+            return None
+        logger.info(f"Assembled {len(segments)} checkpoint segments into {output_path}")
+        return output_path
+
+    def clear(self):
+        """Delete the checkpoint."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def checkpoint_env(env, checkpoint):
+    """Add the checkpoint directory to a render subprocess environment."""
+    if checkpoint is not None:
+        env[CHECKPOINT_ENV_VAR] = checkpoint.directory
+    return env
+
+def install_checkpoint_hook(directory=None):
+    """
+    Record each partial movie Manim finishes in the render's checkpoint.
+
+    Wraps SceneFileWriter.end_animation, which closes the partial movie of
+    the current play/wait call, and SceneFileWriter.finish. Animations
+    served from Manim's own cache are recorded too; animations skipped
+    when resuming have no partial movie and are not.
+
+    Args:
+        directory (str, optional): Checkpoint directory. Defaults to RENDER_CHECKPOINT_DIR.
+
+    Returns:
+        bool: True if the hook was installed
+    """
+    directory = directory or os.environ.get(CHECKPOINT_ENV_VAR)
+    if not directory:
+        return False
+
+    try:
+        from manim.scene.scene_file_writer import SceneFileWriter
+    except ImportError as e:
+        logger.warning(f"Manim not available, render checkpoints not recorded: {e}")
+        return False
+
+    checkpoint = RenderCheckpoint(directory)
+    original_end_animation = SceneFileWriter.end_animation
+    original_finish = SceneFileWriter.finish
+
+    def checkpointed_end_animation(self, allow_write=False):
+        result = original_end_animation(self, allow_write)
+        try:
+            index = self.renderer.num_plays
+            partial_path = self.partial_movie_files[index] if index < len(self.partial_movie_files) else None
+            if partial_path and os.path.exists(partial_path):
+                checkpoint.record(index, partial_path)
+        except Exception as e:
+            logger.warning(f"Could not checkpoint partial movie: {e}")
+        return result
+
+    def checkpointed_finish(self, *args, **kwargs):
+        try:
+            checkpoint.finish(self.renderer.num_plays)
+        except Exception as e:
+            logger.warning(f"Could not record the end of the render: {e}")
+        return original_finish(self, *args, **kwargs)
+
+    SceneFileWriter.end_animation = checkpointed_end_animation
+    SceneFileWriter.finish = checkpointed_finish
+    logger.info(f"Recording render checkpoints in {directory}")
+    return True
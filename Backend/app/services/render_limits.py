@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import signal
+import subprocess
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Environment variable used to hand resource limits to render subprocesses
+LIMITS_ENV_VAR = "RENDER_LIMITS"
+
+class RenderTimeout(Exception):
+    """Raised when a render or encode exceeds its wall-clock timeout."""
+
+def get_render_limits(timeout):
+    """
+    Get the resource limits for one render.
+
+    Args:
+        timeout (float): Wall-clock timeout of the render in seconds
+
+    Returns:
+        dict: cpu_seconds, address_space_bytes and file_size_bytes
+    """
+    cpus_per_render = max(1, int(os.environ.get("RENDER_CPUS_PER_JOB", "1")))
+    return {
+        "cpu_seconds": int(timeout * cpus_per_render) + 10,
+        "address_space_bytes": int(float(os.environ.get("RENDER_MAX_MEMORY_MB", "4096")) * 1024 * 1024),
+        "file_size_bytes": int(float(os.environ.get("RENDER_MAX_FILE_MB", "2048")) * 1024 * 1024),
+    }
+
+def apply_render_limits(limits):
+    """
+    Apply resource limits to the current process.
+
+    Only call this in a dedicated render process; limits can't be raised again.
+
+    Args:
+        limits (dict): Limits as returned by get_render_limits
+    """
+    if not limits:
+        return
+    try:
+        import resource
+    except ImportError:
+        logger.warning("Resource limits are not supported on this platform")
+        return
+
+    for name, key in [
+        ("RLIMIT_CPU", "cpu_seconds"),
+        ("RLIMIT_AS", "address_space_bytes"),
+        ("RLIMIT_FSIZE", "file_size_bytes"),
+    ]:
+        if not limits.get(key) or not hasattr(resource, name):
+            continue
+        limit = getattr(resource, name)
+        _, hard = resource.getrlimit(limit)
+        value = limits[key] if hard == resource.RLIM_INFINITY else min(limits[key], hard)
+        try:
+            resource.setrlimit(limit, (value, hard))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Could not set {name}: {e}")
+
+def apply_render_limits_from_env():
+    """Apply limits passed to this process through the RENDER_LIMITS environment variable."""
+    raw = os.environ.get(LIMITS_ENV_VAR)
+    if raw:
+        apply_render_limits(json.loads(raw))
+
+def limits_env(limits):
+    """Get a copy of the environment that passes limits to a render subprocess."""
+    env = dict(os.environ)
+    env[LIMITS_ENV_VAR] = json.dumps(limits)
+    return env
+
+def _kill_process_group(process):
+    """Kill a subprocess and anything it spawned."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def run_with_timeout(cmd, timeout, cwd=None, env=None):
+    """
+    Run a command with a wall-clock timeout, killing its whole process group on expiry.
+
+    Args:
+        cmd (list): Command to run
+        timeout (float): Timeout in seconds
+        cwd (str, optional): Working directory
+        env (dict, optional): Environment
+
+    Returns:
+        subprocess.CompletedProcess: Result with text stdout/stderr
+
+    Raises:
+        RenderTimeout: If the command didn't finish in time
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",  # Handle encoding errors gracefully
+        cwd=cwd,
+        env=env,
+        start_new_session=os.name == "posix"
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(process)
+        process.communicate()
+        raise RenderTimeout(f"{os.path.basename(cmd[0])} exceeded {timeout:.0f}s timeout")
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
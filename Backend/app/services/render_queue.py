@@ -0,0 +1,502 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from . import metrics
+from .render_scheduler import CLASS_OFFSETS, PRIORITY_STANDARD
+from .render_affinity import HashRing, choose_placement
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Task lifecycle states
+TASK_QUEUED = "queued"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+TASKS = metrics.counter("render_queue_tasks_total", "Render queue task transitions by outcome")
+PLACEMENTS = metrics.counter("render_affinity_placements_total", "Routed leases by placement (preferred, spill, any)")
+REMOTE_PENDING = metrics.gauge("render_queue_pending", "Renders this API process is waiting on")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_tasks (
+    id TEXT PRIMARY KEY,
+    job_id TEXT,
+    payload TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    cost REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    heartbeat_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    affinity TEXT,
+    node TEXT,
+    placement TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_render_tasks_status ON render_tasks (status, lease_expires_at);
+
+CREATE TABLE IF NOT EXISTS render_workers (
+    worker_id TEXT PRIMARY KEY,
+    node TEXT NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+# Columns added after the first release, applied to existing databases on startup
+MIGRATIONS = [
+    ("render_tasks", "affinity", "TEXT"),
+    ("render_tasks", "node", "TEXT"),
+    ("render_tasks", "placement", "TEXT"),
+]
+
+# SQLite's locking (and WAL's shared memory index) doesn't work across hosts on these
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre", "gpfs", "beegfs",
+    "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs", "fuse.s3fs", "fuse.gcsfuse", "fuse.rclone",
+}
+
+def filesystem_type(path):
+    """
+    Get the type of the filesystem a path is on, from /proc/mounts.
+
+    Returns:
+        str: Filesystem type, or None where /proc/mounts isn't available
+    """
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    for mount_point, mount_type in mounts:
+        # Spaces and other special characters are octal escapes in /proc/mounts
+        mount_point = mount_point.encode().decode("unicode_escape")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) >= len(best):
+            best, fstype = mount_point, mount_type
+    return fstype
+
+def affinity_enabled():
+    """Check whether renders are routed to nodes by cache affinity."""
+    return os.environ.get("RENDER_AFFINITY_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+class RenderQueue:
+    """
+    Shared render queue in SQLite.
+
+    API processes enqueue renders; render worker processes lease them. A
+    SQLite database only coordinates processes on one host (WAL mode relies
+    on shared memory, and network filesystems don't honour SQLite's locks),
+    so the API and the workers must run on the same host, or in containers
+    sharing a local volume; a database on a network filesystem is refused.
+    A lease is a
+    visibility timeout: a worker must heartbeat before it expires or the
+    task becomes visible again and another worker picks it up, so a crashed
+    worker's renders are retried. Tasks are leased in the render
+    scheduler's order: priority class offset plus estimated cost, minus
+    time waited.
+    """
+
+    def __init__(self, db_path, max_attempts=None, aging_rate=None):
+        """
+        Initialize the queue.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+            max_attempts (int, optional): Leases per task before it fails (RENDER_QUEUE_MAX_ATTEMPTS)
+            aging_rate (float, optional): Score reduction per second waited (RENDER_AGING_RATE)
+
+        Raises:
+            RuntimeError: If the database is on a network filesystem
+        """
+        fstype = filesystem_type(os.path.dirname(os.path.abspath(db_path)))
+        if fstype in NETWORK_FILESYSTEMS:
+            raise RuntimeError(
+                f"Render queue database {db_path} is on a {fstype} filesystem; SQLite's locking doesn't work "
+                f"across hosts, so RENDER_QUEUE_DB must be on a local disk shared only by this host's processes"
+            )
+        self.db_path = db_path
+        self.max_attempts = max_attempts or int(os.environ.get("RENDER_QUEUE_MAX_ATTEMPTS", "3"))
+        self.aging_rate = aging_rate if aging_rate is not None else float(os.environ.get("RENDER_AGING_RATE", "1.0"))
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        self._migrate(conn)
+        conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _migrate(conn):
+        """Add columns that older databases are missing."""
+        for table, column, definition in MIGRATIONS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if columns and column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        """Get this thread's database connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit, so lease() can take the write lock up front with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_task(row):
+        if row is None:
+            return None
+        task = dict(row)
+        task["payload"] = json.loads(task["payload"])
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+    def enqueue(self, payload, job_id=None, priority=PRIORITY_STANDARD, cost=1.0, affinity=None):
+        """
+        Add a render task.
+
+        Args:
+            payload (dict): JSON-serializable render arguments
+            job_id (str, optional): Job the render belongs to
+            priority (str): Priority class
+            cost (float): Estimated render time in seconds
+            affinity (str, optional): Cache key the render is routed by, see render_affinity
+
+        Returns:
+            str: Task id
+        """
+        if priority not in CLASS_OFFSETS:
+            raise ValueError(f"Unknown priority class: {priority}")
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            """INSERT INTO render_tasks (id, job_id, payload, priority, cost, status, max_attempts,
+                                         created_at, updated_at, affinity)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (task_id, job_id, json.dumps(payload), priority, float(cost), TASK_QUEUED,
+             self.max_attempts, now, now, affinity),
+        )
+        return task_id
+
+    def lease(self, worker_id, visibility_timeout, priorities=None, node=None):
+        """
+        Take the best visible task for this worker, if there is one.
+
+        Queued tasks and tasks whose lease has expired are visible. A task
+        that has used up its attempts is failed instead of leased again.
+        With affinity routing, a task is only taken if this worker's node is
+        the first node in the task's preference order with a free slot, so
+        renders sharing cache keys keep landing on the same warm node.
+
+        Args:
+            worker_id (str): Id of the leasing worker
+            visibility_timeout (float): Seconds until the lease expires without a heartbeat
+            priorities (list, optional): Only lease these priority classes
+            node (str, optional): Host the worker runs on; its caches are shared by the host's workers
+
+        Returns:
+            dict: The leased task, or None
+        """
+        conn = self._connect()
+        now = time.time()
+        offsets = " ".join(f"WHEN '{name}' THEN {offset}" for name, offset in CLASS_OFFSETS.items())
+        classes = ""
+        params = [now, self.aging_rate, TASK_QUEUED, TASK_LEASED, now]
+        if priorities:
+            classes = f"AND priority IN ({', '.join('?' for _ in priorities)})"
+            params.extend(priorities)
+        routed = bool(node) and affinity_enabled()
+        scan = int(os.environ.get("RENDER_AFFINITY_SCAN", "50")) if routed else 1
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if node:
+                self._touch_worker(conn, worker_id, node, now)
+            if routed:
+                ring, capacity, active = self._nodes(conn, now, visibility_timeout)
+            while True:
+                rows = conn.execute(
+                    f"""SELECT *, (CASE priority {offsets} ELSE 0 END) + cost - (? - created_at) * ? AS score
+                        FROM render_tasks
+                        WHERE (status = ? OR (status = ? AND lease_expires_at < ?)) {classes}
+                        ORDER BY score, created_at LIMIT ?""",
+                    (*params, scan),
+                ).fetchall()
+                gave_up = False
+                for row in rows:
+                    if row["status"] == TASK_LEASED:
+                        logger.warning(f"Lease of render task {row['id']} by {row['worker_id']} expired")
+                        TASKS.inc(outcome="expired")
+                    if row["attempts"] >= row["max_attempts"]:
+                        conn.execute(
+                            "UPDATE render_tasks SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                            (TASK_FAILED, f"Gave up after {row['attempts']} attempts", now, row["id"]),
+                        )
+                        TASKS.inc(outcome="failed")
+                        gave_up = True
+                        continue
+                    placement = None
+                    if routed:
+                        placement = choose_placement(
+                            row["affinity"], node, ring, capacity, active, now - row["created_at"]
+                        )
+                        if placement is None:
+                            continue
+                    conn.execute(
+                        """UPDATE render_tasks SET status = ?, worker_id = ?, attempts = attempts + 1,
+                                  lease_expires_at = ?, heartbeat_at = ?, updated_at = ?, node = ?, placement = ?
+                           WHERE id = ?""",
+                        (TASK_LEASED, worker_id, now + visibility_timeout, now, now, node, placement, row["id"]),
+                    )
+                    conn.execute("COMMIT")
+                    TASKS.inc(outcome="leased")
+                    if placement:
+                        PLACEMENTS.inc(placement=placement)
+                    return self.get(row["id"])
+                # Failed tasks left the candidates, so look again past them
+                if not gave_up:
+                    conn.execute("COMMIT")
+                    return None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _touch_worker(conn, worker_id, node, now):
+        conn.execute(
+            """INSERT INTO render_workers (worker_id, node, last_seen) VALUES (?, ?, ?)
+               ON CONFLICT (worker_id) DO UPDATE SET node = excluded.node, last_seen = excluded.last_seen""",
+            (worker_id, node, now),
+        )
+
+    def _nodes(self, conn, now, visibility_timeout):
+        """
+        Get the live nodes with their capacity (live workers) and renders in progress.
+
+        Returns:
+            tuple: (HashRing, {node: capacity}, {node: active renders})
+        """
+        capacity = {row["node"]: row["n"] for row in conn.execute(
+            "SELECT node, COUNT(*) AS n FROM render_workers WHERE last_seen >= ? GROUP BY node",
+            (now - visibility_timeout,),
+        )}
+        active = {row["node"]: row["n"] for row in conn.execute(
+            """SELECT node, COUNT(*) AS n FROM render_tasks
+               WHERE status = ? AND lease_expires_at >= ? AND node IS NOT NULL GROUP BY node""",
+            (TASK_LEASED, now),
+        )}
+        return HashRing(capacity), capacity, active
+
+    def unregister_worker(self, worker_id):
+        """Remove a stopping worker from the live workers."""
+        self._connect().execute("DELETE FROM render_workers WHERE worker_id = ?", (worker_id,))
+
+    def heartbeat(self, task_id, worker_id, visibility_timeout):
+        """
+        Extend a lease.
+
+        Returns:
+            bool: False if the worker no longer holds the lease
+        """
+        now = time.time()
+        conn = self._connect()
+        # A busy worker is still alive, and its node still has capacity
+        conn.execute("UPDATE render_workers SET last_seen = ? WHERE worker_id = ?", (now, worker_id))
+        cursor = conn.execute(
+            """UPDATE render_tasks SET lease_expires_at = ?, heartbeat_at = ?, updated_at = ?
+               WHERE id = ? AND worker_id = ? AND status = ?""",
+            (now + visibility_timeout, now, now, task_id, worker_id, TASK_LEASED),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, result):
+        """
+        Record a finished render.
+
+        Returns:
+            bool: False if the lease was lost and the result discarded
+        """
+        return self._finish(task_id, worker_id, TASK_DONE, result=json.dumps(result), error=None)
+
+    def fail(self, task_id, worker_id, error, retry=True):
+        """
+        Record a failed attempt. The task is queued again while it has attempts left.
+
+        Returns:
+            bool: False if the lease was lost
+        """
+        task = self.get(task_id)
+        if retry and task and task["attempts"] < task["max_attempts"]:
+            TASKS.inc(outcome="retried")
+            return self._finish(task_id, worker_id, TASK_QUEUED, result=None, error=str(error))
+        return self._finish(task_id, worker_id, TASK_FAILED, result=None, error=str(error))
+
+    def _finish(self, task_id, worker_id, status, result, error):
+        now = time.time()
+        cursor = self._connect().execute(
+            """UPDATE render_tasks SET status = ?, result = ?, error = ?, lease_expires_at = NULL,
+                      updated_at = ?
+               WHERE id = ? AND worker_id = ? AND status = ?""",
+            (status, result, error, now, task_id, worker_id, TASK_LEASED),
+        )
+        if cursor.rowcount != 1:
+            logger.warning(f"Worker {worker_id} no longer holds render task {task_id}")
+            return False
+        if status != TASK_QUEUED:
+            TASKS.inc(outcome=status)
+        return True
+
+    def get(self, task_id):
+        """Get a task by id, or None."""
+        row = self._connect().execute("SELECT * FROM render_tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_task(row)
+
+    def get_statuses(self, task_ids):
+        """
+        Get the status, result and error of many tasks in one query.
+
+        Returns:
+            dict: task id -> task dict
+        """
+        if not task_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in task_ids)
+        rows = self._connect().execute(
+            f"SELECT * FROM render_tasks WHERE id IN ({placeholders})", list(task_ids)
+        ).fetchall()
+        return {row["id"]: self._row_to_task(row) for row in rows}
+
+    def stats(self):
+        """Count tasks by status, list live nodes and workers, and break leases down by placement."""
+        conn = self._connect()
+        counts = {row["status"]: row["n"] for row in conn.execute(
+            "SELECT status, COUNT(*) AS n FROM render_tasks GROUP BY status"
+        )}
+        workers = [dict(row) for row in conn.execute(
+            """SELECT w.worker_id, w.node, w.last_seen, COUNT(t.id) AS tasks
+               FROM render_workers w LEFT JOIN render_tasks t ON t.worker_id = w.worker_id AND t.status = ?
+               GROUP BY w.worker_id ORDER BY w.node, w.worker_id""",
+            (TASK_LEASED,),
+        )]
+        # How often renders landed on their preferred (warm) node
+        placements = {row["placement"] or "unrouted": row["n"] for row in conn.execute(
+            "SELECT placement, COUNT(*) AS n FROM render_tasks WHERE node IS NOT NULL GROUP BY placement"
+        )}
+        return {"tasks": counts, "workers": workers, "placements": placements}
+
+    def purge(self, older_than):
+        """Delete finished tasks last updated more than older_than seconds ago."""
+        cutoff = time.time() - older_than
+        cursor = self._connect().execute(
+            "DELETE FROM render_tasks WHERE status IN (?, ?) AND updated_at < ?",
+            (TASK_DONE, TASK_FAILED, cutoff),
+        )
+        return cursor.rowcount
+
+class RenderQueueClient:
+    """
+    API-side handle on the render queue.
+
+    submit() enqueues a render and returns a Future. A single poller thread
+    checks all pending tasks each interval and resolves their futures, so
+    waiting jobs don't each hold a polling thread.
+    """
+
+    def __init__(self, queue, poll_interval=None):
+        self.queue = queue
+        self.poll_interval = poll_interval or float(os.environ.get("RENDER_QUEUE_POLL_INTERVAL", "1"))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, payload, job_id=None, priority=PRIORITY_STANDARD, cost=1.0, affinity=None):
+        """
+        Queue a render for the workers.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the task's result dict, or
+                raises RuntimeError if the task failed
+        """
+        task_id = self.queue.enqueue(payload, job_id=job_id, priority=priority, cost=cost, affinity=affinity)
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            self._pending[task_id] = future
+            REMOTE_PENDING.set(len(self._pending))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name="render-queue-poller", daemon=True)
+                self._thread.start()
+        return future
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                task_ids = list(self._pending)
+            if not task_ids:
+                continue
+            try:
+                tasks = self.queue.get_statuses(task_ids)
+            except Exception as e:
+                logger.error(f"Error polling render queue: {e}")
+                continue
+            for task_id, task in tasks.items():
+                if task["status"] not in (TASK_DONE, TASK_FAILED):
+                    continue
+                with self._lock:
+                    future = self._pending.pop(task_id, None)
+                    REMOTE_PENDING.set(len(self._pending))
+                if future is None:
+                    continue
+                if task["status"] == TASK_DONE:
+                    future.set_result(task["result"])
+                else:
+                    future.set_exception(RuntimeError(f"Render task {task_id} failed: {task['error']}"))
+
+def get_render_backend():
+    """Get where renders run: "local" (this process's scheduler) or "queue" (render workers)."""
+    return os.environ.get("RENDER_BACKEND", "local").lower()
+
+def get_render_queue_path():
+    """Get the render queue database, shared by the API and the workers."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.environ.get("RENDER_QUEUE_DB", os.path.join(project_root, "instance", "render_queue.sqlite"))
+
+_queue = None
+_client = None
+_queue_lock = threading.Lock()
+
+def get_render_queue():
+    """Get the shared render queue."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = RenderQueue(get_render_queue_path())
+    return _queue
+
+def get_render_queue_client():
+    """Get this process's render queue client."""
+    global _client
+    if _client is None:
+        queue = get_render_queue()
+        with _queue_lock:
+            if _client is None:
+                _client = RenderQueueClient(queue)
+    return _client
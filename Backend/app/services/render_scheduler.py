@@ -0,0 +1,184 @@
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from . import metrics
+from .admission import get_admission_controller
+from .tracing import record_span, CATEGORY_QUEUE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_STANDARD = "standard"
+PRIORITY_BATCH = "batch"
+
+# Head start in seconds of estimated work each class gets over the next one.
+# A job's score is offset + estimated cost - waited seconds * aging rate, and
+# the lowest score runs first, so classes are strict until aging catches up.
+CLASS_OFFSETS = {
+    PRIORITY_INTERACTIVE: 0.0,
+    PRIORITY_STANDARD: 300.0,
+    PRIORITY_BATCH: 3600.0,
+}
+
+QUEUED = metrics.gauge("render_scheduler_queued", "Renders waiting in the scheduler")
+WAIT = metrics.histogram("render_scheduler_wait_seconds", "Time renders spent waiting in the scheduler")
+DURATION = metrics.histogram("render_scheduler_duration_seconds", "Time renders spent running")
+
+class _Task:
+    """A render waiting in the scheduler."""
+
+    __slots__ = ("seq", "fn", "args", "kwargs", "priority", "cost", "submitted", "submitted_ns", "context", "future")
+
+    def __init__(self, seq, fn, args, kwargs, priority, cost):
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.cost = cost
+        self.submitted = time.monotonic()
+        self.submitted_ns = time.time_ns()
+        # The render runs in the submitter's context, e.g. inside its job's trace
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+class RenderScheduler:
+    """
+    Priority scheduler for renders.
+
+    Runs renders on a fixed pool of worker threads. Within a priority class
+    the shortest expected job runs first; waiting jobs age so batch work is
+    never starved. A number of workers can be reserved for interactive jobs.
+    """
+
+    def __init__(self, workers=None, aging_rate=None, reserved_interactive=None):
+        """
+        Initialize the scheduler. Unset arguments come from the environment.
+
+        Args:
+            workers (int, optional): Worker threads. Defaults to the admission render limit.
+            aging_rate (float, optional): Score reduction per second waited (RENDER_AGING_RATE)
+            reserved_interactive (int, optional): Workers that only run interactive jobs
+                (RENDER_INTERACTIVE_RESERVED)
+        """
+        self.workers = workers or get_admission_controller().render_limit
+        self.aging_rate = aging_rate if aging_rate is not None else float(os.environ.get("RENDER_AGING_RATE", "1.0"))
+        if reserved_interactive is None:
+            reserved_interactive = int(os.environ.get("RENDER_INTERACTIVE_RESERVED", "1" if self.workers > 2 else "0"))
+        self.reserved_interactive = min(reserved_interactive, self.workers - 1)
+
+        self._pending = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def _start(self):
+        """Start the worker threads on first use."""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            interactive_only = index < self.reserved_interactive
+            thread = threading.Thread(
+                target=self._worker, args=(interactive_only,), name=f"render-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _score(self, task, now):
+        """Lower scores run first."""
+        waited = now - task.submitted
+        return CLASS_OFFSETS[task.priority] + task.cost - waited * self.aging_rate
+
+    def submit(self, fn, *args, priority=PRIORITY_STANDARD, cost=1.0, **kwargs):
+        """
+        Queue a render.
+
+        Args:
+            fn (callable): Render function to run
+            priority (str): One of interactive, standard or batch
+            cost (float): Estimated render time in seconds
+
+        Returns:
+            concurrent.futures.Future: Resolves to fn's return value
+        """
+        if priority not in CLASS_OFFSETS:
+            raise ValueError(f"Unknown priority class: {priority}")
+        task = _Task(next(self._seq), fn, args, kwargs, priority, float(cost))
+        with self._cond:
+            self._start()
+            self._pending.append(task)
+            QUEUED.set(len(self._pending))
+            self._cond.notify_all()
+        return task.future
+
+    def _next_task(self, interactive_only):
+        """Pop the best task this worker may run, or None if there isn't one."""
+        now = time.monotonic()
+        candidates = [
+            t for t in self._pending
+            if not interactive_only or t.priority == PRIORITY_INTERACTIVE
+        ]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda t: (self._score(t, now), t.seq))
+        self._pending.remove(best)
+        QUEUED.set(len(self._pending))
+        return best
+
+    def _worker(self, interactive_only):
+        """Run tasks until the process exits."""
+        while True:
+            with self._cond:
+                task = self._next_task(interactive_only)
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_task(interactive_only)
+
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            WAIT.observe(time.monotonic() - task.submitted, priority=task.priority)
+            started = time.monotonic()
+            try:
+                # Render slots still apply so renders wait for memory headroom
+                with get_admission_controller().render_slot():
+                    result = task.context.run(self._run, task)
+            except BaseException as e:
+                task.future.set_exception(e)
+            else:
+                task.future.set_result(result)
+            finally:
+                DURATION.observe(time.monotonic() - started, priority=task.priority)
+
+    @staticmethod
+    def _run(task):
+        """Run a task in its submitter's context, recording how long it waited."""
+        record_span("render.queue_wait", task.submitted_ns, category=CATEGORY_QUEUE,
+                    priority=task.priority, cost=task.cost)
+        return task.fn(*task.args, **task.kwargs)
+
+    def queued(self):
+        """Get the number of queued renders per priority class."""
+        with self._cond:
+            counts = {name: 0 for name in CLASS_OFFSETS}
+            for task in self._pending:
+                counts[task.priority] += 1
+            return counts
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_render_scheduler():
+    """Get the shared render scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RenderScheduler()
+    return _scheduler
@@ -0,0 +1,521 @@
+import ast
+import logging
+import os
+import re
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Manim's default run_time for self.play(...) and duration for self.wait()
+DEFAULT_PLAY_SECONDS = 1.0
+DEFAULT_WAIT_SECONDS = 1.0
+
+# Matches "Scene duration: 10 seconds", "Duration - 8-12 sec", "(15s)" and similar
+_DURATION_PATTERN = re.compile(
+    r"(?:duration[^0-9\n]{0,20})?(\d+(?:\.\d+)?)(?:\s*(?:-|to)\s*(\d+(?:\.\d+)?))?\s*(?:seconds|secs|sec|s)\b",
+    re.IGNORECASE,
+)
+
+def estimate_plan_duration(scene_plan):
+    """
+    Estimate the total video duration from the scene planner's breakdown.
+
+    Sums every "N seconds" (or the midpoint of "N-M seconds") mentioned on
+    lines that talk about duration; falls back to all mentions if none do.
+
+    Args:
+        scene_plan (str): Scene plan produced by the scene planner node
+
+    Returns:
+        float: Estimated duration in seconds, or 0 if none was found
+    """
+    if not scene_plan:
+        return 0.0
+
+    def total(lines):
+        seconds = 0.0
+        for line in lines:
+            for match in _DURATION_PATTERN.finditer(line):
+                low = float(match.group(1))
+                high = float(match.group(2)) if match.group(2) else low
+                seconds += (low + high) / 2
+        return seconds
+
+    lines = scene_plan.splitlines()
+    duration_lines = [line for line in lines if "duration" in line.lower()]
+    return total(duration_lines) or total(lines)
+
+# Constant expressions folding to more than this count as unbounded
+MAX_FOLDED_NUMBER = 10 ** 12
+
+_FOLDED_OPERATORS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.Pow: lambda a, b: a ** b,
+}
+
+def _fold_number(node, names=None, depth=0):
+    """
+    Evaluate a constant arithmetic expression such as 30, 2 * 15 or 10**9.
+
+    Names assigned exactly once in the scene are followed when given. Results
+    beyond MAX_FOLDED_NUMBER come back as infinity.
+
+    Returns:
+        float: The value, or None if the expression isn't constant
+    """
+    if node is None or depth > 50:
+        return None
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if isinstance(node, ast.Name) and names and node.id in names:
+        return _fold_number(names[node.id], names, depth + 1)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _fold_number(node.operand, names, depth + 1)
+        if value is None:
+            return None
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and type(node.op) in _FOLDED_OPERATORS:
+        left = _fold_number(node.left, names, depth + 1)
+        right = _fold_number(node.right, names, depth + 1)
+        if left is None or right is None:
+            return None
+        if isinstance(node.op, ast.Pow) and abs(left) > 1 and right > 64:
+            return float("inf")
+        try:
+            value = _FOLDED_OPERATORS[type(node.op)](left, right)
+        except (ZeroDivisionError, OverflowError, ValueError):
+            return float("inf") if isinstance(node.op, ast.Pow) else None
+        if isinstance(value, complex):
+            return None
+        return value if abs(value) <= MAX_FOLDED_NUMBER else float("inf")
+    return None
+
+def _literal_number(node, default):
+    """Get a constant number from an AST node, or the default if it isn't one."""
+    value = _fold_number(node)
+    return default if value is None else value
+
+def _is_self_call(node, method):
+    """Check whether a node is a call to self.<method>(...)."""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == method
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+    )
+
+def _wait_duration_node(node):
+    """Get the duration argument node of a self.wait(...) call, if any."""
+    if node.args:
+        return node.args[0]
+    return next((kw.value for kw in node.keywords if kw.arg == "duration"), None)
+
+def _run_time_node(node):
+    """Get the run_time keyword node of a call, if any."""
+    return next((kw.value for kw in node.keywords if kw.arg == "run_time"), None)
+
+def get_scene_limits():
+    """
+    Get the static limits generated scenes must stay within.
+
+    Returns:
+        dict: Per-call caps (clamped) and scene totals (rejected above)
+    """
+    return {
+        "max_wait_seconds": float(os.environ.get("SCENE_MAX_WAIT_SECONDS", "30")),
+        "max_run_time_seconds": float(os.environ.get("SCENE_MAX_RUN_TIME_SECONDS", "30")),
+        "max_scene_seconds": float(os.environ.get("SCENE_MAX_SECONDS", "600")),
+        "max_animations": int(os.environ.get("SCENE_MAX_ANIMATIONS", "500")),
+        "max_mobjects": int(os.environ.get("SCENE_MAX_MOBJECTS", "5000")),
+    }
+
+# Capitalized calls that create animations rather than mobjects
+ANIMATION_NAMES = {
+    "AnimationGroup", "ApplyMethod", "Circumscribe", "Create", "DrawBorderThenFill", "FadeIn",
+    "FadeOut", "FadeTransform", "Flash", "GrowArrow", "GrowFromCenter", "GrowFromEdge",
+    "GrowFromPoint", "Indicate", "LaggedStart", "MoveToTarget", "ReplacementTransform",
+    "Rotate", "Rotating", "ShowPassingFlash", "SpinInFromNothing", "Succession", "Transform",
+    "TransformMatchingShapes", "TransformMatchingTex", "Uncreate", "Unwrite", "Wiggle", "Write",
+}
+
+# Iterations assumed for loops over collections whose length can't be read
+# from the code; they hold objects the scene already built, which the mobject
+# limit bounds. Loops whose count is a number that can't be worked out, such
+# as range(n), are treated as unbounded instead.
+UNKNOWN_LOOP_ITERATIONS = 10
+
+# Calls that pass the length of their (first) argument through
+_LENGTH_PRESERVING = {"enumerate", "reversed", "sorted", "list", "tuple", "set", "iter", "frozenset"}
+# Capitalized calls whose length is the number of mobjects passed in
+_GROUP_NAMES = {"VGroup", "Group", "VDict"}
+
+def _call_name(node):
+    """Get the bare name of a called function, e.g. "count" for itertools.count(...)."""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+def _single_assignments(tree):
+    """
+    Map names assigned exactly once in the code to the assigned value node.
+
+    Names that are reassigned, augmented or used as loop targets are left
+    out since their value isn't known from a single assignment.
+    """
+    values = {}
+    counts = {}
+    for node in ast.walk(tree):
+        targets = []
+        if isinstance(node, ast.Assign):
+            targets = [(target, node.value) for target in node.targets]
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [(node.target, node.value)]
+        elif isinstance(node, (ast.AugAssign, ast.For, ast.comprehension, ast.NamedExpr)):
+            targets = [(node.target, None)]
+        for target, value in targets:
+            for name in ast.walk(target):
+                if isinstance(name, ast.Name):
+                    counts[name.id] = counts.get(name.id, 0) + 1
+                    values[name.id] = value if name is target else None
+    return {name: value for name, value in values.items() if counts[name] == 1 and value is not None}
+
+def _range_iterations(node, names):
+    """Count the iterations of a range(...) call, or None if its bounds aren't constant."""
+    bounds = [_fold_number(arg, names) for arg in node.args]
+    if not bounds or None in bounds or node.keywords:
+        return None
+    start, stop, step = (0.0, bounds[0], 1.0) if len(bounds) == 1 else (bounds + [1.0])[:3]
+    if not step:
+        return None
+    count = (stop - start) / step
+    if count != count or count == float("inf"):
+        return float("inf")
+    return max(0, int(count + 0.999))
+
+def _collection_length(node, names, depth=0):
+    """
+    Work out how many items iterating over node yields.
+
+    Returns:
+        float: The length (infinity for endless iterators), None when it is a
+            number that can't be worked out, or UNKNOWN_LOOP_ITERATIONS for a
+            collection of unknown size
+    """
+    if depth > 50:
+        return UNKNOWN_LOOP_ITERATIONS
+    if isinstance(node, ast.Name) and node.id in names:
+        return _collection_length(names[node.id], names, depth + 1)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes)):
+        return len(node.value)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return _sum_lengths(node.elts, names, depth)
+    if isinstance(node, ast.Dict):
+        return len(node.keys)
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        return _product(_collection_length(g.iter, names, depth + 1) for g in node.generators)
+    if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+        return _collection_length(node.value, names, depth + 1)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        # [x] * n repeats the list n times
+        for sequence, count in ((node.left, node.right), (node.right, node.left)):
+            times = _fold_number(count, names)
+            if times is not None and _fold_number(sequence, names) is None:
+                return _product([_collection_length(sequence, names, depth + 1), times])
+        return UNKNOWN_LOOP_ITERATIONS
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return _sum_lengths([node.left, node.right], names, depth)
+    if isinstance(node, ast.Call):
+        name = _call_name(node)
+        if name == "range":
+            return _range_iterations(node, names)
+        if name in ("count", "cycle") or (name == "repeat" and len(node.args) < 2) or (name == "iter" and len(node.args) == 2):
+            # itertools.count(), cycle(...), repeat(x) and iter(f, sentinel) never end by themselves
+            return float("inf")
+        if name == "repeat":
+            times = _fold_number(node.args[1], names)
+            return None if times is None else max(0, times)
+        if name in _LENGTH_PRESERVING and len(node.args) == 1:
+            return _collection_length(node.args[0], names, depth + 1)
+        if name == "zip" and node.args:
+            lengths = [_collection_length(arg, names, depth + 1) for arg in node.args]
+            return None if None in lengths else min(lengths)
+        if name in _GROUP_NAMES:
+            return _sum_lengths(node.args, names, depth)
+    return UNKNOWN_LOOP_ITERATIONS
+
+def _sum_lengths(elements, names, depth):
+    """Count the items of a literal, where *starred elements add their own length."""
+    total = 0
+    for element in elements:
+        if isinstance(element, ast.Starred):
+            length = _collection_length(element.value, names, depth + 1)
+            if length is None:
+                return None
+            total += length
+        else:
+            total += 1
+    return total
+
+def _product(lengths):
+    """Multiply loop lengths; None (unresolved) wins over everything else."""
+    total = 1
+    for length in lengths:
+        if length is None:
+            return None
+        total *= max(1, length)
+    return total
+
+def _loop_iterations(iter_node, names=None):
+    """
+    Estimate how many times a loop over iter_node runs.
+
+    Returns:
+        float: Iterations, or None if the count is a number that can't be
+            worked out or the loop never ends
+    """
+    iterations = _collection_length(iter_node, names or {})
+    if iterations is None or iterations == float("inf"):
+        return None
+    return int(iterations)
+
+def _animates(node):
+    """Check whether a node contains self.play/self.wait calls."""
+    return any(_is_self_call(child, "play") or _is_self_call(child, "wait") for child in ast.walk(node))
+
+class _SceneAnalyzer(ast.NodeVisitor):
+    """Walks scene code tallying animations, video time and mobjects, weighted by loop counts."""
+
+    def __init__(self, names=None):
+        self.names = names or {}
+        self.multiplier = 1
+        self.stats = {
+            "plays": 0, "waits": 0, "seconds": 0.0, "mobjects": 0,
+            "unbounded_loops": 0, "longest_call_seconds": 0.0,
+        }
+
+    def _visit_loop_body(self, iterations, node):
+        if iterations is None:
+            self.stats["unbounded_loops"] += 1
+            iterations = UNKNOWN_LOOP_ITERATIONS
+        previous = self.multiplier
+        self.multiplier *= max(1, iterations)
+        self.generic_visit(node)
+        self.multiplier = previous
+
+    def visit_For(self, node):
+        self._visit_loop_body(_loop_iterations(node.iter, self.names), node)
+
+    def visit_While(self, node):
+        try:
+            always_true = bool(ast.literal_eval(node.test))
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            always_true = None
+        if always_true is False:
+            return
+        if always_true and not any(isinstance(child, ast.Break) for child in ast.walk(node)):
+            self._visit_loop_body(None, node)
+        elif always_true is None and _animates(node):
+            # How often a conditional loop runs can't be read from the code,
+            # so one that animates could be as long as any limit
+            self._visit_loop_body(None, node)
+        else:
+            self._visit_loop_body(UNKNOWN_LOOP_ITERATIONS, node)
+
+    def _visit_comprehension(self, node):
+        self._visit_loop_body(_product(_loop_iterations(g.iter, self.names) for g in node.generators), node)
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def _add_seconds(self, seconds):
+        self.stats["seconds"] += seconds * self.multiplier
+        self.stats["longest_call_seconds"] = max(self.stats["longest_call_seconds"], seconds)
+
+    def _seconds(self, node, default):
+        if node is None:
+            return default
+        if isinstance(node, ast.Call) and _call_name(node) == "min":
+            # Clamped durations run for at most their smallest constant argument
+            caps = [value for value in (_fold_number(arg, self.names) for arg in node.args) if value is not None]
+            return min(caps) if caps else default
+        value = _fold_number(node, self.names)
+        return default if value is None else value
+
+    def visit_Call(self, node):
+        if _is_self_call(node, "play"):
+            self.stats["plays"] += self.multiplier
+            self._add_seconds(self._seconds(_run_time_node(node), DEFAULT_PLAY_SECONDS))
+        elif _is_self_call(node, "wait"):
+            self.stats["waits"] += self.multiplier
+            self._add_seconds(self._seconds(_wait_duration_node(node), DEFAULT_WAIT_SECONDS))
+        elif isinstance(node.func, ast.Name) and node.func.id[:1].isupper() and node.func.id not in ANIMATION_NAMES:
+            self.stats["mobjects"] += self.multiplier
+        self.generic_visit(node)
+
+def analyze_scene(manim_code):
+    """
+    Statically analyze scene code.
+
+    Counts self.play/self.wait calls, the video time they add up to, and
+    mobject constructor calls, multiplying by loop iteration counts.
+    Constant loop bounds are folded (range(10**9), range(n) with n = 5);
+    loops whose count can't be worked out, or that never end, are counted
+    as unbounded.
+
+    Args:
+        manim_code (str): Manim scene code
+
+    Returns:
+        dict: plays, waits, seconds, mobjects, unbounded_loops and
+            longest_call_seconds (longest single play/wait)
+    """
+    try:
+        tree = ast.parse(manim_code or "")
+    except SyntaxError:
+        return _SceneAnalyzer().stats
+    analyzer = _SceneAnalyzer(_single_assignments(tree))
+    analyzer.visit(tree)
+    return analyzer.stats
+
+def count_animation_calls(manim_code):
+    """
+    Count self.play/self.wait calls and the video time they add up to.
+
+    Args:
+        manim_code (str): Manim scene code
+
+    Returns:
+        dict: plays, waits and seconds (total run_time/wait time)
+    """
+    stats = analyze_scene(manim_code)
+    return {"plays": stats["plays"], "waits": stats["waits"], "seconds": stats["seconds"]}
+
+class SceneRejected(Exception):
+    """Raised when generated scene code exceeds the static cost limits."""
+
+class _DurationClamp(ast.NodeTransformer):
+    """Caps self.wait durations and run_time arguments at the per-call limits."""
+
+    def __init__(self, max_wait, max_run_time):
+        self.max_wait = max_wait
+        self.max_run_time = max_run_time
+        self.clamped = 0
+
+    def _clamp(self, node, limit):
+        if (
+            isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "min"
+            and node.args and _literal_number(node.args[-1], limit + 1) <= limit
+        ):
+            # Already capped by an earlier pass
+            return node
+        value = _literal_number(node, None)
+        if value is not None:
+            if value <= limit:
+                return node
+            self.clamped += 1
+            return ast.Constant(value=limit)
+        # Non-literal durations are wrapped so they can't exceed the limit at runtime
+        self.clamped += 1
+        return ast.Call(func=ast.Name(id="min", ctx=ast.Load()), args=[node, ast.Constant(value=limit)], keywords=[])
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if _is_self_call(node, "wait"):
+            if node.args:
+                node.args[0] = self._clamp(node.args[0], self.max_wait)
+            for kw in node.keywords:
+                if kw.arg == "duration":
+                    kw.value = self._clamp(kw.value, self.max_wait)
+        for kw in node.keywords:
+            if kw.arg == "run_time":
+                kw.value = self._clamp(kw.value, self.max_run_time)
+        return node
+
+def enforce_scene_limits(manim_code, limits=None):
+    """
+    Clamp or reject scene code that would take an absurd amount of work to render.
+
+    Single waits and run_times above the per-call caps are clamped; scenes
+    whose totals are still over the limits, or that loop forever, are rejected.
+
+    Args:
+        manim_code (str): Manim scene code
+        limits (dict, optional): Limits as returned by get_scene_limits
+
+    Returns:
+        tuple: (possibly rewritten code, analysis dict of the returned code)
+
+    Raises:
+        SceneRejected: If the scene is over the limits after clamping
+    """
+    limits = limits or get_scene_limits()
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        # Syntax problems are handled by sanitization and the renderer's own errors
+        return manim_code, analyze_scene("")
+
+    clamp = _DurationClamp(limits["max_wait_seconds"], limits["max_run_time_seconds"])
+    tree = clamp.visit(tree)
+    if clamp.clamped:
+        logger.warning(f"Clamped {clamp.clamped} wait/run_time values in generated scene")
+        manim_code = ast.unparse(ast.fix_missing_locations(tree))
+
+    stats = analyze_scene(manim_code)
+    problems = []
+    if stats["unbounded_loops"]:
+        problems.append(f"{stats['unbounded_loops']} unbounded loop(s)")
+    if stats["seconds"] > limits["max_scene_seconds"]:
+        problems.append(f"{stats['seconds']:.0f}s of animation (limit {limits['max_scene_seconds']:.0f}s)")
+    if stats["plays"] + stats["waits"] > limits["max_animations"]:
+        problems.append(f"{stats['plays'] + stats['waits']} animations (limit {limits['max_animations']})")
+    if stats["mobjects"] > limits["max_mobjects"]:
+        problems.append(f"{stats['mobjects']} mobjects (limit {limits['max_mobjects']})")
+    if problems:
+        raise SceneRejected(f"Scene exceeds render limits: {', '.join(problems)}")
+    return manim_code, stats
+
+def estimate_render_cost(manim_code, scene_plan=None):
+    """
+    Estimate how long a scene will take to render.
+
+    Video length comes from the play/wait calls in the code, or the scene
+    plan when it promises more; render time scales with it.
+
+    Args:
+        manim_code (str): Manim scene code
+        scene_plan (str, optional): Scene plan from the workflow
+
+    Returns:
+        float: Estimated render time in seconds
+    """
+    stats = analyze_scene(manim_code)
+    video_seconds = max(stats["seconds"], estimate_plan_duration(scene_plan))
+    fixed = float(os.environ.get("RENDER_FIXED_SECONDS", "5"))
+    per_second = float(os.environ.get("RENDER_SECONDS_PER_VIDEO_SECOND", "2"))
+    per_animation = float(os.environ.get("RENDER_SECONDS_PER_ANIMATION", "0.5"))
+    return fixed + video_seconds * per_second + (stats["plays"] + stats["waits"]) * per_animation
+
+def get_render_timeout(estimated_cost):
+    """
+    Derive a wall-clock timeout for a render from its estimated cost.
+
+    Args:
+        estimated_cost (float): Estimated render time in seconds
+
+    Returns:
+        float: Timeout in seconds, between RENDER_TIMEOUT_MIN and RENDER_TIMEOUT_MAX
+    """
+    factor = float(os.environ.get("RENDER_TIMEOUT_FACTOR", "4"))
+    minimum = float(os.environ.get("RENDER_TIMEOUT_MIN", "60"))
+    maximum = float(os.environ.get("RENDER_TIMEOUT_MAX", "1800"))
+    return min(maximum, max(minimum, estimated_cost * factor))
@@ -0,0 +1,164 @@
+import ast
+import logging
+import re
+
+from .manim_service import SCENE_CLASS_NAME
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Scene methods that render one partial movie per call
+ANIMATION_METHODS = {"play", "wait", "pause", "wait_until"}
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+def _self_method(node):
+    """Get the method name of a self.<method>(...) call, or None."""
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+    ):
+        return node.func.attr
+    return None
+
+def split_animations(manim_code):
+    """
+    Split a scene into its animations, in render order.
+
+    Each animation is the top-level statements of construct() up to and
+    including one self.play/self.wait call, compared by their AST so
+    formatting and comments don't count as changes. Animation i is the
+    i-th partial movie Manim writes.
+
+    Args:
+        manim_code (str): Manim scene code
+
+    Returns:
+        dict: "preamble" (everything outside construct), "animations" and
+            "tail" (statements after the last animation), or None if the
+            animations can't be numbered statically, e.g. because they are
+            played in loops, branches or helper methods
+    """
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        return None
+
+    scene = next((node for node in tree.body
+                  if isinstance(node, ast.ClassDef) and node.name == SCENE_CLASS_NAME), None)
+    if scene is None:
+        return None
+    construct = next((node for node in scene.body
+                      if isinstance(node, ast.FunctionDef) and node.name == "construct"), None)
+    if construct is None:
+        return None
+
+    helpers = {node.name for node in scene.body if isinstance(node, ast.FunctionDef)} - {"construct"}
+    preamble = [ast.dump(node) for node in tree.body if node is not scene]
+    preamble += [ast.dump(node) for node in scene.bases + scene.decorator_list]
+    preamble += [ast.dump(node) for node in scene.body if node is not construct]
+
+    animations, pending = [], []
+    for statement in construct.body:
+        methods = [_self_method(node) for node in ast.walk(statement)]
+        if helpers.intersection(methods):
+            return None
+        if not ANIMATION_METHODS.intersection(methods):
+            pending.append(ast.dump(statement))
+            continue
+        if not (isinstance(statement, ast.Expr) and _self_method(statement.value) in ANIMATION_METHODS):
+            return None
+        if sum(method in ANIMATION_METHODS for method in methods) != 1:
+            return None
+        pending.append(ast.dump(statement))
+        animations.append(tuple(pending))
+        pending = []
+    return {"preamble": tuple(preamble), "animations": animations, "tail": tuple(pending)}
+
+def diff_scenes(old_code, new_code):
+    """
+    Compare two versions of a scene animation by animation.
+
+    Later animations depend on the scene state the earlier ones leave, so
+    only the animations before the first change can be reused as they are.
+
+    Args:
+        old_code (str): Scene that was rendered
+        new_code (str): Edited scene
+
+    Returns:
+        dict: "reusable" (leading animations of the old render that are
+            unchanged), "changed" (indices of new or changed animations) and
+            "animations" (animations in the new scene), or None if either
+            scene can't be split into animations
+    """
+    old, new = split_animations(old_code), split_animations(new_code)
+    if old is None or new is None:
+        return None
+
+    old_steps, new_steps = old["animations"], new["animations"]
+    changed = [
+        index for index, step in enumerate(new_steps)
+        if index >= len(old_steps) or old_steps[index] != step
+    ]
+    if old["preamble"] != new["preamble"]:
+        reusable = 0
+    else:
+        reusable = changed[0] if changed else len(new_steps)
+    return {"reusable": reusable, "changed": changed, "animations": len(new_steps)}
+
+def apply_patch(code, patch):
+    """
+    Apply a unified diff to scene code.
+
+    Hunks must match exactly; there is no fuzzy matching.
+
+    Args:
+        code (str): Original code
+        patch (str): Unified diff against the original code
+
+    Returns:
+        str: Patched code
+
+    Raises:
+        ValueError: If the patch has no hunks or doesn't apply
+    """
+    lines = code.splitlines()
+    result = []
+    position = 0
+    hunks = 0
+    in_hunk = False
+    for line in patch.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            start = int(header.group(1))
+            # A hunk that only adds lines counts from the line before it
+            start = start if header.group(2) == "0" else start - 1
+            if start < position:
+                raise ValueError(f"Overlapping or out of order hunk: {line}")
+            result.extend(lines[position:start])
+            position = start
+            hunks += 1
+            in_hunk = True
+            continue
+        if not in_hunk or line.startswith("\\"):
+            # File headers and "\ No newline at end of file"
+            continue
+        marker, text = line[:1], line[1:]
+        if marker == "+":
+            result.append(text)
+        elif marker in (" ", "-", ""):
+            if position >= len(lines) or lines[position] != text:
+                raise ValueError(f"Patch does not apply at line {position + 1}: {text!r}")
+            if marker != "-":
+                result.append(text)
+            position += 1
+        else:
+            in_hunk = False
+    if not hunks:
+        raise ValueError("Patch has no hunks")
+    result.extend(lines[position:])
+    return "\n".join(result) + "\n"
@@ -0,0 +1,154 @@
+import ast
+import logging
+import re
+import textwrap
+
+from .manim_service import SCENE_CLASS_NAME
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Marker the streaming code generator puts before each section of construct()
+SECTION_MARKER = re.compile(r"^\s*#\s*SECTION\b[\s:\-\d]*(.*)$", re.IGNORECASE)
+DEFAULT_HEADER = "from manim import *"
+
+class Section:
+    """One self-contained section of a streamed scene."""
+
+    def __init__(self, index, title, body, header):
+        self.index = index
+        self.title = title
+        # Statements of construct(), dedented
+        self.body = body
+        self.code = build_scene(header, [body])
+        self.error = None
+        try:
+            ast.parse(self.code)
+        except SyntaxError as e:
+            self.error = f"line {e.lineno}: {e.msg}"
+
+    @property
+    def valid(self):
+        return self.error is None
+
+def build_scene(header, bodies):
+    """
+    Build a scene module whose construct() runs the given section bodies in order.
+
+    Args:
+        header (str): Import lines
+        bodies (list): Dedented construct() statements of each section
+
+    Returns:
+        str: Manim scene code
+    """
+    statements = "\n\n".join(textwrap.indent(body, " " * 8) for body in bodies if body.strip())
+    return (
+        f"{header or DEFAULT_HEADER}\n\n"
+        f"class {SCENE_CLASS_NAME}(Scene):\n"
+        f"    def construct(self):\n"
+        f"{statements or ' ' * 8 + 'self.wait(1)'}\n"
+    )
+
+class SectionParser:
+    """
+    Split streamed scene code into sections as they complete.
+
+    Text is fed in whatever chunks the LLM produces. A section is complete
+    once the marker of the next one arrives (or the stream ends), and is
+    checked on its own straight away:
+
+        parser = SectionParser()
+        for chunk in chunks:
+            for section in parser.feed(chunk):
+                dispatch(section)
+        for section in parser.close():
+            dispatch(section)
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._header = []
+        self._current = None
+        self.sections = []
+
+    @property
+    def header(self):
+        """Import lines seen before the first section."""
+        imports = [
+            line for line in self._header
+            if line.startswith("from ") or line.startswith("import ")
+        ]
+        return "\n".join(imports) or DEFAULT_HEADER
+
+    def feed(self, text):
+        """
+        Add streamed text.
+
+        Returns:
+            list: Sections completed by this text
+        """
+        self._buffer += text
+        lines = self._buffer.split("\n")
+        # The last line may still be growing
+        self._buffer = lines.pop()
+        completed = []
+        for line in lines:
+            section = self._add_line(line)
+            if section:
+                completed.append(section)
+        return completed
+
+    def close(self):
+        """
+        End the stream.
+
+        Returns:
+            list: The last section, if there is one
+        """
+        if self._buffer:
+            self._add_line(self._buffer)
+            self._buffer = ""
+        section = self._finish_section()
+        return [section] if section else []
+
+    def _add_line(self, line):
+        marker = SECTION_MARKER.match(line)
+        if marker:
+            finished = self._finish_section()
+            self._current = (marker.group(1).strip(), [])
+            return finished
+        if line.strip().startswith("```"):
+            return None
+        if self._current is None:
+            self._header.append(line)
+        else:
+            self._current[1].append(line)
+        return None
+
+    def _finish_section(self):
+        if self._current is None:
+            return None
+        title, lines = self._current
+        self._current = None
+        body = textwrap.dedent("\n".join(lines)).strip("\n")
+        if not body.strip():
+            return None
+        section = Section(len(self.sections), title, body, self.header)
+        self.sections.append(section)
+        if section.valid:
+            logger.info(f"Section {section.index + 1} complete: {title or 'untitled'}")
+        else:
+            logger.warning(f"Section {section.index + 1} is not valid Python ({section.error})")
+        return section
+
+    def assemble(self):
+        """
+        Build the whole scene from every section, for the job record and for
+        rendering in one piece if the sections can't be stitched.
+
+        Returns:
+            str: Manim scene code
+        """
+        return build_scene(self.header, [section.body for section in self.sections])
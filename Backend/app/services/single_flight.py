@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import threading
+
+from . import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INFLIGHT = metrics.gauge("singleflight_inflight", "Distinct calls currently in flight")
+WAITERS = metrics.gauge("singleflight_waiters", "Callers currently attached to another caller's in-flight call")
+COALESCED = metrics.counter("singleflight_coalesced_total", "Calls answered by attaching to an in-flight call")
+CALLS = metrics.counter("singleflight_calls_total", "Calls that actually executed")
+
+class CallAborted(RuntimeError):
+    """Raised to waiters when the caller running the call was cancelled or exited before it finished."""
+
+class _Call:
+    """A single in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        # (loop, future) pairs of async callers waiting on this call
+        self.async_waiters = []
+
+    def finish(self):
+        """Wake every waiting caller."""
+        self.done.set()
+        for loop, future in self.async_waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running block until it finishes and receive the same result (or
+    exception). Threads (do) and coroutines (ado) share the same calls.
+    """
+
+    def __init__(self, name):
+        """
+        Initialize the group.
+
+        Args:
+            name (str): Group name used as the metrics label
+        """
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) once per key among concurrent callers.
+
+        Args:
+            key (str): Coalescing key
+            fn (callable): Function to run
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller
+                attached to another caller's execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            WAITERS.inc(group=self.name)
+            COALESCED.inc(group=self.name)
+            logger.info(f"Attached to in-flight {self.name} call {key[:12]} ({call.waiters} waiting)")
+            try:
+                call.done.wait()
+            finally:
+                WAITERS.dec(group=self.name)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        INFLIGHT.inc(group=self.name)
+        CALLS.inc(group=self.name)
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException as e:
+            # Cancelling or stopping the leader isn't the waiters' doing, but they still get no result
+            call.error = CallAborted(f"In-flight {self.name} call was aborted: {type(e).__name__}")
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            INFLIGHT.dec(group=self.name)
+            call.finish()
+
+    async def ado(self, key, fn, *args, **kwargs):
+        """
+        Async version of do: await fn(*args, **kwargs) once per key among concurrent callers.
+
+        Waiting callers don't hold a thread, only a future on their event loop.
+
+        Args:
+            key (str): Coalescing key
+            fn (callable): Coroutine function to run
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller
+                attached to another caller's execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                waiter = asyncio.get_running_loop().create_future()
+                call.async_waiters.append((asyncio.get_running_loop(), waiter))
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            WAITERS.inc(group=self.name)
+            COALESCED.inc(group=self.name)
+            logger.info(f"Attached to in-flight {self.name} call {key[:12]} ({call.waiters} waiting)")
+            try:
+                await waiter
+            finally:
+                WAITERS.dec(group=self.name)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        INFLIGHT.inc(group=self.name)
+        CALLS.inc(group=self.name)
+        try:
+            call.result = await fn(*args, **kwargs)
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException as e:
+            # Cancelling or stopping the leader isn't the waiters' doing, but they still get no result
+            call.error = CallAborted(f"In-flight {self.name} call was aborted: {type(e).__name__}")
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            INFLIGHT.dec(group=self.name)
+            call.finish()
+
+    def waiters(self, key):
+        """Get the number of callers waiting on the in-flight call for a key."""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
@@ -0,0 +1,343 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from . import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STORAGE_BYTES = metrics.gauge("storage_bytes", "Bytes on disk per storage category")
+EVICTED_BYTES = metrics.counter("storage_evicted_bytes_total", "Bytes evicted per storage category")
+EVICTED_FILES = metrics.counter("storage_evicted_files_total", "Files evicted per storage category")
+
+MB = 1024 * 1024
+
+def get_storage_roots():
+    """Get the directories the storage manager looks after."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return {
+        "output": os.path.join(project_root, "animation", "output"),
+        "media": os.path.join(project_root, "media"),
+        "temp": tempfile.gettempdir(),
+    }
+
+def _is_partial_movie(path):
+    return f"{os.sep}partial_movie_files{os.sep}" in path
+
+# Scene files and FFmpeg concat lists written per job to the temp directory
+_SCENE_SCRATCH_PATTERN = re.compile(r"^(scene_[0-9a-f]{32}(_s\d+)?\.py|file_list_scene_[0-9a-f]{32}(_s\d+)?\.txt)$")
+
+def _is_scene_scratch(path):
+    return bool(_SCENE_SCRATCH_PATTERN.match(os.path.basename(path)))
+
+# Storage categories: where they live, which files belong to them, and their
+# default byte quota (MB) and time to live (hours, 0 = no TTL).
+# Categories with `managed` set are evicted by their own cache and only reported.
+# Categories with `package` set keep one directory per job whose files only
+# work together (playlists and their segments, a sprite and its index), so a
+# job directory is kept or evicted as a whole.
+CATEGORIES = [
+    {"name": "videos", "root": "output", "subdir": "videos", "quota_mb": 20480, "ttl_hours": 0},
+    {"name": "hls", "root": "output", "subdir": "hls", "package": True, "quota_mb": 20480, "ttl_hours": 0},
+    {"name": "live", "root": "output", "subdir": "live", "package": True, "quota_mb": 5120, "ttl_hours": 24},
+    {"name": "thumbnails", "root": "output", "subdir": "thumbnails", "package": True,
+     "quota_mb": 1024, "ttl_hours": 0},
+    {"name": "sections", "root": "output", "subdir": "sections", "package": True, "quota_mb": 5120, "ttl_hours": 24},
+    {"name": "audio", "root": "output", "subdir": "audio", "quota_mb": 2048, "ttl_hours": 0},
+    # Render profiles put in the artifact store by workers; the API copies them into media/profiles
+    {"name": "worker_profiles", "root": "output", "subdir": "profiles", "package": True,
+     "quota_mb": 1024, "ttl_hours": 24},
+    {"name": "traces", "root": "output", "subdir": "traces", "quota_mb": 256, "ttl_hours": 168},
+    {"name": "partial_movies", "root": "media", "subdir": "videos", "match": _is_partial_movie,
+     "quota_mb": 10240, "ttl_hours": 72},
+    {"name": "media_videos", "root": "media", "subdir": "videos",
+     "match": lambda path: not _is_partial_movie(path), "quota_mb": 10240, "ttl_hours": 72},
+    {"name": "checkpoints", "root": "media", "subdir": "checkpoints", "package": True,
+     "quota_mb": 10240, "ttl_hours": 72},
+    {"name": "profiles", "root": "media", "subdir": "profiles", "package": True, "quota_mb": 1024, "ttl_hours": 168},
+    {"name": "tex", "root": "media", "subdir": "Tex", "quota_mb": 1024, "ttl_hours": 0},
+    {"name": "texts", "root": "media", "subdir": "texts", "quota_mb": 1024, "ttl_hours": 0},
+    {"name": "images", "root": "media", "subdir": "images", "quota_mb": 1024, "ttl_hours": 72},
+    {"name": "text_cache", "root": "media", "subdir": "text_cache", "managed": True},
+    {"name": "scene_code", "root": "temp", "subdir": "", "match": _is_scene_scratch, "recursive": False,
+     "quota_mb": 256, "ttl_hours": 24},
+]
+
+def _category_setting(category, key, default):
+    """Read a per-category override such as STORAGE_QUOTA_VIDEOS_MB."""
+    env_name = {
+        "quota_mb": f"STORAGE_QUOTA_{category['name'].upper()}_MB",
+        "ttl_hours": f"STORAGE_TTL_{category['name'].upper()}_HOURS",
+    }[key]
+    return float(os.environ.get(env_name, default))
+
+class StorageManager:
+    """
+    Keeps generated media, partial movies, caches and audio within byte quotas.
+
+    Files are evicted once past their category's TTL, then least recently
+    used first while a category is over quota. Files of queued or running
+    jobs and anything used within the protection window are never evicted.
+    Package categories are handled per job directory, so a playlist is never
+    kept without its segments.
+    """
+
+    def __init__(self, roots=None, protect_hours=None, max_deletes_per_pass=None):
+        """
+        Initialize the storage manager. Unset arguments come from the environment.
+
+        Args:
+            roots (dict, optional): Root directories by name. Defaults to get_storage_roots().
+            protect_hours (float, optional): Files used more recently than this are kept
+                (STORAGE_PROTECT_HOURS)
+            max_deletes_per_pass (int, optional): Upper bound on deletions per compaction pass
+                (STORAGE_MAX_DELETES_PER_PASS)
+        """
+        self.roots = roots or get_storage_roots()
+        self.protect_seconds = 3600 * (protect_hours if protect_hours is not None
+                                       else float(os.environ.get("STORAGE_PROTECT_HOURS", "24")))
+        self.max_deletes_per_pass = max_deletes_per_pass or int(os.environ.get("STORAGE_MAX_DELETES_PER_PASS", "500"))
+        self._next_category = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _category_dir(self, category):
+        return os.path.join(self.roots[category["root"]], category["subdir"])
+
+    def _iter_files(self, category, directory=None):
+        """Yield (path, size, mtime) for files in a category, or in one directory of it."""
+        directory = directory or self._category_dir(category)
+        if not os.path.isdir(directory):
+            return
+        match = category.get("match")
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if category.get("recursive", True):
+                            stack.append(entry.path)
+                        continue
+                    if match and not match(entry.path):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _iter_units(self, category):
+        """
+        Yield (path, files) for what is evicted together in a category.
+
+        Units are single files, or for package categories each job directory
+        with all its files; files are (path, size, mtime) tuples.
+        """
+        if not category.get("package"):
+            for path, size, mtime in self._iter_files(category):
+                yield path, [(path, size, mtime)]
+            return
+        directory = self._category_dir(category)
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir:
+                    stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                yield entry.path, list(self._iter_files(category, entry.path))
+            else:
+                yield entry.path, [(entry.path, stat.st_size, stat.st_mtime)]
+
+    def usage(self):
+        """
+        Report disk usage by category.
+
+        Returns:
+            dict: Category name -> files, bytes, quota_bytes and ttl_hours
+        """
+        report = {}
+        for category in CATEGORIES:
+            files = total = 0
+            for _, size, _ in self._iter_files(category):
+                files += 1
+                total += size
+            STORAGE_BYTES.set(total, category=category["name"])
+            report[category["name"]] = {
+                "files": files,
+                "bytes": total,
+                "quota_bytes": None if category.get("managed")
+                else int(_category_setting(category, "quota_mb", category["quota_mb"]) * MB),
+                "ttl_hours": None if category.get("managed")
+                else _category_setting(category, "ttl_hours", category["ttl_hours"]),
+            }
+        return report
+
+    def compact_category(self, category, artifact_usage=None, max_deletes=None):
+        """
+        Evict files (or job packages) of one category past their TTL or over its quota.
+
+        Args:
+            category (dict): Entry from CATEGORIES
+            artifact_usage (dict, optional): Tracked artifact usage from the job store
+            max_deletes (int, optional): Upper bound on deletions
+
+        Returns:
+            dict: files and bytes evicted
+        """
+        evicted = {"files": 0, "bytes": 0}
+        if category.get("managed"):
+            return evicted
+
+        if artifact_usage is None:
+            from .job_store import get_job_store
+            artifact_usage = get_job_store().get_artifact_usage()
+        max_deletes = max_deletes or self.max_deletes_per_pass
+        quota = _category_setting(category, "quota_mb", category["quota_mb"]) * MB
+        ttl = _category_setting(category, "ttl_hours", category["ttl_hours"]) * 3600
+        now = time.time()
+
+        units = []
+        total = 0
+        for path, files in self._iter_units(category):
+            # A package is as recently used as its most recently used file
+            used, active, size = 0, False, 0
+            for file_path, file_size, mtime in files:
+                file_used, file_active = artifact_usage.get(file_path, (mtime, False))
+                used = max(used, file_used or 0, mtime)
+                active = active or file_active
+                size += file_size
+            total += size
+            if active or now - used < self.protect_seconds:
+                continue
+            units.append((used, path, size, [file_path for file_path, _, _ in files]))
+
+        # Expired units first, then least recently used while over quota
+        units.sort()
+        for used, path, size, files in units:
+            if evicted["files"] >= max_deletes:
+                break
+            expired = ttl and now - used > ttl
+            if not expired and total <= quota:
+                break
+            if self._remove(path, files, artifact_usage, self._category_dir(category)):
+                total -= size
+                evicted["files"] += len(files)
+                evicted["bytes"] += size
+
+        if evicted["files"]:
+            EVICTED_FILES.inc(evicted["files"], category=category["name"])
+            EVICTED_BYTES.inc(evicted["bytes"], category=category["name"])
+            logger.info(f"Evicted {evicted['files']} {category['name']} files ({evicted['bytes']} bytes)")
+        STORAGE_BYTES.set(total, category=category["name"])
+        return evicted
+
+    def _remove(self, path, files, artifact_usage, category_dir):
+        """
+        Delete a file or package directory, forget its tracked files in the job
+        store, and prune empty directories below category_dir.
+        """
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not evict {path}: {e}")
+            return False
+
+        tracked = [file_path for file_path in files if file_path in artifact_usage]
+        if tracked:
+            from .job_store import get_job_store
+            store = get_job_store()
+            for file_path in tracked:
+                store.remove_artifact_path(file_path)
+
+        directory = os.path.dirname(path)
+        stop_dir = os.path.abspath(category_dir)
+        while os.path.abspath(directory).startswith(stop_dir + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+        return True
+
+    def compact(self, categories=None):
+        """
+        Run one incremental compaction pass.
+
+        Without arguments only the next category in round-robin order is
+        compacted, which keeps each pass short.
+
+        Args:
+            categories (list, optional): Category names to compact
+
+        Returns:
+            dict: Category name -> files and bytes evicted
+        """
+        with self._lock:
+            if categories is None:
+                selected = [CATEGORIES[self._next_category % len(CATEGORIES)]]
+                self._next_category += 1
+            else:
+                selected = [c for c in CATEGORIES if c["name"] in categories]
+
+            from .job_store import get_job_store
+            artifact_usage = get_job_store().get_artifact_usage()
+            return {c["name"]: self.compact_category(c, artifact_usage) for c in selected}
+
+    def start(self, interval=None):
+        """Start background compaction on a daemon thread."""
+        if self._thread is not None:
+            return
+        interval = interval or float(os.environ.get("STORAGE_COMPACTION_INTERVAL", "300"))
+        # Each pass handles one category, so spread a full cycle over the interval
+        pause = interval / len(CATEGORIES)
+
+        def run():
+            while True:
+                time.sleep(pause)
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Error compacting storage: {e}")
+
+        self._thread = threading.Thread(target=run, name="storage-compaction", daemon=True)
+        self._thread.start()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_storage_manager():
+    """Get the shared storage manager."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = StorageManager()
+    return _manager
+
+def init_app(app):
+    """Start background compaction for a Flask app unless disabled."""
+    manager = get_storage_manager()
+    if os.environ.get("STORAGE_COMPACTION_ENABLED", "true").lower() in ["true", "1", "yes"] and not app.testing:
+        manager.start()
+    return manager
@@ -0,0 +1,290 @@
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default byte budget for the shared text cache (SVGs + parsed paths)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the on-disk layout or the pickled mobject format changes
+CACHE_VERSION = "1"
+
+def get_text_cache_dir():
+    """Get the shared text cache directory used by all render processes."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.environ.get("TEXT_CACHE_DIR", os.path.join(project_root, "media", "text_cache"))
+
+def text_cache_enabled():
+    """Check whether the shared text cache is enabled."""
+    return os.environ.get("TEXT_CACHE_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+class TextCache:
+    """
+    Disk-backed LRU cache for rendered text SVGs and parsed path data.
+
+    Entries live as plain files in the cache directory and are indexed in a
+    small SQLite database, so any number of render processes on the same
+    host can share them across jobs.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """
+        Initialize the text cache.
+
+        Args:
+            cache_dir (str, optional): Directory for cache files.
+                If not provided, uses TEXT_CACHE_DIR or media/text_cache.
+            max_bytes (int, optional): Byte budget before LRU eviction kicks in.
+                If not provided, uses TEXT_CACHE_MAX_BYTES or DEFAULT_MAX_BYTES.
+        """
+        self.cache_dir = os.path.abspath(cache_dir or get_text_cache_dir())
+        self.max_bytes = int(max_bytes or os.environ.get("TEXT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.index_path = os.path.join(self.cache_dir, "index.sqlite")
+        self._local = threading.local()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (key, kind)
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+
+    def _connect(self):
+        """Get this thread's connection to the cache index."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(text, font="", weight="NORMAL", size=None, **extra):
+        """
+        Build a stable cache key for a piece of text.
+
+        Args:
+            text (str): The text being rendered
+            font (str): Font family
+            weight (str): Font weight
+            size (float, optional): Font size
+            **extra: Any other settings that change the rendered output
+
+        Returns:
+            str: Hex digest usable as a cache key
+        """
+        parts = [CACHE_VERSION, text, str(font), str(weight), repr(size)]
+        parts.extend(f"{name}={extra[name]!r}" for name in sorted(extra))
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _path_for(self, key, kind):
+        """Get the file path for a cache entry, sharded by key prefix."""
+        extension = "svg" if kind == "svg" else "pkl"
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    def _lookup(self, key, kind):
+        """Return the file path for an entry if present, refreshing its LRU position."""
+        path = self._path_for(key, kind)
+        if not os.path.exists(path):
+            return None
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ? AND kind = ?",
+                    (time.time(), key, kind),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update text cache index: {e}")
+        return path
+
+    def _store(self, key, kind, write):
+        """Atomically write an entry using the given writer and record it in the index."""
+        path = self._path_for(key, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, kind, os.path.getsize(path), time.time()),
+            )
+        self._evict()
+        return path
+
+    def get_svg(self, key):
+        """Get the path of a cached SVG, or None on a miss."""
+        return self._lookup(key, "svg")
+
+    def put_svg(self, key, source_path):
+        """
+        Copy a freshly rendered SVG into the cache.
+
+        Args:
+            key (str): Cache key from make_key
+            source_path (str): Path of the SVG written by Pango
+
+        Returns:
+            str: Path of the cached SVG
+        """
+        def write(f):
+            with open(source_path, "rb") as src:
+                shutil.copyfileobj(src, f)
+        return self._store(key, "svg", write)
+
+    def get_paths(self, key):
+        """Get cached parsed path data (a pickled mobject), or None on a miss."""
+        path = self._lookup(key, "paths")
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable text cache entry {key}: {e}")
+            self._remove(key, "paths")
+            return None
+
+    def put_paths(self, key, mobject):
+        """Store parsed path data for a text mobject."""
+        try:
+            payload = pickle.dumps(mobject, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Text mobject is not cacheable: {e}")
+            return None
+        return self._store(key, "paths", lambda f: f.write(payload))
+
+    def _remove(self, key, kind):
+        """Remove a single entry from disk and the index."""
+        try:
+            os.remove(self._path_for(key, kind))
+        except FileNotFoundError:
+            pass
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ? AND kind = ?", (key, kind))
+
+    def _evict(self):
+        """Evict least recently used entries until the cache fits its byte budget."""
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Evict down to 90% so we don't pay for eviction on every insert
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = conn.execute("SELECT key, kind, size FROM entries ORDER BY last_used ASC").fetchall()
+        for key, kind, size in rows:
+            if total <= target:
+                break
+            self._remove(key, kind)
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} text cache entries, {total} bytes remaining")
+
+    def stats(self):
+        """Get entry counts and byte usage per entry kind."""
+        rows = self._connect().execute(
+            "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY kind"
+        ).fetchall()
+        return {kind: {"entries": count, "bytes": size} for kind, count, size in rows}
+
+def install_manim_text_cache(cache=None):
+    """
+    Route Manim's Text/MarkupText rendering through the shared text cache.
+
+    Pango SVG output is looked up before calling into Pango, and the parsed
+    submobjects are reused instead of re-parsing the SVG, the same way Manim's
+    in-process SVG cache does it but shared between processes and jobs.
+
+    Args:
+        cache (TextCache, optional): Cache to use. Defaults to a TextCache
+            in the shared cache directory.
+
+    Returns:
+        bool: True if the cache was installed
+    """
+    if not text_cache_enabled():
+        return False
+
+    try:
+        from manim import Text, MarkupText
+        from manim.mobject.svg.svg_mobject import SVGMobject
+    except ImportError as e:
+        logger.warning(f"Manim not available, text cache not installed: {e}")
+        return False
+
+    if getattr(SVGMobject, "_text_cache_installed", False):
+        return True
+
+    cache = cache or TextCache()
+    original_init_svg_mobject = SVGMobject.init_svg_mobject
+
+    def wrap_text2svg(text_class):
+        original_text2svg = text_class._text2svg
+
+        def cached_text2svg(self, color, *args, **kwargs):
+            try:
+                key = TextCache.make_key(
+                    getattr(self, "original_text", getattr(self, "text", "")),
+                    font=getattr(self, "font", ""),
+                    weight=getattr(self, "weight", "NORMAL"),
+                    size=getattr(self, "_font_size", None),
+                    pango=self._text2hash(color),
+                )
+            except Exception as e:
+                logger.warning(f"Could not build text cache key: {e}")
+                return original_text2svg(self, color, *args, **kwargs)
+
+            self._text_cache_key = key
+            cached_svg = cache.get_svg(key)
+            if cached_svg:
+                return cached_svg
+            return cache.put_svg(key, original_text2svg(self, color, *args, **kwargs))
+
+        text_class._text2svg = cached_text2svg
+
+    def cached_init_svg_mobject(self, *args, **kwargs):
+        text_key = getattr(self, "_text_cache_key", None)
+        if text_key is None:
+            return original_init_svg_mobject(self, *args, **kwargs)
+
+        # SVG styling options change the parsed result, so they are part of the key
+        paths_key = TextCache.make_key(text_key, seed=repr(getattr(self, "hash_seed", "")))
+        mob = cache.get_paths(paths_key)
+        if mob is not None:
+            self.add(*mob.submobjects)
+            return None
+
+        result = original_init_svg_mobject(self, *args, **kwargs)
+        cache.put_paths(paths_key, self.copy())
+        return result
+
+    wrap_text2svg(Text)
+    wrap_text2svg(MarkupText)
+    SVGMobject.init_svg_mobject = cached_init_svg_mobject
+    SVGMobject._text_cache_installed = True
+    logger.info(f"Installed shared text cache at {cache.cache_dir}")
+    return True
@@ -0,0 +1,163 @@
+import logging
+import math
+import os
+import shutil
+
+from .packaging_service import probe_duration, probe_video_size
+from .render_limits import run_with_timeout
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+POSTER = "poster.jpg"
+SPRITE = "sprite.jpg"
+SPRITE_VTT = "sprite.vtt"
+
+def get_thumbnail_dir(job_id):
+    """Get the directory a job's poster and sprite sheet are written to."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, "animation", "output", "thumbnails", job_id)
+
+def _first_partial_movie(partial_dir):
+    """The first partial movie Manim wrote, which ends on the finished title."""
+    if not partial_dir or not os.path.isdir(partial_dir):
+        return None
+    partials = [
+        entry for entry in os.scandir(partial_dir)
+        if entry.name.endswith(".mp4") and "temp" not in entry.name
+    ]
+    if not partials:
+        return None
+    return min(partials, key=lambda entry: (entry.stat().st_mtime, entry.name)).path
+
+def _run_ffmpeg(cmd):
+    """Run a short FFmpeg command, returning whether it succeeded."""
+    try:
+        result = run_with_timeout(cmd, float(os.environ.get("FFMPEG_TIMEOUT", "300")))
+    except Exception as e:
+        logger.error(f"FFmpeg failed: {e}")
+        return False
+    if result.returncode != 0:
+        logger.error(f"FFmpeg failed: {result.stderr}")
+        return False
+    return True
+
+def create_poster(video_path, output_path, partial_dir=None, width=None):
+    """
+    Capture a poster frame without decoding the whole video.
+
+    Uses the last frame of the first partial movie (the finished title
+    animation) when the partials are still around, otherwise the first
+    keyframe after a short seek into the final video.
+
+    Args:
+        video_path (str): Final video
+        output_path (str): JPEG to write
+        partial_dir (str, optional): The render's partial movie directory
+        width (int, optional): Poster width (THUMBNAIL_POSTER_WIDTH)
+
+    Returns:
+        str: output_path, or None if no frame could be captured
+    """
+    width = width or int(os.environ.get("THUMBNAIL_POSTER_WIDTH", "640"))
+    scale = ["-vf", f"scale={width}:-2", "-frames:v", "1", "-q:v", "3", output_path]
+
+    first_partial = _first_partial_movie(partial_dir)
+    if first_partial and _run_ffmpeg(["ffmpeg", "-y", "-sseof", "-0.1", "-i", first_partial, *scale]):
+        return output_path
+
+    duration = probe_duration(video_path) or 0
+    seek = min(float(os.environ.get("THUMBNAIL_POSTER_SEEK", "2")), duration / 2)
+    if _run_ffmpeg(["ffmpeg", "-y", "-ss", f"{seek:.3f}", "-noaccurate_seek", "-i", video_path, *scale]):
+        return output_path
+    return None
+
+def create_sprite(video_path, output_dir, tile_width=None, interval=None, max_tiles=None, columns=10):
+    """
+    Build a low-resolution sprite sheet for scrubbing and its WebVTT index.
+
+    Only keyframes are decoded, so this costs a fraction of a full decode.
+
+    Args:
+        video_path (str): Final video
+        output_dir (str): Directory for the sprite sheet and VTT file
+        tile_width (int, optional): Width of each tile (THUMBNAIL_TILE_WIDTH)
+        interval (float, optional): Seconds between tiles (THUMBNAIL_INTERVAL)
+        max_tiles (int, optional): Upper bound on tiles; the interval grows to fit
+            (THUMBNAIL_MAX_TILES)
+        columns (int): Tiles per row
+
+    Returns:
+        str: Path of the sprite sheet, or None if it couldn't be built
+    """
+    tile_width = tile_width or int(os.environ.get("THUMBNAIL_TILE_WIDTH", "160"))
+    interval = interval or float(os.environ.get("THUMBNAIL_INTERVAL", "2"))
+    max_tiles = max_tiles or int(os.environ.get("THUMBNAIL_MAX_TILES", "100"))
+
+    duration = probe_duration(video_path)
+    size = probe_video_size(video_path)
+    if not duration or not size:
+        return None
+    interval = max(interval, duration / max_tiles)
+    count = max(1, math.ceil(duration / interval))
+    columns = min(columns, count)
+    rows = math.ceil(count / columns)
+    tile_height = int(round(tile_width * size[1] / size[0] / 2)) * 2
+
+    sprite_path = os.path.join(output_dir, SPRITE)
+    cmd = [
+        "ffmpeg", "-y", "-skip_frame", "nokey", "-i", video_path,
+        "-vf", f"fps=1/{interval:.3f},scale={tile_width}:{tile_height},tile={columns}x{rows}",
+        "-frames:v", "1", "-q:v", "5", sprite_path,
+    ]
+    if not _run_ffmpeg(cmd):
+        return None
+
+    # Map each time range to its tile for players' thumbnail tracks
+    lines = ["WEBVTT", ""]
+    for index in range(count):
+        start, end = index * interval, min((index + 1) * interval, duration)
+        x, y = (index % columns) * tile_width, (index // columns) * tile_height
+        lines += [
+            f"{_vtt_time(start)} --> {_vtt_time(end)}",
+            f"{SPRITE}#xywh={x},{y},{tile_width},{tile_height}",
+            "",
+        ]
+    with open(os.path.join(output_dir, SPRITE_VTT), "w") as f:
+        f.write("\n".join(lines))
+    return sprite_path
+
+def _vtt_time(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+def create_thumbnails(video_path, job_id, partial_dir=None):
+    """
+    Create a job's poster frame and scrubbing sprite sheet.
+
+    Args:
+        video_path (str): Final video
+        job_id (str): Job id
+        partial_dir (str, optional): The render's partial movie directory
+
+    Returns:
+        dict: Paths by artifact kind ("poster", "sprite", "sprite_vtt"); missing kinds failed
+    """
+    output_dir = get_thumbnail_dir(job_id)
+    os.makedirs(output_dir, exist_ok=True)
+    artifacts = {}
+
+    poster = create_poster(video_path, os.path.join(output_dir, POSTER), partial_dir)
+    if poster:
+        artifacts["poster"] = poster
+    sprite = create_sprite(video_path, output_dir)
+    if sprite:
+        artifacts["sprite"] = sprite
+        artifacts["sprite_vtt"] = os.path.join(output_dir, SPRITE_VTT)
+
+    if not artifacts:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    logger.info(f"Created thumbnails for job {job_id}: {', '.join(artifacts) or 'none'}")
+    return artifacts
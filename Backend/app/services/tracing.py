@@ -0,0 +1,501 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from . import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "manim-animation-backend"
+
+# Where a span's time went, summed per job in the trace summary
+CATEGORY_LLM = "llm"
+CATEGORY_QUEUE = "queue"
+CATEGORY_RENDER = "render"
+CATEGORY_TTS = "tts"
+CATEGORY_IO = "io"
+CATEGORY_COMPUTE = "compute"
+
+# Upper bound on spans kept per trace; later spans are counted but dropped
+MAX_SPANS = 5000
+
+# OTLP status codes
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+EXPORTED = metrics.counter("traces_exported_total", "Job traces exported by destination and outcome")
+
+def tracing_enabled():
+    """Check whether jobs record a trace of their stages."""
+    return os.environ.get("TRACING_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+def get_trace_dir():
+    """Get the directory exported job traces are written to."""
+    project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return os.path.join(project_root, "animation", "output", "traces")
+
+def get_trace_path(job_id):
+    """Get the file a job's trace is exported to."""
+    return os.path.join(get_trace_dir(), f"{job_id}.json")
+
+def _new_id(size):
+    return os.urandom(size).hex()
+
+def _otlp_value(value):
+    """Encode an attribute value as an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP JSON
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+class Span:
+    """
+    A timed operation of a job, with its parent, attributes and outcome.
+
+    Spans are created through span() or start_span(), which link them into
+    the trace of the current job.
+    """
+
+    def __init__(self, trace, name, parent_id=None, category=None, attributes=None, start_ns=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        if category:
+            self.attributes["category"] = category
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self.events = []
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_event(self, name, **attributes):
+        """Record a point in time within the span, e.g. a retry."""
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+
+    def end(self, end_ns=None, **attributes):
+        """End the span; later calls are ignored."""
+        if self.end_ns is not None:
+            return
+        self.attributes.update(attributes)
+        self.end_ns = end_ns or time.time_ns()
+        if self.status == STATUS_UNSET:
+            self.status = STATUS_OK
+
+    def context(self):
+        """Get the ids a span in another process needs to join this trace as a child."""
+        return {"trace_id": self.trace.trace_id, "span_id": self.span_id}
+
+    def to_otlp(self, now_ns=None):
+        attributes = dict(self.attributes)
+        end_ns = self.end_ns
+        if end_ns is None:
+            end_ns = now_ns or time.time_ns()
+            attributes["in_progress"] = True
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": _otlp_attributes(attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        if self.events:
+            span["events"] = [
+                {"name": event["name"], "timeUnixNano": str(event["time_ns"]),
+                 "attributes": _otlp_attributes(event["attributes"])}
+                for event in self.events
+            ]
+        return span
+
+class _NoSpan:
+    """Stand-in yielded by span() when no trace is being recorded."""
+
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self, end_ns=None, **attributes):
+        pass
+
+    def context(self):
+        return None
+
+NO_SPAN = _NoSpan()
+
+class Trace:
+    """
+    The spans of one job, from its start to its result.
+
+    Spans are added when they start, so the trace of a running job shows
+    what it is doing now. Spans recorded by a render worker are merged in
+    as they were exported there.
+    """
+
+    def __init__(self, job_id=None, trace_id=None, attributes=None):
+        self.job_id = job_id
+        self.trace_id = trace_id or _new_id(16)
+        self.attributes = dict(attributes or {})
+        self.root = None
+        self.spans = []
+        self.remote_spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            if len(self.spans) + len(self.remote_spans) >= MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+    def add_remote(self, spans):
+        """Merge spans exported by another process (see continue_trace)."""
+        with self._lock:
+            room = max(0, MAX_SPANS - len(self.spans) - len(self.remote_spans))
+            self.remote_spans.extend(spans[:room])
+            self.dropped += max(0, len(spans) - room)
+
+    def export_spans(self):
+        """Get the spans in OTLP JSON, in start order."""
+        now_ns = time.time_ns()
+        with self._lock:
+            spans = [span.to_otlp(now_ns) for span in self.spans] + list(self.remote_spans)
+        return sorted(spans, key=lambda span: int(span["startTimeUnixNano"]))
+
+    def to_otlp(self):
+        """
+        Get the trace as an OTLP/JSON ExportTraceServiceRequest.
+
+        This is what an OpenTelemetry collector accepts on /v1/traces, and
+        what Jaeger and Grafana Tempo import.
+        """
+        resource = {"service.name": SERVICE_NAME, **self.attributes}
+        if self.job_id:
+            resource["job.id"] = self.job_id
+        if self.dropped:
+            resource["trace.dropped_spans"] = self.dropped
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(resource)},
+            "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": self.export_spans()}],
+        }]}
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_traces = {}
+_traces_lock = threading.Lock()
+
+def current_span():
+    """Get the span the current code runs in, or None outside a traced job."""
+    return _current_span.get()
+
+def start_span(name, category=None, parent=None, start_ns=None, **attributes):
+    """
+    Start a span without making it current, for work that ends elsewhere.
+
+    Args:
+        name (str): Span name
+        category (str, optional): Where the time goes (CATEGORY_*), for the summary
+        parent (Span, optional): Parent span. Defaults to the current span.
+        start_ns (int, optional): Start time if it began earlier, in Unix nanoseconds
+
+    Returns:
+        Span: The span, to be ended with end(); NO_SPAN outside a traced job
+    """
+    parent = parent or _current_span.get()
+    if parent is None or parent is NO_SPAN:
+        return NO_SPAN
+    span = Span(parent.trace, name, parent.span_id, category, attributes, start_ns)
+    return span if parent.trace.add(span) else NO_SPAN
+
+@contextmanager
+def span(name, category=None, **attributes):
+    """
+    Record the block as a child span of the current span.
+
+    Outside a traced job this yields NO_SPAN and costs a context variable lookup.
+
+    Args:
+        name (str): Span name, e.g. "render.cli"
+        category (str, optional): Where the time goes (CATEGORY_*), for the summary
+    """
+    current = start_span(name, category, **attributes)
+    if current is NO_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def record_span(name, start_ns, end_ns=None, category=None, parent=None, **attributes):
+    """Record an operation that has already happened, e.g. time spent waiting in a queue."""
+    start_span(name, category, parent=parent, start_ns=start_ns, **attributes).end(end_ns)
+
+def traced(name, category=None):
+    """Decorator recording each call of a function as a span, see span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_trace(job_id, activate=True, **attributes):
+    """
+    Start the trace of a job with its root span.
+
+    Args:
+        job_id (str): Job id
+        activate (bool): Make the root span current in this context, until finish_trace
+        **attributes: Attributes of the root span
+
+    Returns:
+        Span: The root span, or NO_SPAN if tracing is disabled
+    """
+    if not tracing_enabled():
+        return NO_SPAN
+    trace = Trace(job_id)
+    trace.root = Span(trace, "job", attributes={"job.id": job_id, **attributes})
+    trace.add(trace.root)
+    with _traces_lock:
+        _traces[job_id] = trace
+    if activate:
+        _current_span.set(trace.root)
+    return trace.root
+
+def _get_trace(job_id):
+    with _traces_lock:
+        return _traces.get(job_id)
+
+@contextmanager
+def job_trace(job_id):
+    """Make a job's root span current in the block, for work done outside the job's own thread."""
+    trace = _get_trace(job_id)
+    token = _current_span.set(trace.root if trace else None)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+def activate_trace(job_id):
+    """Make a job's root span current in this context, e.g. in the coroutine running the job."""
+    trace = _get_trace(job_id)
+    if trace is not None:
+        _current_span.set(trace.root)
+
+def finish_trace(job_id, error=None, **attributes):
+    """
+    End a job's trace and export it.
+
+    Args:
+        job_id (str): Job id
+        error (Exception, optional): Why the job failed
+        **attributes: Final attributes of the root span, e.g. the job status
+    """
+    with _traces_lock:
+        trace = _traces.pop(job_id, None)
+    if trace is None:
+        return
+    current = _current_span.get()
+    if current is not None and current is not NO_SPAN and current.trace is trace:
+        _current_span.set(None)
+    if error is not None:
+        trace.root.record_error(error)
+    trace.root.end(**attributes)
+    export_trace(trace)
+
+def export_trace(trace):
+    """
+    Write a finished trace to its file and, if TRACE_EXPORT_URL is set, post it to the collector.
+
+    The collector (OTLP/HTTP with JSON, e.g. http://localhost:4318/v1/traces)
+    is posted to in the background so a slow collector doesn't hold up jobs.
+    """
+    payload = trace.to_otlp()
+    path = get_trace_path(trace.job_id)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(temp_path, path)
+        EXPORTED.inc(destination="file", outcome="ok")
+    except OSError as e:
+        EXPORTED.inc(destination="file", outcome="error")
+        logger.error(f"Could not write trace of job {trace.job_id}: {e}")
+
+    url = os.environ.get("TRACE_EXPORT_URL")
+    if url:
+        threading.Thread(target=_post_trace, args=(url, payload, trace.job_id), daemon=True).start()
+
+def _post_trace(url, payload, job_id):
+    try:
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=float(os.environ.get("TRACE_EXPORT_TIMEOUT", "5"))):
+            pass
+        EXPORTED.inc(destination="collector", outcome="ok")
+    except Exception as e:
+        EXPORTED.inc(destination="collector", outcome="error")
+        logger.warning(f"Could not export trace of job {job_id} to {url}: {e}")
+
+def get_trace(job_id):
+    """
+    Get a job's trace: live while the job runs, from its file afterwards.
+
+    Returns:
+        dict: OTLP/JSON trace, or None if the job has no trace
+    """
+    trace = _get_trace(job_id)
+    if trace is not None:
+        return trace.to_otlp()
+    try:
+        with open(get_trace_path(job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+@contextmanager
+def continue_trace(context, name, **attributes):
+    """
+    Record spans in another process as children of a span of the job's trace.
+
+    Used by render workers: the API passes span.context() with the task and
+    the worker hands the recorded spans back with its result, to be merged
+    with Trace.add_remote.
+
+    Args:
+        context (dict): trace_id and span_id of the parent, or None to record nothing
+        name (str): Name of the span covering the block
+
+    Yields:
+        Trace: The local part of the trace; export_spans() gives the spans to hand back
+    """
+    if not context or not tracing_enabled():
+        yield None
+        return
+    trace = Trace(trace_id=context["trace_id"])
+    trace.root = Span(trace, name, parent_id=context["span_id"], attributes=attributes)
+    trace.add(trace.root)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.root.end()
+
+def add_remote_spans(parent, spans):
+    """Merge spans recorded in another process into the trace of their parent span."""
+    if spans and parent is not NO_SPAN:
+        parent.trace.add_remote(spans)
+
+def summarize(otlp):
+    """
+    Break a job's time down by where it went.
+
+    Sums the time of categorized spans (LLM, queue waits, render, TTS, I/O,
+    compute) per category. Time a categorized span spends in a categorized
+    descendant counts only for the descendant, e.g. publishing the video at
+    the end of a render counts as I/O. Jobs run parts in parallel, so the
+    categories can add up to more than the job's wall time.
+
+    Args:
+        otlp (dict): Trace as returned by get_trace
+
+    Returns:
+        dict: "total_seconds", "by_category" seconds, "slowest" spans and "errors"
+    """
+    spans = [span for resource in otlp.get("resourceSpans", [])
+             for scope in resource.get("scopeSpans", []) for span in scope.get("spans", [])]
+
+    def seconds(span):
+        return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+
+    def attribute(span, key):
+        for item in span.get("attributes", []):
+            if item["key"] == key:
+                return next(iter(item["value"].values()))
+        return None
+
+    children = {}
+    for span in spans:
+        children.setdefault(span.get("parentSpanId"), []).append(span)
+
+    def categorized_below(span):
+        """Seconds spent in the nearest categorized descendants of a span."""
+        total = 0.0
+        for child in children.get(span["spanId"], []):
+            total += seconds(child) if attribute(child, "category") else categorized_below(child)
+        return total
+
+    by_category = {}
+    for span in spans:
+        category = attribute(span, "category")
+        if category:
+            own = max(0.0, seconds(span) - categorized_below(span))
+            by_category[category] = by_category.get(category, 0.0) + own
+    root = next((span for span in spans if span["name"] == "job" and not span.get("parentSpanId")), None)
+    slowest = sorted((span for span in spans if span is not root), key=seconds, reverse=True)[:10]
+    return {
+        "total_seconds": seconds(root) if root else None,
+        "in_progress": bool(root and attribute(root, "in_progress")),
+        "by_category": {category: round(value, 3) for category, value in sorted(by_category.items())},
+        "slowest": [{"name": span["name"], "seconds": round(seconds(span), 3)} for span in slowest],
+        "errors": [{"name": span["name"], "message": span["status"].get("message")}
+                   for span in spans if span.get("status", {}).get("code") == STATUS_ERROR],
+        "spans": len(spans),
+    }
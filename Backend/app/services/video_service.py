@@ -6,38 +6,85 @@ import importlib.util
 import glob
 import shutil
 import subprocess
+import multiprocessing
 from pathlib import Path
 import time
 from .manim_service import save_manim_code, SCENE_CLASS_NAME
+from .text_cache import install_manim_text_cache
+from .scene_cost import estimate_render_cost, get_render_timeout
+from .encoder_profiles import get_profile, encode_with_profile
+from .live_publisher import LivePublisher
+from .render_checkpoint import RenderCheckpoint, checkpoints_enabled, checkpoint_env, install_checkpoint_hook
+from .profiling import get_profile_dir, profiling_env, profile_render
+from .tracing import traced, CATEGORY_RENDER, CATEGORY_IO
+from .render_limits import (
+    RenderTimeout, apply_render_limits, get_render_limits, limits_env, run_with_timeout
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Written next to a mock video, so a placeholder isn't mistaken for a render
+MOCK_MARKER_SUFFIX = ".mock"
+
+def is_mock_video(video_path):
+    """Check whether a video is a mock created because rendering failed."""
+    return bool(video_path) and os.path.exists(f"{video_path}{MOCK_MARKER_SUFFIX}")
+
+def _clear_mock_marker(video_path):
+    """Forget that a path held a mock video, once a real one is published there."""
+    try:
+        os.remove(f"{video_path}{MOCK_MARKER_SUFFIX}")
+    except FileNotFoundError:
+        pass
+
 # Get absolute paths for project directories
-def get_project_paths():
-    """Get absolute paths for project directories."""
+def get_project_paths(job_id=None):
+    """
+    Get absolute paths for project directories.
+    
+    Args:
+        job_id (str, optional): Job id. When given, the final video gets its own
+            per-job location instead of the shared default path.
+    """
     project_root = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
     media_dir = os.path.abspath(os.path.join(project_root, "media"))
     output_dir = os.path.abspath(os.path.join(project_root, "animation", "output"))
     
+    if job_id:
+        final_output_path = os.path.join(output_dir, "videos", job_id, f"{SCENE_CLASS_NAME}.mp4")
+    else:
+        final_output_path = os.path.join(output_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4")
+    
     # Create directories if they don't exist
     os.makedirs(media_dir, exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "videos", SCENE_CLASS_NAME, "1080p60"), exist_ok=True)
+    os.makedirs(os.path.dirname(final_output_path), exist_ok=True)
     
     return {
         "project_root": project_root,
         "media_dir": media_dir,
         "output_dir": output_dir,
-        "final_output_path": os.path.join(output_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4")
+        "final_output_path": final_output_path
     }
 
-def create_video(manim_code):
+def create_video(manim_code, job_id=None, timeout=None, profile=None, live=False, profiling=False):
     """
     Create a video from Manim code.
     
     Args:
         manim_code (str): Generated Manim code
+        job_id (str, optional): Job id used to keep this job's files separate
+        timeout (float, optional): Wall-clock timeout per render attempt.
+            Derived from the code's estimated render cost if not provided.
+        profile (str, optional): Encoder profile name. Defaults to ENCODER_PROFILE.
+        live (bool): Publish partial movies to the job's live playlist while rendering
+        profiling (bool): Profile the render into the job's profile directory
+        
+    A job's finished partial movies are checkpointed, so rendering the
+    same code for the same job again resumes after the last finished
+    animation instead of starting from frame zero. Checkpoints stay after
+    the video is published, as the base for edits of the job.
         
     Returns:
         str: Path to the generated video file
@@ -46,68 +93,283 @@ def create_video(manim_code):
     
     try:
         # Get project paths
-        paths = get_project_paths()
+        paths = get_project_paths(job_id)
         project_root = paths["project_root"]
         media_dir = paths["media_dir"]
         output_dir = paths["output_dir"]
         final_output_path = paths["final_output_path"]
         
         # Save the code to a temporary file
-        temp_file = save_manim_code(manim_code)
+        temp_file = save_manim_code(manim_code, filename=get_scene_file_path(job_id))
+        
+        if timeout is None:
+            timeout = get_render_timeout(estimate_render_cost(manim_code))
+        encoder_profile = get_profile(profile)
+        checkpoint = None
+        if job_id and checkpoints_enabled():
+            checkpoint = RenderCheckpoint.for_job(job_id, manim_code, encoder_profile["manim_quality"])
         
-        # Try running Manim using command-line approach (most reliable)
-        video_path = run_manim_cli(temp_file, media_dir, final_output_path)
+        publisher = None
+        if live and job_id:
+            partial_dir = get_partial_movie_dir(media_dir, get_module_name(temp_file), encoder_profile["quality_dir"])
+            publisher = LivePublisher(job_id, partial_dir)
+            publisher.start()
+        profile_dir = get_profile_dir(job_id) if profiling and job_id else None
+        try:
+            # The render process profiles itself; this covers the waiting and FFmpeg work around it
+            with profile_render("render_job", profile_dir):
+                return render_video(temp_file, media_dir, output_dir, final_output_path, timeout, encoder_profile,
+                                    checkpoint=checkpoint, profile_dir=profile_dir)
+        finally:
+            if publisher:
+                publisher.finish()
+            
+    except Exception as e:
+        logger.error(f"Unexpected error creating video: {str(e)}")
+        # Fall back to mock video
+        paths = get_project_paths(job_id)
+        return create_mock_video(paths["output_dir"], paths["final_output_path"])
+
+def render_video(temp_file, media_dir, output_dir, final_output_path, timeout, profile, checkpoint=None,
+                 profile_dir=None):
+    """
+    Render a saved scene, trying the CLI, then the API, then the partial movies.
+    
+    With a checkpoint each attempt resumes after the animations an earlier
+    attempt finished, and a checkpoint that already holds every animation
+    is published without rendering. With a profile_dir the render
+    processes write their profiles there. Falls back to a mock video if
+    nothing could be rendered.
+    
+    Returns:
+        str: Path to the generated video file
+    """
+    if checkpoint is not None and checkpoint.is_complete():
+        video_path = publish_checkpoint(checkpoint, final_output_path, profile)
+        if video_path:
+            logger.info(f"Published video from a complete checkpoint at {video_path}")
+            return video_path
+    
+    try:
+        video_path = run_manim_cli(temp_file, media_dir, final_output_path, timeout=timeout,
+                                   profile=profile, checkpoint=checkpoint, profile_dir=profile_dir)
         if video_path:
             logger.info(f"Successfully created video at {video_path}")
             return video_path
             
         # If CLI approach failed, try Python API approach
-        video_path = run_manim_api(temp_file, media_dir, final_output_path)
+        video_path = run_manim_api(temp_file, media_dir, final_output_path, timeout=timeout,
+                                   profile=profile, checkpoint=checkpoint, profile_dir=profile_dir)
         if video_path:
             logger.info(f"Successfully created video using Python API at {video_path}")
             return video_path
-            
-        # If neither approach worked, try to find partial movie files and combine them
-        video_path = combine_partial_movies(media_dir, final_output_path)
-        if video_path:
-            logger.info(f"Successfully combined partial videos at {video_path}")
-            return video_path
+    except RenderTimeout as e:
+        # A second attempt would hit the same limit, keep whatever was rendered
+        logger.error(f"Render timed out: {e}")
         
-        # If all direct Manim approaches failed, create a mock video
-        logger.warning("All Manim approaches failed, creating mock video")
-        return create_mock_video(output_dir)
-            
+    # If neither approach worked, try to find partial movie files and combine them
+    video_path = combine_partial_movies(media_dir, final_output_path, get_module_name(temp_file),
+                                        profile=profile, checkpoint=checkpoint)
+    if video_path:
+        logger.info(f"Successfully combined partial videos at {video_path}")
+        return video_path
+    
+    # If all direct Manim approaches failed, create a mock video
+    logger.warning("All Manim approaches failed, creating mock video")
+    return create_mock_video(output_dir, final_output_path)
+
+def _resume_index(checkpoint):
+    """Get the animation index a render resumes from, logging when it skips any."""
+    if checkpoint is None:
+        return 0
+    start = checkpoint.resume_index()
+    if start:
+        logger.info(f"Resuming render from animation {start}, reusing {start} checkpointed segments")
+    return start
+
+def publish_checkpoint(checkpoint, final_output_path, profile):
+    """
+    Publish a resumed render from its checkpointed segments.
+    
+    Manim's own output of a resumed render only holds the animations it
+    rendered this time, so the video is joined from every segment instead.
+    
+    Returns:
+        str: Path of the published video, or None if the segments are incomplete
+    """
+    if not checkpoint.is_complete():
+        logger.warning("Resumed render finished without a segment for every animation")
+        return None
+    assembled = checkpoint.assemble(os.path.join(checkpoint.directory, f"{SCENE_CLASS_NAME}.mp4"))
+    if not assembled:
+        return None
+    return publish_output(assembled, final_output_path, profile)
+
+def get_section_paths(job_id, index):
+    """Get the scene file and output video of one streamed section of a job."""
+    section_id = f"{job_id}_s{index:02d}"
+    output_dir = get_project_paths()["output_dir"]
+    return {
+        "scene_file": get_scene_file_path(section_id),
+        "video": os.path.join(output_dir, "sections", job_id, f"section_{index:02d}.mp4"),
+    }
+
+def render_section(manim_code, job_id, index, timeout=None, profile=None):
+    """
+    Render one self-contained section of a streamed scene.
+    
+    Unlike create_video there is no mock fallback: a failed section makes
+    the caller render the whole scene instead.
+    
+    Args:
+        manim_code (str): The section as a complete scene
+        job_id (str): Job id
+        index (int): Section index
+        timeout (float, optional): Wall-clock timeout for the render
+        profile (str, optional): Encoder profile name
+        
+    Returns:
+        str: Path to the section video, or None if it couldn't be rendered
+    """
+    paths = get_section_paths(job_id, index)
+    media_dir = get_project_paths()["media_dir"]
+    os.makedirs(os.path.dirname(paths["video"]), exist_ok=True)
+    temp_file = save_manim_code(manim_code, filename=paths["scene_file"])
+    if timeout is None:
+        timeout = get_render_timeout(estimate_render_cost(manim_code))
+    encoder_profile = get_profile(profile)
+    
+    try:
+        video_path = run_manim_cli(temp_file, media_dir, paths["video"], timeout=timeout,
+                                   profile=encoder_profile)
+        if not video_path:
+            video_path = run_manim_api(temp_file, media_dir, paths["video"], timeout=timeout,
+                                       profile=encoder_profile)
+    except RenderTimeout as e:
+        logger.error(f"Section {index} of job {job_id} timed out: {e}")
+        return None
+    if video_path and os.path.exists(video_path):
+        logger.info(f"Rendered section {index} of job {job_id}")
+        return video_path
+    return None
+
+@traced("render.stitch_sections", CATEGORY_IO)
+def stitch_sections(section_paths, final_output_path):
+    """
+    Join rendered sections into the final video.
+    
+    Every section was encoded with the same profile, so the streams are
+    copied rather than re-encoded.
+    
+    Args:
+        section_paths (list): Section videos in order
+        final_output_path (str): Where to write the joined video
+        
+    Returns:
+        str: final_output_path, or None if FFmpeg failed
+    """
+    file_list_path = os.path.join(os.path.dirname(section_paths[0]), "sections.txt")
+    with open(file_list_path, "w", encoding="utf-8") as f:
+        for path in section_paths:
+            clean_path = path.replace('\\', '/')
+            f.write(f"file '{clean_path}'\n")
+    
+    os.makedirs(os.path.dirname(final_output_path), exist_ok=True)
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", file_list_path,
+           "-c", "copy", "-movflags", "+faststart", final_output_path]
+    try:
+        result = run_with_timeout(cmd, float(os.environ.get("FFMPEG_TIMEOUT", "300")))
     except Exception as e:
-        logger.error(f"Unexpected error creating video: {str(e)}")
-        # Fall back to mock video
-        paths = get_project_paths()
-        return create_mock_video(paths["output_dir"])
+        logger.error(f"Error stitching sections: {e}")
+        return None
+    if result.returncode != 0 or not os.path.exists(final_output_path):
+        logger.error(f"FFmpeg failed to stitch sections: {result.stderr}")
+        return None
+    _clear_mock_marker(final_output_path)
+    logger.info(f"Stitched {len(section_paths)} sections into {final_output_path}")
+    return final_output_path
+
+def remove_sections(job_id, count):
+    """Delete a job's section videos and scene files once they've been stitched."""
+    output_dir = get_project_paths()["output_dir"]
+    shutil.rmtree(os.path.join(output_dir, "sections", job_id), ignore_errors=True)
+    for index in range(count):
+        scene_file = get_section_paths(job_id, index)["scene_file"]
+        if os.path.exists(scene_file):
+            os.remove(scene_file)
 
-def run_manim_cli(temp_file, media_dir, final_output_path):
-    """Run Manim using command-line interface."""
+def get_scene_file_path(job_id=None):
+    """Get the path the scene code is saved to, unique per job when a job id is given."""
+    if not job_id:
+        return None
+    return os.path.abspath(os.path.join(tempfile.gettempdir(), f"scene_{job_id}.py"))
+
+def get_module_name(temp_file):
+    """Get the module name Manim uses for its output directories."""
+    return os.path.splitext(os.path.basename(temp_file))[0]
+
+@traced("publish.video", CATEGORY_IO)
+def publish_output(video_path, final_output_path, profile):
+    """
+    Encode a rendered video with the job's profile into its final location.
+    
+    Falls back to copying Manim's own encode if the profile encode fails.
+    
+    Returns:
+        str: Path of the published video
+    """
+    _clear_mock_marker(final_output_path)
+    if encode_with_profile(video_path, final_output_path, profile):
+        logger.info(f"Published {profile['name']} encode to {final_output_path}")
+        return final_output_path
+    try:
+        shutil.copyfile(video_path, final_output_path)
+        logger.info(f"Copied to {final_output_path}")
+        return final_output_path
+    except Exception as e:
+        logger.error(f"Error copying file: {e}")
+        return video_path
+
+@traced("render.cli", CATEGORY_RENDER)
+def run_manim_cli(temp_file, media_dir, final_output_path, timeout=None, profile=None, checkpoint=None,
+                  profile_dir=None):
+    """
+    Run Manim using command-line interface.
+    
+    The render runs in its own process group with a wall-clock timeout and
+    CPU, address space and output file size limits. With a checkpoint it
+    starts from the first animation without a finished segment.
+    
+    Raises:
+        RenderTimeout: If the render exceeded its timeout
+    """
+    timeout = timeout or get_render_timeout(0)
+    profile = profile or get_profile()
     try:
         logger.info("Running Manim via CLI")
         
-        # Command to run Manim
+        # Command to run Manim (through our runner so the shared text cache is installed)
+        project_root = get_project_paths()["project_root"]
         cmd = [
-            sys.executable, "-m", "manim",
+            sys.executable, "-m", "app.services.manim_runner",
             temp_file, SCENE_CLASS_NAME,
             "--media_dir", media_dir,
             "-o", SCENE_CLASS_NAME,
             "--format", "mp4",
-            "--quality", "h"  # High quality
+            "--quality", profile["quality"]
         ]
+        start = _resume_index(checkpoint)
+        if start:
+            cmd += ["--from_animation_number", str(start)]
         
         logger.info(f"Running command: {' '.join(cmd)}")
         
-        # Run with proper encoding settings
-        result = subprocess.run(
+        # Run with a timeout; the runner applies the resource limits to itself
+        result = run_with_timeout(
             cmd,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",  # Handle encoding errors gracefully
-            check=False  # Don't raise exception on non-zero exit
+            timeout,
+            cwd=project_root,
+            env=profiling_env(checkpoint_env(limits_env(get_render_limits(timeout)), checkpoint), profile_dir)
         )
         
         if result.returncode != 0:
@@ -115,10 +377,14 @@ def run_manim_cli(temp_file, media_dir, final_output_path):
             logger.warning(f"Error: {result.stderr}")
             return None
         
+        if start:
+            return publish_checkpoint(checkpoint, final_output_path, profile)
+        
         # Check possible output locations
         possible_paths = [
-            os.path.join(media_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4"),
-            os.path.join(media_dir, "videos", "1080p60", f"{SCENE_CLASS_NAME}.mp4")
+            os.path.join(media_dir, "videos", get_module_name(temp_file), profile["quality_dir"], f"{SCENE_CLASS_NAME}.mp4"),
+            os.path.join(media_dir, "videos", SCENE_CLASS_NAME, profile["quality_dir"], f"{SCENE_CLASS_NAME}.mp4"),
+            os.path.join(media_dir, "videos", profile["quality_dir"], f"{SCENE_CLASS_NAME}.mp4")
         ]
         
         # Allow a moment for file operations to complete
@@ -128,84 +394,128 @@ def run_manim_cli(temp_file, media_dir, final_output_path):
         for path in possible_paths:
             if os.path.exists(path):
                 logger.info(f"Found Manim output at {path}")
-                try:
-                    # Copy to final location
-                    shutil.copyfile(path, final_output_path)
-                    logger.info(f"Copied to {final_output_path}")
-                    return final_output_path
-                except Exception as e:
-                    logger.error(f"Error copying file: {e}")
-                    return path
+                return publish_output(path, final_output_path, profile)
         
         # If we get here, Manim ran but we couldn't find the output
         logger.warning("Manim CLI ran without errors but output file not found")
         return None
         
+    except RenderTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error running Manim CLI: {e}")
         return None
 
-def run_manim_api(temp_file, media_dir, final_output_path):
-    """Run Manim using Python API."""
+def _render_scene_in_child(temp_file, media_dir, limits, manim_quality="high_quality",
+                           checkpoint_dir=None, start=0, profile_dir=None):
+    """Render a scene module with the Manim API. Runs in a separate process."""
+    apply_render_limits(limits)
+    
+    import manim
+    logger.info(f"Rendering with Manim {manim.__version__} API")
+    manim.config.media_dir = media_dir
+    manim.config.quality = manim_quality
+    if start:
+        manim.config.from_animation_number = start
+    
+    # Reuse rendered text across jobs and processes
+    install_manim_text_cache()
+    install_checkpoint_hook(checkpoint_dir)
+    
+    # Import the module dynamically
+    module_name = get_module_name(temp_file)
+    spec = importlib.util.spec_from_file_location(module_name, temp_file)
+    animation_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(animation_module)
+    
+    # Get the scene class and render it
+    scene_class_obj = getattr(animation_module, SCENE_CLASS_NAME)
+    scene = scene_class_obj()
+    with profile_render("render_api", profile_dir):
+        scene.render(preview=False)
+
+@traced("render.api", CATEGORY_RENDER)
+def run_manim_api(temp_file, media_dir, final_output_path, timeout=None, profile=None, checkpoint=None,
+                  profile_dir=None):
+    """
+    Run Manim using Python API.
+    
+    The generated module is imported and rendered in a child process with
+    the same timeout and resource limits as the CLI, never in the server
+    process. Like the CLI it resumes from a checkpoint.
+    
+    Raises:
+        RenderTimeout: If the render exceeded its timeout
+    """
+    timeout = timeout or get_render_timeout(0)
+    profile = profile or get_profile()
     try:
-        # Try to import Manim
-        try:
-            import manim
-            logger.info(f"Successfully imported Manim {manim.__version__}")
-        except ImportError as e:
-            logger.error(f"Failed to import Manim: {e}")
+        # Check Manim is available without importing it here
+        if importlib.util.find_spec("manim") is None:
+            logger.error("Failed to import Manim: module not found")
             return None
-            
-        # Directory containing the temp file
-        module_dir = os.path.dirname(temp_file)
-        module_name = os.path.splitext(os.path.basename(temp_file))[0]
         
-        # Add directory to path
-        if module_dir not in sys.path:
-            sys.path.insert(0, module_dir)
+        start = _resume_index(checkpoint)
+        ctx = multiprocessing.get_context("spawn")
+        process = ctx.Process(
+            target=_render_scene_in_child,
+            args=(temp_file, media_dir, get_render_limits(timeout), profile["manim_quality"],
+                  checkpoint.directory if checkpoint else None, start, profile_dir),
+            daemon=True
+        )
+        process.start()
+        process.join(timeout)
         
-        # Set Manim configuration in environment
-        os.environ["MEDIA_DIR"] = media_dir
+        if process.is_alive():
+            process.kill()
+            process.join()
+            raise RenderTimeout(f"Manim API render exceeded {timeout:.0f}s timeout")
         
-        # Import the module dynamically
-        try:
-            spec = importlib.util.spec_from_file_location(module_name, temp_file)
-            animation_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(animation_module)
-            
-            # Get the scene class
-            scene_class_obj = getattr(animation_module, SCENE_CLASS_NAME)
-            
-            # Render the scene
-            scene = scene_class_obj()
-            scene.render(preview=False)
-            
-            # Try to find the output file
-            return find_and_copy_output(media_dir, final_output_path)
-        
-        except Exception as e:
-            logger.error(f"Error using Manim API: {e}")
+        if process.exitcode != 0:
+            logger.error(f"Error using Manim API: render process exited with code {process.exitcode}")
             return None
-            
+        
+        if start:
+            return publish_checkpoint(checkpoint, final_output_path, profile)
+        
+        # Try to find the output file
+        return find_and_copy_output(media_dir, final_output_path, get_module_name(temp_file), profile)
+    
+    except RenderTimeout:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in Manim API approach: {e}")
         return None
 
-def find_and_copy_output(media_dir, final_output_path):
-    """Find and copy the generated video to final location."""
+def find_and_copy_output(media_dir, final_output_path, module_name=None, profile=None):
+    """
+    Find and copy the generated video to final location.
+    
+    With a module name only that scene's output directory is searched, so
+    the lookup stays cheap however much other media has accumulated.
+    """
+    profile = profile or get_profile()
+    
     # Wait briefly for file operations to complete
     time.sleep(1)
     
-    # Define search patterns from most specific to most general
-    search_patterns = [
-        # Exact matches
-        os.path.join(media_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4"),
-        os.path.join(media_dir, "videos", "1080p60", f"{SCENE_CLASS_NAME}.mp4"),
-        # Pattern matches
-        os.path.join(media_dir, "videos", "**", f"{SCENE_CLASS_NAME}.mp4"),
-        os.path.join(media_dir, "videos", "**", "*.mp4"),
-        os.path.join(media_dir, "**", "*.mp4")
-    ]
+    if module_name:
+        module_dir = os.path.join(media_dir, "videos", module_name)
+        search_patterns = [
+            os.path.join(module_dir, profile["quality_dir"], f"{SCENE_CLASS_NAME}.mp4"),
+            os.path.join(module_dir, "*", f"{SCENE_CLASS_NAME}.mp4")
+        ]
+    else:
+        # Define search patterns from most specific to most general
+        search_patterns = [
+            # Exact matches
+            os.path.join(media_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4"),
+            os.path.join(media_dir, "videos", "1080p60", f"{SCENE_CLASS_NAME}.mp4"),
+            # Pattern matches
+            os.path.join(media_dir, "videos", "**", f"{SCENE_CLASS_NAME}.mp4"),
+            os.path.join(media_dir, "videos", "**", "*.mp4"),
+            os.path.join(media_dir, "**", "*.mp4")
+        ]
     
     # Try each pattern
     for pattern in search_patterns:
@@ -218,79 +528,78 @@ def find_and_copy_output(media_dir, final_output_path):
                 matches.sort(key=os.path.getmtime, reverse=True)
                 video_path = matches[0]
                 logger.info(f"Found video at {video_path}")
-                
-                # Copy to final location
-                try:
-                    shutil.copyfile(video_path, final_output_path)
-                    logger.info(f"Copied to {final_output_path}")
-                    return final_output_path
-                except Exception as e:
-                    logger.error(f"Error copying file: {e}")
-                    return video_path
+                return publish_output(video_path, final_output_path, profile)
         else:
             # Direct file check
             if os.path.exists(pattern):
                 logger.info(f"Found video at {pattern}")
-                
-                # Copy to final location
-                try:
-                    shutil.copyfile(pattern, final_output_path)
-                    logger.info(f"Copied to {final_output_path}")
-                    return final_output_path
-                except Exception as e:
-                    logger.error(f"Error copying file: {e}")
-                    return pattern
+                return publish_output(pattern, final_output_path, profile)
     
     # If we get here, no video was found
     logger.warning("No video found")
     return None
 
-def combine_partial_movies(media_dir, final_output_path):
-    """Combine partial movie files if they exist."""
+@traced("render.combine_partial_movies", CATEGORY_RENDER)
+def combine_partial_movies(media_dir, final_output_path, module_name=None, profile=None, checkpoint=None):
+    """
+    Combine partial movie files if they exist.
+    
+    The checkpoint's segments are used when there are any, since they are
+    in animation order and survive earlier attempts. Otherwise the partial
+    movies are taken in the order Manim wrote them.
+    
+    Profiles with FFmpeg settings re-encode while concatenating; otherwise
+    the partial streams are copied as they are.
+    """
+    profile = profile or get_profile()
     try:
         logger.info("Checking for partial movie files...")
         
-        # Check partial movie directory
-        partial_dir = os.path.join(media_dir, "videos", "1080p60", "partial_movie_files", SCENE_CLASS_NAME)
-        
-        if not os.path.exists(partial_dir):
-            logger.info(f"Partial movie directory not found: {partial_dir}")
-            return None
+        partial_files = checkpoint.segments() if checkpoint is not None else []
+        if partial_files:
+            logger.info(f"Using {len(partial_files)} checkpointed segments")
+        else:
+            # Check partial movie directory
+            partial_dir = get_partial_movie_dir(media_dir, module_name, profile["quality_dir"])
             
-        # Look for MP4 files
-        partial_files = glob.glob(os.path.join(partial_dir, "*.mp4"))
-        
-        if not partial_files:
-            logger.info("No partial movie files found")
-            return None
+            if not os.path.exists(partial_dir):
+                logger.info(f"Partial movie directory not found: {partial_dir}")
+                return None
+                
+            # Look for MP4 files; Manim names them by hash, so order them by write time
+            partial_files = [
+                path for path in glob.glob(os.path.join(partial_dir, "*.mp4"))
+                if "temp" not in os.path.basename(path)
+            ]
+            partial_files.sort(key=os.path.getmtime)
             
-        logger.info(f"Found {len(partial_files)} partial movie files")
+            if not partial_files:
+                logger.info("No partial movie files found")
+                return None
+                
+            logger.info(f"Found {len(partial_files)} partial movie files")
         
         # Create file list for FFmpeg
-        file_list_path = os.path.join(tempfile.gettempdir(), "file_list.txt")
+        file_list_path = os.path.join(tempfile.gettempdir(), f"file_list_{module_name or 'scene'}.txt")
         with open(file_list_path, 'w', encoding="utf-8") as f:
-            # Sort files to ensure correct order
-            for partial in sorted(partial_files):
+            for partial in partial_files:
                 # Use forward slashes for paths in file list
                 clean_path = partial.replace('\\', '/')
                 f.write(f"file '{clean_path}'\n")
         
         # Use FFmpeg to concatenate files
         try:
+            codec_args = profile["ffmpeg_args"] or ["-c", "copy"]
             ffmpeg_cmd = [
                 "ffmpeg", "-y", "-f", "concat", "-safe", "0",
-                "-i", file_list_path, "-c", "copy", final_output_path
+                "-i", file_list_path, *codec_args, final_output_path
             ]
             
             logger.info(f"Running FFmpeg: {' '.join(ffmpeg_cmd)}")
             
-            result = subprocess.run(
+            result = run_with_timeout(
                 ffmpeg_cmd,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                check=False
+                float(os.environ.get("FFMPEG_TIMEOUT", "300"))
             )
             
             if result.returncode != 0:
@@ -299,6 +608,7 @@ def combine_partial_movies(media_dir, final_output_path):
                 
             # Check if output was created
             if os.path.exists(final_output_path):
+                _clear_mock_marker(final_output_path)
                 logger.info(f"Combined video created at {final_output_path}")
                 return final_output_path
             else:
@@ -313,12 +623,58 @@ def combine_partial_movies(media_dir, final_output_path):
         logger.error(f"Error combining partial movies: {e}")
         return None
 
-def create_mock_video(output_dir):
+def get_job_partial_dir(job_id, profile=None):
+    """Get the partial movie directory of a job's render."""
+    module_name = get_module_name(get_scene_file_path(job_id))
+    return get_partial_movie_dir(get_project_paths(job_id)["media_dir"], module_name,
+                                 get_profile(profile)["quality_dir"])
+
+def seed_partial_movies(source_job_id, job_id, profile=None):
+    """
+    Give a job's render the partial movies Manim cached for another job.
+    
+    Manim names cached partial movies by a hash of the animation and the
+    scene state, so any animation of the new render that is identical to
+    one of the old render, later ones included, is served from this cache.
+    
+    Returns:
+        int: Partial movies seeded
+    """
+    source_dir = get_job_partial_dir(source_job_id, profile)
+    target_dir = get_job_partial_dir(job_id, profile)
+    if not os.path.isdir(source_dir):
+        return 0
+    os.makedirs(target_dir, exist_ok=True)
+    seeded = 0
+    for entry in os.scandir(source_dir):
+        # Uncached partials are numbered, not hashed, and get overwritten
+        if not entry.name.endswith(".mp4") or entry.name.startswith("uncached_"):
+            continue
+        target = os.path.join(target_dir, entry.name)
+        if os.path.exists(target):
+            continue
+        try:
+            os.link(entry.path, target)
+        except OSError:
+            shutil.copyfile(entry.path, target)
+        seeded += 1
+    return seeded
+
+def get_partial_movie_dir(media_dir, module_name=None, quality_dir="1080p60"):
+    """Get the directory Manim writes partial movie files to."""
+    if module_name:
+        return os.path.join(media_dir, "videos", module_name, quality_dir, "partial_movie_files", SCENE_CLASS_NAME)
+    return os.path.join(media_dir, "videos", quality_dir, "partial_movie_files", SCENE_CLASS_NAME)
+
+@traced("render.mock_video", CATEGORY_RENDER)
+def create_mock_video(output_dir, output_path=None):
     """
     Create a mock video as a fallback.
     
     Args:
         output_dir (str): Output directory
+        output_path (str, optional): Path to write the mock video to.
+            Defaults to the shared scene output path.
         
     Returns:
         str: Path to the mock video
@@ -326,19 +682,25 @@ def create_mock_video(output_dir):
     logger.warning("Creating mock video")
     
     # Define output path
-    output_path = os.path.join(output_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4")
+    if not output_path:
+        output_path = os.path.join(output_dir, "videos", SCENE_CLASS_NAME, "1080p60", f"{SCENE_CLASS_NAME}.mp4")
     
     # Ensure directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(f"{output_path}{MOCK_MARKER_SUFFIX}", "w"):
+        pass
     
     try:
         # Try to create a matplotlib animation
         import numpy as np
+        import matplotlib
+        matplotlib.use("Agg")
         import matplotlib.pyplot as plt
         import matplotlib.animation as animation
         from matplotlib.animation import FuncAnimation
         
         # Create figure and axis
+        fig = None
         try:
             fig, ax = plt.subplots()
             
@@ -379,6 +741,10 @@ def create_mock_video(output_dir):
                 f.write(b'Placeholder for video file')
             logger.warning(f"Created placeholder file at {output_path}")
             return output_path
+        finally:
+            # pyplot keeps every figure alive until it is closed
+            if fig is not None:
+                plt.close(fig)
             
     except ImportError:
         logger.error("Matplotlib not available, creating empty file")
@@ -1,12 +1,26 @@
 import logging
 import os
-from gtts import gTTS
 import tempfile
+from .tracing import traced, CATEGORY_TTS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def get_audio_output_dir():
+    """Get the directory voiceover audio is written to."""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
+                        "animation", "output", "audio")
+
+def get_audio_path(job_id):
+    """Get the voiceover audio path for a job."""
+    return os.path.join(get_audio_output_dir(), f"{job_id}.mp3")
+
+def voiceover_enabled():
+    """Check whether jobs get a voiceover of their script."""
+    return os.environ.get("VOICEOVER_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+@traced("tts.synthesize", CATEGORY_TTS)
 def create_voiceover(text, language='en', output_path=None):
     """
     Create a voiceover audio file from text using Google Text-to-Speech.
@@ -23,14 +37,16 @@ def create_voiceover(text, language='en', output_path=None):
     logger.info(f"Creating voiceover for text: {text[:50]}...")
     
     try:
+        # Imported here so the API process doesn't load gTTS until the first voiceover
+        from gtts import gTTS
+        
         # Create the TTS object
         tts = gTTS(text=text, lang=language, slow=False)
         
         # Determine output path if not provided
         if not output_path:
             # Create output directory in the animation folder
-            output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                                     "animation", "output", "audio")
+            output_dir = get_audio_output_dir()
             os.makedirs(output_dir, exist_ok=True)
             
             # Create a temporary filename
@@ -39,6 +55,7 @@ def create_voiceover(text, language='en', output_path=None):
             temp_file.close()
         
         # Save the audio file
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         tts.save(output_path)
         logger.info(f"Voiceover created successfully at {output_path}")
         
@@ -0,0 +1,360 @@
+"""
+Render worker.
+
+Leases renders from the shared render queue, runs them with create_video
+and puts the finished video in the artifact store. Start as many worker
+processes as there is CPU for; the API doesn't change:
+
+    RENDER_BACKEND=queue gunicorn app:app                    # API processes
+    python -m app.workers.render_worker --concurrency 2      # render workers
+
+The queue is a SQLite database, so workers run on the API's host (or in
+containers sharing its RENDER_QUEUE_DB and ARTIFACT_STORE_DIR on a local
+volume); RenderQueue refuses a database on a network filesystem.
+
+The workers run in a child process that a small supervisor replaces
+once it grows past RENDER_WORKER_MAX_RSS_MB or has run
+RENDER_WORKER_MAX_TASKS renders, so slow leaks never accumulate.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+from ..services.render_queue import get_render_queue
+from ..services.artifact_store import get_artifact_store
+from ..services.video_service import create_video, is_mock_video
+from ..services.profiling import get_profile_dir, is_profile_file
+from ..services.memory_accounting import get_rss_bytes, MB
+from ..services.tracing import continue_trace, span, CATEGORY_IO
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Exit code of a worker process that stopped to be replaced by a fresh one
+RECYCLE_EXIT_CODE = 75
+
+# Longest wait in seconds before replacing a worker process that crashed
+RESTART_BACKOFF_MAX = 60
+
+class MemoryGuard:
+    """
+    Decides when a worker process should be replaced.
+
+    Checked after every render, so renders are never cut short; the
+    process stops leasing once any of its workers crosses a limit.
+    """
+
+    def __init__(self, max_rss_mb=None, max_tasks=None):
+        """
+        Args:
+            max_rss_mb (float, optional): RSS limit in MB, 0 for none (RENDER_WORKER_MAX_RSS_MB)
+            max_tasks (int, optional): Renders per process, 0 for no limit (RENDER_WORKER_MAX_TASKS)
+        """
+        if max_rss_mb is None:
+            max_rss_mb = float(os.environ.get("RENDER_WORKER_MAX_RSS_MB", "2048"))
+        if max_tasks is None:
+            max_tasks = int(os.environ.get("RENDER_WORKER_MAX_TASKS", "0"))
+        self.max_rss_bytes = int(max_rss_mb * MB)
+        self.max_tasks = max_tasks
+        self.tasks = 0
+        self.reason = None
+        self._lock = threading.Lock()
+
+    def task_done(self):
+        """
+        Count a finished render and check the limits.
+
+        Returns:
+            bool: True if the process should be recycled
+        """
+        rss = get_rss_bytes()
+        with self._lock:
+            self.tasks += 1
+            if self.reason is None:
+                if self.max_rss_bytes and rss > self.max_rss_bytes:
+                    self.reason = f"RSS {rss / MB:.0f} MB over {self.max_rss_bytes / MB:.0f} MB"
+                elif self.max_tasks and self.tasks >= self.max_tasks:
+                    self.reason = f"{self.tasks} renders done"
+            return self.reason is not None
+
+class RenderWorker:
+    """
+    Loop that leases and runs renders until stopped.
+
+    While a render runs, a heartbeat thread keeps extending its lease. If
+    the worker dies the lease runs out after the visibility timeout and
+    another worker retries the render.
+    """
+
+    def __init__(self, queue=None, store=None, worker_id=None, visibility_timeout=None,
+                 heartbeat_interval=None, poll_interval=None, priorities=None, stop_event=None, node=None,
+                 guard=None):
+        """
+        Initialize the worker. Unset arguments come from the environment.
+
+        Args:
+            queue (RenderQueue, optional): Queue to lease from
+            store (ArtifactStore, optional): Store for finished videos
+            worker_id (str, optional): Id recorded on leases. Defaults to host, pid and a random suffix.
+            visibility_timeout (float, optional): Lease length in seconds (RENDER_QUEUE_VISIBILITY_TIMEOUT)
+            heartbeat_interval (float, optional): Seconds between heartbeats (RENDER_QUEUE_HEARTBEAT_INTERVAL)
+            poll_interval (float, optional): Seconds to wait when the queue is empty (RENDER_QUEUE_POLL_INTERVAL)
+            priorities (list, optional): Only run these priority classes
+            stop_event (threading.Event, optional): Shared stop signal
+            node (str, optional): Host whose caches this worker shares, for affinity
+                routing (RENDER_WORKER_NODE, defaults to the hostname)
+            guard (MemoryGuard, optional): Process limits; crossing one sets stop_event
+        """
+        self.queue = queue or get_render_queue()
+        self.store = store or get_artifact_store()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.visibility_timeout = visibility_timeout or float(os.environ.get("RENDER_QUEUE_VISIBILITY_TIMEOUT", "60"))
+        self.heartbeat_interval = heartbeat_interval or float(
+            os.environ.get("RENDER_QUEUE_HEARTBEAT_INTERVAL", str(self.visibility_timeout / 4))
+        )
+        self.poll_interval = poll_interval or float(os.environ.get("RENDER_QUEUE_POLL_INTERVAL", "1"))
+        self.priorities = priorities
+        self.stop_event = stop_event or threading.Event()
+        self.node = node or os.environ.get("RENDER_WORKER_NODE") or socket.gethostname()
+        self.guard = guard
+        self._last_purge = 0.0
+
+    def run(self, max_tasks=None):
+        """
+        Lease and run renders until stopped.
+
+        Args:
+            max_tasks (int, optional): Exit after this many renders
+        """
+        logger.info(f"Render worker {self.worker_id} started on node {self.node}")
+        done = 0
+        while not self.stop_event.is_set() and (max_tasks is None or done < max_tasks):
+            try:
+                task = self.queue.lease(self.worker_id, self.visibility_timeout, self.priorities, node=self.node)
+            except Exception as e:
+                logger.error(f"Error leasing from the render queue: {e}")
+                task = None
+            if task is None:
+                self._purge_finished()
+                self.stop_event.wait(self.poll_interval)
+                continue
+            try:
+                self.process(task)
+            except Exception as e:
+                # The lease runs out and another worker retries the render
+                logger.error(f"Error processing render task {task['id']}: {e}")
+                logger.error(traceback.format_exc())
+            done += 1
+            if self.guard and self.guard.task_done():
+                logger.info(f"Recycling the render worker process: {self.guard.reason}")
+                self.stop_event.set()
+        try:
+            # Stop routing renders to this worker's node on its account
+            self.queue.unregister_worker(self.worker_id)
+        except Exception as e:
+            logger.warning(f"Could not unregister render worker {self.worker_id}: {e}")
+        logger.info(f"Render worker {self.worker_id} stopped after {done} renders")
+
+    def process(self, task):
+        """Run one leased render and report the outcome."""
+        payload = task["payload"]
+        logger.info(f"Rendering task {task['id']} for job {task['job_id']} (attempt {task['attempts']})")
+        finished = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(task["id"], finished), name=f"heartbeat-{task['id'][:8]}", daemon=True
+        )
+        heartbeat.start()
+        started = time.monotonic()
+        try:
+            # Spans recorded here go back with the result, to join the job's trace in the API process
+            with continue_trace(payload.get("trace"), "render.worker", worker_id=self.worker_id,
+                                attempt=task["attempts"]) as trace:
+                video_path = create_video(
+                    payload["manim_code"], job_id=payload["job_id"], timeout=payload.get("timeout"),
+                    profile=payload.get("profile"), live=payload.get("live", False),
+                    profiling=payload.get("profiling", False)
+                )
+                key = f"videos/{payload['job_id']}/{os.path.basename(video_path)}"
+                with span("publish.artifact", CATEGORY_IO, key=key):
+                    self.store.put(video_path, key)
+                profiles = self._put_profiles(payload["job_id"]) if payload.get("profiling") else []
+        except Exception as e:
+            logger.error(f"Render task {task['id']} failed: {e}")
+            logger.error(traceback.format_exc())
+            self._report(self.queue.fail, task["id"], self.worker_id, e)
+            return
+        finally:
+            finished.set()
+            heartbeat.join()
+        self._report(self.queue.complete, task["id"], self.worker_id, {
+            "key": key,
+            "worker_id": self.worker_id,
+            "seconds": time.monotonic() - started,
+            "rss_bytes": get_rss_bytes(),
+            "profiles": profiles,
+            "mock": is_mock_video(video_path),
+            "spans": trace.export_spans() if trace else [],
+        })
+
+    def _report(self, finish, task_id, *args):
+        """
+        Record a render's outcome with queue.complete or queue.fail.
+
+        A queue error (e.g. "database is locked") is logged rather than raised,
+        so it doesn't stop the worker; the lease then runs out and another
+        worker retries the render.
+        """
+        try:
+            finish(task_id, *args)
+        except Exception as e:
+            logger.error(f"Could not record the outcome of render task {task_id}: {e}")
+
+    def _put_profiles(self, job_id):
+        """Put the render profiles of a job in the artifact store. Returns their keys."""
+        directory = get_profile_dir(job_id)
+        if not os.path.isdir(directory):
+            return []
+        return [self.store.put(os.path.join(directory, filename), f"profiles/{job_id}/{filename}")
+                for filename in sorted(os.listdir(directory)) if is_profile_file(filename)]
+
+    def _purge_finished(self):
+        """Now and then, while idle, drop finished tasks older than RENDER_QUEUE_RETENTION_HOURS."""
+        now = time.monotonic()
+        if now - self._last_purge < 600:
+            return
+        self._last_purge = now
+        retention = float(os.environ.get("RENDER_QUEUE_RETENTION_HOURS", "24")) * 3600
+        try:
+            self.queue.purge(retention)
+        except Exception as e:
+            logger.error(f"Error purging the render queue: {e}")
+
+    def _heartbeat(self, task_id, finished):
+        while not finished.wait(self.heartbeat_interval):
+            try:
+                if not self.queue.heartbeat(task_id, self.worker_id, self.visibility_timeout):
+                    logger.warning(f"Lost the lease on render task {task_id}")
+                    return
+            except Exception as e:
+                # Keep trying; the lease only lapses after the visibility timeout
+                logger.error(f"Heartbeat for render task {task_id} failed: {e}")
+
+def run_workers(concurrency=1, priorities=None):
+    """
+    Run render workers in this process until stopped or recycled.
+
+    Returns:
+        int: RECYCLE_EXIT_CODE if the process crossed a MemoryGuard limit, 1 if a
+            worker stopped unexpectedly, else 0
+    """
+    stop_event = threading.Event()
+    guard = MemoryGuard()
+
+    def stop(signum, frame):
+        # Finish the renders in progress, then exit
+        logger.info("Stopping render workers after their current renders")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    crashed = threading.Event()
+
+    def run(worker):
+        try:
+            worker.run()
+        except BaseException as e:
+            # Stop the others too, so the supervisor replaces the whole process
+            logger.error(f"Render worker {worker.worker_id} stopped unexpectedly: {e}")
+            logger.error(traceback.format_exc())
+            crashed.set()
+            stop_event.set()
+
+    threads = []
+    for index in range(concurrency):
+        worker = RenderWorker(priorities=priorities, stop_event=stop_event, guard=guard)
+        thread = threading.Thread(target=run, args=(worker,), name=f"render-worker-{index}")
+        thread.start()
+        threads.append(thread)
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1)
+    if crashed.is_set():
+        return 1
+    return RECYCLE_EXIT_CODE if guard.reason else 0
+
+def _worker_process(concurrency, priorities):
+    sys.exit(run_workers(concurrency, priorities))
+
+def supervise(concurrency=1, priorities=None):
+    """
+    Run the workers in a child process, replacing it each time it exits.
+
+    A recycled process is replaced at once. One that crashed or exited for
+    any other reason is replaced after a delay that doubles (up to a
+    minute) while it keeps dying soon after starting.
+
+    Returns:
+        int: Exit code of the last worker process
+    """
+    ctx = multiprocessing.get_context("spawn")
+    stopping = threading.Event()
+    current = {}
+
+    def stop(signum, frame):
+        stopping.set()
+        process = current.get("process")
+        if process is not None and process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    failures = 0
+    while True:
+        process = ctx.Process(target=_worker_process, args=(concurrency, priorities), name="render-workers")
+        current["process"] = process
+        started = time.monotonic()
+        process.start()
+        process.join()
+        if stopping.is_set():
+            return process.exitcode or 0
+        if process.exitcode == RECYCLE_EXIT_CODE:
+            logger.info(f"Render worker process {process.pid} was recycled, starting a new one")
+            failures = 0
+            continue
+        failures = failures + 1 if time.monotonic() - started < RESTART_BACKOFF_MAX else 1
+        delay = min(2 ** (failures - 1), RESTART_BACKOFF_MAX)
+        logger.error(f"Render worker process {process.pid} exited with code {process.exitcode}, "
+                     f"starting a new one in {delay}s")
+        stopping.wait(delay)
+        if stopping.is_set():
+            return process.exitcode or 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Run render workers for the shared render queue")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("RENDER_WORKER_CONCURRENCY", "1")),
+                        help="Renders to run at once in this process")
+    parser.add_argument("--priorities", default=None,
+                        help="Comma-separated priority classes to run, e.g. interactive (default: all)")
+    parser.add_argument("--no-supervise", action="store_true",
+                        help="Run the workers in this process and exit when it is recycled "
+                             "(for process managers that restart it themselves)")
+    args = parser.parse_args()
+
+    priorities = args.priorities.split(",") if args.priorities else None
+    if args.no_supervise:
+        sys.exit(run_workers(args.concurrency, priorities))
+    sys.exit(supervise(args.concurrency, priorities))
+
+if __name__ == "__main__":
+    main()
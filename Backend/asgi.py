@@ -0,0 +1,116 @@
+"""
+ASGI entry point.
+
+`POST /api/generate` is served natively on the event loop, so a job waiting
+on the LLM holds a coroutine instead of a worker thread. Every other
+endpoint goes through the Flask app via asgiref's WSGI adapter.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+from app.controllers.animation_controller import acreate_animation, start_animation
+from app.routes.main_routes import parse_generate_request
+from app.routes.admin_routes import is_admin_caller
+from app.services.profiling import profiling_requested, PROFILE_HEADER
+from app.services.admission import AdmissionRejected, get_admission_controller
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+flask_app = create_app()
+wsgi_app = WsgiToAsgi(flask_app)
+
+def _client_id(scope):
+    """Identify the client for rate limiting, like main_routes.get_client_id."""
+    if os.environ.get("TRUST_PROXY_HEADERS", "false").lower() in ["true", "1", "yes"]:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else None
+
+def _header(scope, name):
+    """Get a request header from the ASGI scope, or None."""
+    name = name.lower().encode("latin-1")
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _wants_profiling(scope):
+    """Like main_routes.wants_profiling, for the ASGI scope."""
+    if not profiling_requested(_header(scope, PROFILE_HEADER)):
+        return False
+    if not is_admin_caller(_header(scope, "X-Admin-Token"), _client_id(scope)):
+        raise PermissionError("Profiling requires the X-Admin-Token header")
+    return True
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+async def _send_json(send, status, payload, headers=None):
+    body = json.dumps(payload).encode("utf-8")
+    response_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        # Match flask-cors, which handles the other endpoints and the preflight
+        (b"access-control-allow-origin", b"*"),
+    ] + (headers or [])
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+async def generate(scope, receive, send):
+    """Async version of main_routes.generate_animation."""
+    try:
+        params = parse_generate_request(json.loads(await _read_body(receive) or b"{}"))
+        params["profiling"] = _wants_profiling(scope)
+    except ValueError as e:
+        # json.JSONDecodeError is a ValueError too
+        return await _send_json(send, 400, {"error": str(e)})
+    except PermissionError as e:
+        return await _send_json(send, 401, {"error": str(e)})
+
+    try:
+        get_admission_controller().check_rate(_client_id(scope))
+        if params.pop("stream"):
+            params.pop("hls")
+            result = await asyncio.to_thread(start_animation, **params)
+            return await _send_json(send, 202 if result.get("live_url") else 200, result)
+        result = await acreate_animation(**params)
+        return await _send_json(send, 200, result)
+    except AdmissionRejected as e:
+        payload = {"error": str(e), "reason": e.reason, "retry_after": e.retry_after}
+        return await _send_json(send, 429, payload, [(b"retry-after", str(e.retry_after).encode())])
+    except Exception as e:
+        return await _send_json(send, 500, {"error": str(e)})
+
+async def app(scope, receive, send):
+    """Route generate requests to the async handler and everything else to Flask."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Blocking stages (job store, thumbnails, voiceover) run in this pool
+                workers = int(os.environ.get("ASGI_BLOCKING_THREADS", "64"))
+                asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].rstrip("/") == "/api/generate":
+        return await generate(scope, receive, send)
+    return await wsgi_app(scope, receive, send)
@@ -0,0 +1,90 @@
+"""
+Benchmark for the prompt similarity index.
+
+Fills a PromptIndex with synthetic prompts, then times queries for
+rephrasings of indexed prompts and for unrelated prompts. Fails (exit
+code 1) if the median query is over the budget:
+
+    python scripts/bench_prompt_index.py --prompts 1000000 --budget-ms 1
+
+Prompts are built from a fixed vocabulary with a seeded generator, so runs
+are comparable. Filling the index with 1M prompts takes a few minutes.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.prompt_index import PromptIndex  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "po", "ru", "sa", "ti", "vo", "ze", "tra", "gen", "phot", "quan", "lyt"]
+FILLERS = ["explain", "show me", "how does", "animate", "visualize", "please explain", "what is"]
+
+def make_vocabulary(rng, size):
+    """Make distinct pseudo-words to build prompts from."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def make_prompt(rng, vocabulary):
+    return " ".join(rng.sample(vocabulary, rng.randint(3, 6)))
+
+def rephrase(rng, prompt):
+    """Wrap an indexed prompt in request filler, as users rephrase them."""
+    return f"{rng.choice(FILLERS)} {prompt}?"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt similarity index queries")
+    parser.add_argument("--prompts", type=int, default=1_000_000, help="Prompts in the index")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries to time")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct topic words")
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="Largest acceptable median query time")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    index = PromptIndex()
+    prompts = []
+
+    started = time.perf_counter()
+    for i in range(args.prompts):
+        prompt = make_prompt(rng, vocabulary)
+        if len(prompts) < args.queries:
+            prompts.append(prompt)
+        index.add(prompt, f"job-{i}")
+        if (i + 1) % 100_000 == 0:
+            print(f"Indexed {i + 1} prompts ({time.perf_counter() - started:.0f}s)")
+    print(f"Indexed {len(index)} prompts in {time.perf_counter() - started:.1f}s")
+
+    queries = [rephrase(rng, prompt) for prompt in prompts[:args.queries // 2]]
+    queries += [make_prompt(rng, vocabulary) for _ in range(args.queries - len(queries))]
+    rng.shuffle(queries)
+
+    timings = []
+    found = 0
+    for query in queries:
+        query_started = time.perf_counter()
+        matches = index.query(query)
+        timings.append((time.perf_counter() - query_started) * 1000)
+        found += bool(matches)
+
+    timings.sort()
+    median = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{len(queries)} queries: median {median:.3f} ms, p99 {p99:.3f} ms, max {timings[-1]:.3f} ms, "
+          f"{found} with a match")
+    if median > args.budget_ms:
+        print(f"FAIL: median query time is over the {args.budget_ms} ms budget")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark encoder profiles on a rendered video.
+
+Encodes the input once per profile and reports encode time and output size,
+so profile settings can be compared on real scenes:
+
+    python scripts/benchmark_encoders.py media/videos/scene_<job_id>/1080p60/EducationalScene.mp4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.encoder_profiles import PROFILES, get_profile, encode_with_profile
+
+def benchmark(src, profiles, repeat=1):
+    """
+    Encode src with each profile.
+
+    Args:
+        src (str): Input video
+        profiles (list): Profile names
+        repeat (int): Encodes per profile; the fastest is reported
+
+    Returns:
+        list: One dict per profile with seconds, bytes and ratio to the input size
+    """
+    src_bytes = os.path.getsize(src)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in profiles:
+            profile = get_profile(name)
+            dst = os.path.join(work_dir, f"{name}.mp4")
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                if not encode_with_profile(src, dst, profile):
+                    best = None
+                    break
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            if best is None:
+                results.append({"profile": name, "error": "encode failed"})
+                continue
+            size = os.path.getsize(dst)
+            results.append({
+                "profile": name,
+                "seconds": best,
+                "bytes": size,
+                "ratio": size / src_bytes if src_bytes else 0.0,
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare encode time and output size of encoder profiles")
+    parser.add_argument("video", help="Rendered video to re-encode")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--repeat", type=int, default=1, help="Encodes per profile; the fastest is reported")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.video):
+        print(f"Error: {args.video} does not exist")
+        sys.exit(1)
+
+    print(f"Input: {args.video} ({os.path.getsize(args.video)} bytes)")
+    print(f"{'profile':<14}{'seconds':>10}{'bytes':>14}{'vs input':>10}")
+    for result in benchmark(args.video, args.profiles, args.repeat):
+        if "error" in result:
+            print(f"{result['profile']:<14}{result['error']:>34}")
+            continue
+        print(f"{result['profile']:<14}{result['seconds']:>10.2f}{result['bytes']:>14}{result['ratio']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
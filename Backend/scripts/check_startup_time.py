@@ -0,0 +1,84 @@
+"""
+Startup time budget for the API process.
+
+Imports the app and calls create_app in a fresh interpreter with
+`-X importtime`, then fails (exit code 1) if
+
+- any of the heavy modules that should load lazily was imported, or
+- the total import time is over the budget.
+
+    python scripts/check_startup_time.py --budget-ms 1500
+
+The best of several runs is used, so a noisy machine doesn't fail the check.
+Run it in CI next to the tests to catch startup regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that must not be imported by create_app
+LAZY_MODULES = [
+    "langchain", "langchain_core", "langchain_groq", "langgraph", "groq",
+    "manim", "matplotlib", "numpy", "gtts", "pydub",
+]
+
+STARTUP_CODE = "from app import create_app; create_app()"
+
+def measure():
+    """
+    Run one startup under -X importtime.
+
+    Returns:
+        tuple: (total import microseconds, {module: cumulative microseconds})
+    """
+    env = {**os.environ, "PRELOAD_HEAVY_MODULES": "false"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"App failed to start:\n{result.stderr[-2000:]}")
+
+    total = 0
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        # Nesting is shown by indentation; only top-level imports add to the total
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the API process startup time budget")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    total, modules = min((measure() for _ in range(args.runs)), key=lambda run: run[0])
+
+    print("Slowest imports (cumulative ms):")
+    for name, micros in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {micros / 1000:8.1f}  {name}")
+    print(f"Total import time: {total / 1000:.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failures = []
+    eager = sorted({name.split(".")[0] for name in modules} & set(LAZY_MODULES))
+    if eager:
+        failures.append(f"heavy modules imported at startup: {', '.join(eager)}")
+    if total / 1000 > args.budget_ms:
+        failures.append(f"import time {total / 1000:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
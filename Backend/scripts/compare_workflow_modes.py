@@ -0,0 +1,45 @@
+"""
+Compare the workflow's graph and fast modes on the same prompts.
+
+Runs each prompt through both modes and reports LLM calls, tokens and
+latency per mode, plus how often the fast mode fell back to the graph:
+
+    python scripts/compare_workflow_modes.py "Explain the Pythagorean theorem" "How do vaccines work?"
+
+Point GROQ_BASE_URL at scripts/mock_llm_server.py to try it without an API key.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.langgraph.workflow import AnimationWorkflow
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare workflow modes")
+    parser.add_argument("prompts", nargs="+")
+    parser.add_argument("--modes", default="graph,fast")
+    args = parser.parse_args()
+
+    totals = {}
+    for mode in args.modes.split(","):
+        workflow = AnimationWorkflow(mode=mode)
+        totals[mode] = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0, "fallbacks": 0}
+        for prompt in args.prompts:
+            stats = workflow.run(prompt)["workflow"]
+            if stats["mode"] != mode:
+                totals[mode]["fallbacks"] += 1
+            for key in ("calls", "input_tokens", "output_tokens", "seconds"):
+                totals[mode][key] += stats[key]
+
+    count = len(args.prompts)
+    print(f"{'mode':<8} {'calls':>6} {'input tok':>10} {'output tok':>11} {'seconds':>8} {'fallbacks':>10}  (per prompt)")
+    for mode, total in totals.items():
+        print(
+            f"{mode:<8} {total['calls'] / count:>6.1f} {total['input_tokens'] / count:>10.0f} "
+            f"{total['output_tokens'] / count:>11.0f} {total['seconds'] / count:>8.1f} {total['fallbacks']:>10}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Load test for /api/generate.
+
+Sends requests with a fixed number in flight and reports status codes,
+latency percentiles and throughput. Run it against both serving modes with
+the same settings to compare them:
+
+    gunicorn -w 4 -b 0.0.0.0:5000 app:app        # sync workers
+    uvicorn asgi:app --host 0.0.0.0 --port 5000  # async mode
+
+    python scripts/load_test.py --url http://localhost:5000 --requests 2000 --concurrency 500
+
+Prompts are unique per request (and sent with "force") so nothing is
+answered from the job store. Point GROQ_BASE_URL at a mock LLM server to
+measure the serving layer rather than the LLM provider.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+async def post_json(host, port, path, payload, timeout):
+    """POST a JSON body over a fresh connection and return the status code."""
+    body = json.dumps(payload).encode("utf-8")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run(url, total, concurrency, timeout, extra):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    statuses = Counter()
+    latencies = []
+    in_flight = peak = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        nonlocal in_flight, peak
+        async with semaphore:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            payload = {"prompt": f"load test {index} {uuid.uuid4().hex[:8]}", "force": True, **extra}
+            started = time.perf_counter()
+            try:
+                status = await post_json(host, port, "/api/generate", payload, timeout)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            in_flight -= 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    print(f"Requests:    {total} ({concurrency} concurrent, peak {peak})")
+    print(f"Statuses:    {dict(statuses)}")
+    print(f"Elapsed:     {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    print(f"Latency p50: {percentile(latencies, 0.50):.2f}s")
+    print(f"Latency p95: {percentile(latencies, 0.95):.2f}s")
+    print(f"Latency p99: {percentile(latencies, 0.99):.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/generate")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--priority", default=None, help="Priority class to send")
+    args = parser.parse_args()
+
+    extra = {"priority": args.priority} if args.priority else {}
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.timeout, extra))
+
+if __name__ == "__main__":
+    main()
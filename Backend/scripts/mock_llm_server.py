@@ -0,0 +1,140 @@
+"""
+Mock Groq server for exercising the LLM gateway and load tests.
+
+Implements the OpenAI-compatible chat completions endpoint the Groq client
+uses, with configurable latency, per-minute request and token limits
+(answered with 429 and Retry-After like the real API) and random failures:
+
+    python scripts/mock_llm_server.py --port 8089 --rpm 30 --tpm 6000 --latency 2
+    GROQ_BASE_URL=http://localhost:8089 GROQ_API_KEY=test python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCENE = '''from manim import *
+
+class EducationalScene(Scene):
+    def construct(self):
+        title = Text("Mock lesson").scale(0.8)
+        title.to_edge(UP)
+        self.play(Write(title))
+        circle = Circle(color=BLUE)
+        self.play(Create(circle))
+        self.wait(1)
+'''
+
+class Limits:
+    """Sliding one-minute windows of requests and tokens."""
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = deque()
+        self.tokens = deque()
+        self.lock = threading.Lock()
+
+    def check(self, tokens):
+        """Record a request, returning seconds until retry if it is over a limit, else 0."""
+        now = time.monotonic()
+        with self.lock:
+            for window in (self.requests, self.tokens):
+                while window and now - window[0][0] > 60:
+                    window.popleft()
+            if self.rpm and len(self.requests) >= self.rpm:
+                return 60 - (now - self.requests[0][0])
+            if self.tpm and sum(n for _, n in self.tokens) + tokens > self.tpm:
+                return 60 - (now - self.tokens[0][0]) if self.tokens else 60
+            self.requests.append((now, 1))
+            self.tokens.append((now, tokens))
+            return 0
+
+def make_handler(options, limits, stats):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+            if request.get("response_format", {}).get("type") == "json_object":
+                # The workflow's fast mode asks for everything in one JSON object
+                completion = json.dumps({
+                    "plan": "Title: Mock lesson. Key concept: circles.",
+                    "scene_plan": "Scene 1 (5s): title and a circle.",
+                    "manim_code": SCENE,
+                    "script": "Today we look at a circle.",
+                })
+            else:
+                completion = SCENE if "Manim" in prompt else f"Mock answer for: {prompt[:200]}"
+            input_tokens, output_tokens = len(prompt) // 4, len(completion) // 4
+
+            retry_after = limits.check(input_tokens + output_tokens)
+            if retry_after:
+                stats["limited"] += 1
+                return self._send(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                    {"retry-after": f"{retry_after:.2f}"},
+                )
+            if random.random() < options.error_rate:
+                stats["errors"] += 1
+                return self._send(503, {"error": {"message": "Service unavailable"}})
+
+            time.sleep(max(0.0, random.gauss(options.latency, options.latency / 4)))
+            stats["ok"] += 1
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": completion},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": input_tokens,
+                    "completion_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                },
+            })
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq chat completions server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rpm", type=int, default=30, help="Requests per minute before 429 (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=6000, help="Tokens per minute before 429 (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    options = parser.parse_args()
+
+    stats = {"ok": 0, "limited": 0, "errors": 0}
+    server = ThreadingHTTPServer(("0.0.0.0", options.port), make_handler(options, Limits(options.rpm, options.tpm), stats))
+    print(f"Mock LLM server on http://localhost:{options.port} (rpm={options.rpm}, tpm={options.tpm})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Served: {stats}")
+
+if __name__ == "__main__":
+    main()
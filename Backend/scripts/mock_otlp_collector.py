@@ -0,0 +1,90 @@
+"""
+Stand-in for an OpenTelemetry collector, for looking at job traces locally.
+
+Accepts OTLP/HTTP JSON on /v1/traces, as the API posts finished job traces
+when TRACE_EXPORT_URL is set, appends each request to a JSON Lines file and
+prints a one-line summary per trace:
+
+    python scripts/mock_otlp_collector.py --port 4318 --output traces.jsonl
+    TRACE_EXPORT_URL=http://localhost:4318/v1/traces python app.py
+
+The file can be replayed into a real collector, or each line opened in any
+viewer that reads OTLP JSON.
+"""
+import argparse
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def describe(request):
+    """One line per trace: job, span count, duration, spans per category and errors."""
+    lines = []
+    for resource in request.get("resourceSpans", []):
+        attributes = {item["key"]: next(iter(item["value"].values()))
+                      for item in resource.get("resource", {}).get("attributes", [])}
+        spans = [span for scope in resource.get("scopeSpans", []) for span in scope.get("spans", [])]
+        if not spans:
+            continue
+        start = min(int(span["startTimeUnixNano"]) for span in spans)
+        end = max(int(span["endTimeUnixNano"]) for span in spans)
+        categories = Counter()
+        for span in spans:
+            for item in span.get("attributes", []):
+                if item["key"] == "category":
+                    categories[item["value"].get("stringValue")] += 1
+        errors = sum(1 for span in spans if span.get("status", {}).get("code") == 2)
+        lines.append(
+            f"job {attributes.get('job.id', '?')}: {len(spans)} spans over {(end - start) / 1e9:.2f}s "
+            f"{dict(categories)} errors={errors}"
+        )
+    return lines
+
+def make_handler(options, lock, stats):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                return self._send(404, {"error": "not found"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                stats["rejected"] += 1
+                return self._send(400, {"error": "body is not JSON"})
+            with lock:
+                with open(options.output, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(request) + "\n")
+                stats["traces"] += 1
+                for line in describe(request):
+                    print(line, flush=True)
+            # An ExportTraceServiceResponse with nothing rejected
+            self._send(200, {})
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OTLP/HTTP trace collector")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl", help="JSON Lines file the traces are appended to")
+    options = parser.parse_args()
+
+    stats = {"traces": 0, "rejected": 0}
+    server = ThreadingHTTPServer(("0.0.0.0", options.port), make_handler(options, threading.Lock(), stats))
+    print(f"Mock OTLP collector on http://localhost:{options.port}/v1/traces, writing {options.output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Received: {stats}")
+
+if __name__ == "__main__":
+    main()
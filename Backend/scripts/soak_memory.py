@@ -0,0 +1,155 @@
+"""
+Memory soak test for the generation pipeline.
+
+Runs many jobs through create_animation in this process, as the API
+would, and samples the process RSS after a garbage collection every few
+jobs. After a warm-up (imports, caches, connection pools) memory has to
+level off: the test fails (exit code 1) if RSS grows by more than
+--max-growth-mb between the end of the warm-up and the end of the run.
+
+    python scripts/soak_memory.py --jobs 1000 --concurrency 4
+
+The prompt index keeps about a kilobyte per completed job by design, which
+the default budget allows for. With --tracemalloc the allocations that grew
+most after the warm-up are printed, to point at a leak when there is one.
+
+By default the LLM workflow and the voiceover are off, so the run needs no
+network and measures the job, render and storage code; pass --ai (with
+GROQ_BASE_URL pointing at scripts/mock_llm_server.py) to include the
+workflow. Renders use the fast-preview profile to keep a long run short.
+"""
+import argparse
+import gc
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+def configure(args, work_dir):
+    """Point the pipeline at a throwaway job store and turn off what needs the network."""
+    os.environ["JOB_DATABASE"] = os.path.join(work_dir, "jobs.sqlite")
+    os.environ["RENDER_BACKEND"] = "local"
+    os.environ.setdefault("USE_AI_WORKFLOW", "true" if args.ai else "false")
+    os.environ.setdefault("VOICEOVER_ENABLED", "false")
+    os.environ.setdefault("STREAMING_RENDER_ENABLED", "false")
+    sys.path.insert(0, BACKEND_DIR)
+
+def remove_job_files(job_id):
+    """Delete the files a soak job left behind."""
+    from app.services.video_service import get_project_paths, get_scene_file_path
+    from app.services.render_checkpoint import get_checkpoint_dir
+    from app.services.thumbnail_service import get_thumbnail_dir
+
+    paths = get_project_paths(job_id)
+    shutil.rmtree(os.path.dirname(paths["final_output_path"]), ignore_errors=True)
+    shutil.rmtree(get_checkpoint_dir(job_id), ignore_errors=True)
+    shutil.rmtree(get_thumbnail_dir(job_id), ignore_errors=True)
+    shutil.rmtree(os.path.join(paths["media_dir"], "videos", f"scene_{job_id}"), ignore_errors=True)
+    scene_file = get_scene_file_path(job_id)
+    if os.path.exists(scene_file):
+        os.remove(scene_file)
+
+def run(args):
+    from app.controllers.animation_controller import create_animation
+    from app.services.memory_accounting import get_rss_bytes, get_allocation_tracer
+
+    tracer = get_allocation_tracer()
+    samples = []
+    failures = 0
+    started = time.perf_counter()
+
+    def one(index):
+        result = create_animation(
+            f"Soak test {index}: the area of a circle",
+            settings={"encoder_profile": args.profile},
+            reuse=False,
+        )
+        return result["job_id"]
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(one, index) for index in range(args.jobs)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                job_id = future.result()
+                if not args.keep:
+                    remove_job_files(job_id)
+            except Exception as e:
+                failures += 1
+                print(f"job failed: {e}", file=sys.stderr)
+
+            if done == args.warmup and args.tracemalloc:
+                tracer.start()
+                gc.collect()
+                tracer.snapshot()
+            if done % args.sample_every == 0 or done == args.jobs:
+                gc.collect()
+                rss = get_rss_bytes()
+                samples.append((done, rss))
+                print(f"{done:6d} jobs  rss {rss / MB:8.1f} MB  {time.perf_counter() - started:7.1f}s")
+
+    return samples, failures
+
+def report(samples, args):
+    """
+    Compare RSS after the warm-up with RSS at the end.
+
+    Returns:
+        bool: True if growth is within budget
+    """
+    settled = [rss for done, rss in samples if done >= args.warmup]
+    if len(settled) < 2:
+        print("Not enough samples after the warm-up; run more jobs or sample more often")
+        return False
+
+    baseline = settled[0]
+    final = statistics.median(settled[-3:])
+    growth = (final - baseline) / MB
+    # Least-squares slope over the settled samples, in MB per 1,000 jobs
+    points = [(done, rss / MB) for done, rss in samples if done >= args.warmup]
+    mean_x = statistics.mean(x for x, _ in points)
+    mean_y = statistics.mean(y for _, y in points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread * 1000 if spread else 0.0
+
+    print(f"\nRSS after warm-up: {baseline / MB:.1f} MB, at the end: {final / MB:.1f} MB")
+    print(f"Growth: {growth:+.1f} MB (budget {args.max_growth_mb} MB), trend {slope:+.2f} MB per 1,000 jobs")
+    return growth <= args.max_growth_mb
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that memory stays flat over many jobs")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs in flight at once")
+    parser.add_argument("--warmup", type=int, default=100, help="Jobs before the baseline sample")
+    parser.add_argument("--sample-every", type=int, default=50, help="Jobs between RSS samples")
+    parser.add_argument("--max-growth-mb", type=float, default=32.0,
+                        help="Allowed RSS growth from the end of the warm-up to the end of the run")
+    parser.add_argument("--profile", default="fast-preview", help="Encoder profile of the renders")
+    parser.add_argument("--ai", action="store_true", help="Run the LLM workflow instead of the fallback scene")
+    parser.add_argument("--tracemalloc", action="store_true", help="Report the allocations that grew after the warm-up")
+    parser.add_argument("--keep", action="store_true", help="Keep the videos and media of the soak jobs")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="soak_")
+    configure(args, work_dir)
+    try:
+        samples, failures = run(args)
+        ok = report(samples, args)
+        if args.tracemalloc:
+            from app.services.memory_accounting import get_allocation_tracer
+            print("\nLargest growth since the warm-up:")
+            for entry in get_allocation_tracer().snapshot(limit=10)["growth"] or []:
+                print(f"  {entry['bytes_diff'] / 1024:+10.1f} KiB  {entry['count_diff']:+8d}  {entry['where']}")
+        if failures:
+            print(f"{failures} jobs failed")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(0 if ok and not failures else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app package the way app.py does, from the Backend directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(autouse=True)
+def job_store(tmp_path, monkeypatch):
+    """Give each test its own job database instead of instance/cartoonimations.sqlite."""
+    from app.services import job_store as job_store_module
+
+    path = str(tmp_path / "jobs.sqlite")
+    monkeypatch.setenv("JOB_DATABASE", path)
+    store = job_store_module.JobStore(path)
+    monkeypatch.setattr(job_store_module, "_store", store)
+    return store
+
+
+@pytest.fixture
+def client(job_store, monkeypatch):
+    """Flask test client backed by the test's job database."""
+    from app import create_app
+
+    monkeypatch.setenv("USE_AI_WORKFLOW", "false")
+    monkeypatch.setenv("VOICEOVER_ENABLED", "false")
+    app = create_app({"TESTING": True, "DATABASE": job_store.db_path})
+    return app.test_client()
@@ -0,0 +1,61 @@
+import pytest
+
+from app.services import storage_service
+
+LOCAL = {"REMOTE_ADDR": "127.0.0.1"}
+
+
+@pytest.fixture
+def compacted(monkeypatch):
+    """Record the categories compaction is asked for instead of touching the disk."""
+    calls = []
+
+    def compact(self, categories=None):
+        calls.append(categories)
+        return {name: {"files": 0, "bytes": 0} for name in categories}
+
+    monkeypatch.setattr(storage_service.StorageManager, "compact", compact)
+    return calls
+
+
+def test_admin_requires_a_local_caller_without_a_token(client, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+
+    assert client.get("/api/admin/profiling", environ_base=LOCAL).status_code == 200
+    assert client.get("/api/admin/profiling", environ_base={"REMOTE_ADDR": "203.0.113.5"}).status_code == 401
+
+
+def test_admin_token_is_checked(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+    assert client.get("/api/admin/profiling", environ_base=LOCAL).status_code == 401
+    assert client.get("/api/admin/profiling", headers={"X-Admin-Token": "secret"},
+                      environ_base={"REMOTE_ADDR": "203.0.113.5"}).status_code == 200
+
+
+def test_compact_all_categories_by_default(client, compacted):
+    response = client.post("/api/admin/storage/compact", environ_base=LOCAL)
+
+    assert response.status_code == 200
+    assert compacted == [[category["name"] for category in storage_service.CATEGORIES]]
+
+
+def test_compact_selected_categories(client, compacted):
+    response = client.post("/api/admin/storage/compact", json={"categories": ["hls", "videos"]}, environ_base=LOCAL)
+
+    assert response.status_code == 200
+    assert compacted == [["hls", "videos"]]
+
+
+@pytest.mark.parametrize("body", [
+    {"categories": "videos"},
+    {"categories": ["videos", "everything"]},
+    {"categories": []},
+    {"categories": [1]},
+    ["videos"],
+])
+def test_compact_rejects_invalid_categories(client, compacted, body):
+    response = client.post("/api/admin/storage/compact", json=body, environ_base=LOCAL)
+
+    assert response.status_code == 400
+    assert compacted == []
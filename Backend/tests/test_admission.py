@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.routes import main_routes
+from app.services import admission, rate_limit
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.rate_limit import KeyedRateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock for the token buckets that only moves when told to."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock[0] += 0.5
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock[0] += 60
+    assert bucket.is_full()
+    for _ in range(3):
+        assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+
+
+def test_reserve_goes_into_debt_and_reports_the_wait(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1)
+    assert bucket.reserve() == pytest.approx(2)
+    clock[0] += 3
+    assert bucket.reserve() == 0
+
+
+def test_clients_have_separate_buckets(clock):
+    limiter = KeyedRateLimiter(rate=1, capacity=1)
+
+    assert limiter.try_acquire("a") == 0
+    assert limiter.try_acquire("a") == pytest.approx(1)
+    assert limiter.try_acquire("b") == 0
+
+
+def test_rate_limited_request_gets_429_with_retry_after(client, clock, monkeypatch):
+    # 6 requests a minute refill one token every 10 seconds
+    monkeypatch.setattr(admission, "_controller", AdmissionController(
+        client_rate_per_minute=6, client_burst=1, render_limit=1))
+    monkeypatch.setattr(main_routes, "create_animation", lambda **params: {"status": "completed"})
+
+    assert client.post("/api/generate", json={"prompt": "explain entropy"}).status_code == 200
+    clock[0] += 4
+    response = client.post("/api/generate", json={"prompt": "explain entropy"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "6"
+    assert response.get_json()["reason"] == "rate limit"
+
+    clock[0] += 6
+    assert client.post("/api/generate", json={"prompt": "explain entropy"}).status_code == 200
+
+
+def test_zero_rate_turns_the_client_limit_off():
+    controller = AdmissionController(client_rate_per_minute=0, render_limit=1)
+
+    for _ in range(100):
+        controller.check_rate("client")
+
+
+def test_full_queue_is_rejected_with_an_estimate():
+    controller = AdmissionController(max_active=1, queue_depth=0, render_limit=1)
+
+    with controller.admit():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit():
+                pass
+    assert rejected.value.reason == "queue full"
+    assert rejected.value.retry_after == 30
+
+    with controller.admit():
+        pass
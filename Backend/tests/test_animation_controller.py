@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from app.controllers import animation_controller
+
+SCENE = """from manim import *
+
+class EducationalScene(Scene):
+    def construct(self):
+        self.play(Write(Text("Entropy")))
+"""
+
+
+@pytest.fixture
+def workflow_calls(job_store, monkeypatch):
+    """Stub the LLM and render stages, recording which workflow path ran and on which thread."""
+    calls = []
+
+    def generate(prompt, job_id=None):
+        calls.append(("sync", job_id, threading.current_thread() is threading.main_thread()))
+        return SCENE, "script", None
+
+    async def agenerate(prompt):
+        calls.append(("async", None, threading.current_thread() is threading.main_thread()))
+        return SCENE, "script", None
+
+    def submit_render(*args):
+        future = Future()
+        future.set_result("/videos/entropy.mp4")
+        return future
+
+    monkeypatch.setattr(animation_controller, "_generate_content", generate)
+    monkeypatch.setattr(animation_controller, "_agenerate_content", agenerate)
+    monkeypatch.setattr(animation_controller, "_submit_render", submit_render)
+    monkeypatch.setattr(animation_controller, "_check_render", lambda video_path: None)
+    monkeypatch.setattr(animation_controller, "_finish_job", lambda job_id, *args, **kwargs: {"job_id": job_id})
+    return calls
+
+
+def test_async_jobs_await_the_workflow_on_the_event_loop(workflow_calls):
+    asyncio.run(animation_controller._agenerate_new_animation("explain entropy"))
+
+    assert workflow_calls == [("async", None, True)]
+
+
+def test_profiled_async_jobs_run_the_profiled_workflow_in_a_thread(workflow_calls, monkeypatch):
+    monkeypatch.setattr(animation_controller, "get_job_profiler", lambda job_id: object())
+
+    result = asyncio.run(animation_controller._agenerate_new_animation("explain entropy"))
+
+    assert workflow_calls == [("sync", result["job_id"], False)]
@@ -0,0 +1,127 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import job_store as job_store_module
+from app.services.job_store import JobStore, STATUS_COMPLETED, STATUS_QUEUED
+
+
+def create_jobs(store, monkeypatch, times, prefix="job"):
+    """Create a job at each of the given creation times. Returns their ids."""
+    ids = []
+    for index, created_at in enumerate(times):
+        monkeypatch.setattr(job_store_module, "time", SimpleNamespace(time=lambda: created_at))
+        ids.append(store.create_job(f"prompt {index}", job_id=f"{prefix}-{index:02d}")["id"])
+    return ids
+
+
+def all_pages(store, limit, **kwargs):
+    """Walk every page of list_jobs. Returns the ids and the number of pages."""
+    ids, cursor, pages = [], None, 0
+    while True:
+        jobs, cursor = store.list_jobs(limit=limit, cursor=cursor, **kwargs)
+        ids.extend(job["id"] for job in jobs)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+def test_pages_are_newest_first_without_gaps_or_repeats(job_store, monkeypatch):
+    ids = create_jobs(job_store, monkeypatch, [100.0 + i for i in range(7)])
+
+    listed, pages = all_pages(job_store, limit=3)
+
+    assert listed == ids[::-1]
+    assert pages == 3
+
+
+def test_jobs_created_in_the_same_instant_are_paged_by_id(job_store, monkeypatch):
+    ids = create_jobs(job_store, monkeypatch, [100.0] * 5)
+
+    listed, _ = all_pages(job_store, limit=2)
+
+    assert listed == sorted(ids, reverse=True)
+
+
+def test_new_jobs_do_not_shift_later_pages(job_store, monkeypatch):
+    ids = create_jobs(job_store, monkeypatch, [100.0, 101.0, 102.0, 103.0])
+    first, cursor = job_store.list_jobs(limit=2)
+    create_jobs(job_store, monkeypatch, [200.0], prefix="new")
+
+    second, cursor = job_store.list_jobs(limit=2, cursor=cursor)
+
+    assert [job["id"] for job in first + second] == ids[::-1]
+    assert cursor is None
+
+
+def test_pages_can_be_filtered_by_status(job_store, monkeypatch):
+    ids = create_jobs(job_store, monkeypatch, [100.0 + i for i in range(6)])
+    for job_id in ids[::2]:
+        job_store.update_job(job_id, status=STATUS_COMPLETED)
+
+    listed, _ = all_pages(job_store, limit=2, status=STATUS_COMPLETED)
+
+    assert listed == ids[::2][::-1]
+
+
+def test_invalid_cursor_is_rejected(job_store):
+    with pytest.raises(ValueError):
+        job_store.list_jobs(cursor="not-a-cursor")
+
+
+# Tables as the first release created them, before any MIGRATIONS column
+FIRST_RELEASE_SCHEMA = """
+CREATE TABLE jobs (
+    id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    settings TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    video_path TEXT,
+    audio_path TEXT,
+    script TEXT,
+    manim_code TEXT,
+    timings TEXT NOT NULL DEFAULT '{}',
+    error TEXT
+);
+CREATE TABLE artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+INSERT INTO jobs (id, prompt, prompt_hash, status, created_at, updated_at, video_path)
+VALUES ('old-job', 'explain gravity', 'hash', 'completed', 1.0, 1.0, '/videos/old.mp4');
+INSERT INTO artifacts (job_id, kind, path, created_at) VALUES ('old-job', 'video', '/videos/old.mp4', 1.0);
+"""
+
+
+def test_old_database_is_migrated_in_place(tmp_path):
+    path = tmp_path / "old.sqlite"
+    conn = sqlite3.connect(path)
+    conn.executescript(FIRST_RELEASE_SCHEMA)
+    conn.close()
+
+    store = JobStore(str(path))
+
+    columns = {row[1] for row in store._connect().execute("PRAGMA table_info(jobs)")}
+    assert {"hls_path", "poster_path", "batch_id", "parent_id", "degraded"} <= columns
+    job = store.get_job("old-job")
+    assert job["video_path"] == "/videos/old.mp4"
+    assert job["degraded"] is False
+    store.update_job("old-job", hls_path="/hls/old/master.m3u8", degraded=True)
+    assert store.get_job("old-job")["degraded"] is True
+    store.touch_artifacts("old-job")
+    assert store.list_artifacts("old-job")[0]["last_accessed"] is not None
+
+    # Opening a migrated database again changes nothing
+    JobStore(str(path))
+    assert store.list_jobs(status=STATUS_COMPLETED)[0][0]["id"] == "old-job"
+    assert store.list_jobs(status=STATUS_QUEUED)[0] == []
@@ -0,0 +1,17 @@
+def test_stream_is_rejected_with_the_queue_backend(client, monkeypatch):
+    monkeypatch.setenv("RENDER_BACKEND", "queue")
+
+    response = client.post("/api/generate", json={"prompt": "explain entropy", "stream": True})
+
+    assert response.status_code == 400
+    assert "RENDER_BACKEND=queue" in response.get_json()["error"]
+
+
+def test_live_streaming_default_is_ignored_with_the_queue_backend(monkeypatch):
+    from app.routes.main_routes import parse_generate_request
+
+    monkeypatch.setenv("LIVE_STREAMING_ENABLED", "true")
+    assert parse_generate_request({"prompt": "explain entropy"})["stream"] is True
+
+    monkeypatch.setenv("RENDER_BACKEND", "queue")
+    assert parse_generate_request({"prompt": "explain entropy"})["stream"] is False
@@ -0,0 +1,118 @@
+from app.services.job_store import STATUS_COMPLETED, JobStore
+from app.services.prompt_index import (
+    PromptIndex,
+    get_reuse_mode,
+    normalize_for_similarity,
+    same_word_order,
+)
+
+
+def test_normalize_drops_filler_words_and_suffixes():
+    assert normalize_for_similarity("Please explain the Pythagorean theorem!") == ["pythagor", "theorem"]
+    assert normalize_for_similarity("Show me how Pythagoras works") == ["pythagor"]
+    assert normalize_for_similarity("") == []
+    assert normalize_for_similarity(None) == []
+
+
+def test_same_word_order():
+    assert same_word_order("convert celsius to fahrenheit", "how to convert celsius into fahrenheit")
+    assert not same_word_order("convert celsius to fahrenheit", "convert fahrenheit to celsius")
+    # Words only one prompt uses don't count
+    assert same_word_order("sorting algorithms", "visualize bubble sorting algorithms")
+
+
+def test_query_finds_rephrased_prompt():
+    index = PromptIndex()
+    index.add("Explain the Pythagorean theorem", "job-pythagoras")
+    index.add("How does photosynthesis work in plants", "job-photosynthesis")
+
+    matches = index.query("Can you show me the pythagorean theorem?", threshold=0.7)
+
+    assert [job_id for job_id, _ in matches] == ["job-pythagoras"]
+    assert matches[0][1] >= 0.7
+
+
+def test_query_ignores_unrelated_prompts():
+    index = PromptIndex()
+    index.add("Explain the Pythagorean theorem", "job-pythagoras")
+
+    assert index.query("Animate a bubble sort on eight numbers", threshold=0.5) == []
+
+
+def test_prompts_without_topic_words_are_not_indexed():
+    index = PromptIndex()
+    index.add("Please show me", "job-empty")
+
+    assert len(index) == 0
+    assert index.query("Please show me", threshold=0.0) == []
+
+
+def test_matches_are_ordered_and_limited():
+    index = PromptIndex()
+    index.add("binary search tree insertion", "job-exact")
+    index.add("binary search tree insertion and deletion", "job-close")
+    for i in range(3):
+        index.add("binary search tree insertion", f"job-duplicate-{i}")
+
+    matches = index.query("binary search tree insertion", threshold=0.5, limit=2)
+
+    assert len(matches) == 2
+    assert matches[0][1] == 1.0
+    assert matches[0][1] >= matches[1][1]
+
+
+def test_index_grows_past_its_initial_capacity():
+    index = PromptIndex()
+    for i in range(1500):
+        index.add(f"topic number {i} in depth", f"job-{i}")
+
+    assert len(index) == 1500
+    assert "job-1499" in [job_id for job_id, _ in index.query("topic number 1499 in depth", threshold=0.9)]
+
+
+def test_reuse_mode_defaults_to_return(monkeypatch):
+    monkeypatch.delenv("PROMPT_REUSE_MODE", raising=False)
+    assert get_reuse_mode() == "return"
+    monkeypatch.setenv("PROMPT_REUSE_MODE", "Offer")
+    assert get_reuse_mode() == "offer"
+
+
+def test_degraded_jobs_are_not_offered_for_reuse(tmp_path):
+    store = JobStore(db_path=str(tmp_path / "jobs.sqlite"))
+    good = store.create_job("Explain the Pythagorean theorem")
+    degraded = store.create_job("Explain photosynthesis")
+    store.update_job(good["id"], status=STATUS_COMPLETED)
+    store.update_job(degraded["id"], status=STATUS_COMPLETED, degraded=True)
+
+    assert list(store.iter_completed_prompts()) == [(good["id"], "Explain the Pythagorean theorem")]
+    assert store.find_completed_by_prompt("Explain photosynthesis") is None
+
+
+def completed_job(store, prompt, video_dir):
+    video = video_dir / f"{len(list(video_dir.iterdir()))}.mp4"
+    video.write_bytes(b"video")
+    job = store.create_job(prompt)
+    store.update_job(job["id"], status=STATUS_COMPLETED, video_path=str(video))
+    return store.get_job(job["id"])
+
+
+def test_near_duplicate_prompts_return_the_earlier_video(tmp_path, monkeypatch, job_store):
+    from app.controllers import animation_controller
+
+    monkeypatch.delenv("PROMPT_REUSE_MODE", raising=False)
+    index = PromptIndex()
+    monkeypatch.setattr(animation_controller, "get_prompt_index", lambda: index)
+    job = completed_job(job_store, "convert celsius to fahrenheit", tmp_path)
+    index.add(job["prompt"], job["id"])
+
+    returned = animation_controller._find_reusable_result("please show how to convert celsius to fahrenheit")
+    offered = animation_controller._find_reusable_result("convert celsius into fahrenheit", reuse_mode="offer")
+
+    # The default answer carries the video, as existing clients expect
+    assert returned["video_path"] == job["video_path"]
+    assert returned["similar_to"] == job["prompt"]
+    assert offered["status"] == "similar_found"
+    assert offered["match"]["job_id"] == job["id"]
+    # Reordered words may ask the opposite, so they aren't answered from the match
+    assert animation_controller._find_reusable_result("convert fahrenheit to celsius") is None
+    assert animation_controller._find_reusable_result("convert celsius to fahrenheit x", reuse_mode="off") is None
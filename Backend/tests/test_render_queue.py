@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import render_queue
+from app.services.render_queue import (
+    RenderQueue, TASK_DONE, TASK_FAILED, TASK_LEASED, TASK_QUEUED
+)
+from app.services.render_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+
+def test_queue_database_on_a_network_filesystem_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_queue, "filesystem_type", lambda path: "nfs4")
+
+    with pytest.raises(RuntimeError, match="nfs4"):
+        RenderQueue(str(tmp_path / "queue.sqlite"))
+
+
+def test_filesystem_type_uses_the_longest_mount_point(tmp_path, monkeypatch):
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        "server:/export /mnt/shared\\040data nfs4 rw 0 0\n"
+        "server:/other /mnt/shared nfs rw 0 0\n"
+    )
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda path, *args, **kwargs: real_open(
+        mounts if path == "/proc/mounts" else path, *args, **kwargs))
+
+    assert render_queue.filesystem_type("/mnt/shared data/queue") == "nfs4"
+    assert render_queue.filesystem_type("/mnt/shared/queue") == "nfs"
+    assert render_queue.filesystem_type("/mnt/sharedish") == "ext4"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Queue clock that only moves when told to."""
+    now = [1000.0]
+    monkeypatch.setattr(render_queue, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return RenderQueue(str(tmp_path / "queue.sqlite"), max_attempts=2, aging_rate=0)
+
+
+def test_lease_takes_the_best_task_and_hides_it(queue):
+    queue.enqueue({"n": 1}, job_id="job-1", priority=PRIORITY_BATCH)
+    interactive = queue.enqueue({"n": 2}, job_id="job-2", priority=PRIORITY_INTERACTIVE, cost=100)
+
+    task = queue.lease("w1", visibility_timeout=30)
+
+    assert task["id"] == interactive
+    assert task["payload"] == {"n": 2}
+    assert task["status"] == TASK_LEASED
+    assert task["attempts"] == 1
+    assert queue.lease("w2", visibility_timeout=30)["job_id"] == "job-1"
+    assert queue.lease("w3", visibility_timeout=30) is None
+
+
+def test_lease_can_be_limited_to_priority_classes(queue):
+    queue.enqueue({}, priority=PRIORITY_BATCH)
+
+    assert queue.lease("w1", 30, priorities=[PRIORITY_INTERACTIVE]) is None
+    assert queue.lease("w1", 30, priorities=[PRIORITY_BATCH]) is not None
+
+
+def test_heartbeat_extends_the_lease(queue, clock):
+    task_id = queue.enqueue({})
+    queue.lease("w1", visibility_timeout=30)
+
+    clock[0] += 20
+    assert queue.heartbeat(task_id, "w1", visibility_timeout=30)
+    clock[0] += 20
+    # 40s after the lease, but only 20s after the heartbeat
+    assert queue.lease("w2", visibility_timeout=30) is None
+    assert queue.get(task_id)["lease_expires_at"] == 1050.0
+
+
+def test_expired_lease_is_leased_again(queue, clock):
+    task_id = queue.enqueue({})
+    queue.lease("w1", visibility_timeout=30)
+
+    clock[0] += 31
+    task = queue.lease("w2", visibility_timeout=30)
+
+    assert task["id"] == task_id
+    assert task["worker_id"] == "w2"
+    assert task["attempts"] == 2
+    # The first worker lost its lease: its heartbeat and result are refused
+    assert not queue.heartbeat(task_id, "w1", visibility_timeout=30)
+    assert not queue.complete(task_id, "w1", {"key": "stale"})
+    assert queue.complete(task_id, "w2", {"key": "videos/job/out.mp4"})
+    assert queue.get(task_id)["result"] == {"key": "videos/job/out.mp4"}
+    assert queue.get(task_id)["status"] == TASK_DONE
+
+
+def test_task_fails_after_max_attempts(queue, clock):
+    task_id = queue.enqueue({})
+    queue.lease("w1", visibility_timeout=30)
+    clock[0] += 31
+    queue.lease("w2", visibility_timeout=30)
+    clock[0] += 31
+
+    # Both attempts ran out without a result, so the task fails instead of being leased a third time
+    assert queue.lease("w3", visibility_timeout=30) is None
+    task = queue.get(task_id)
+    assert task["status"] == TASK_FAILED
+    assert task["error"] == "Gave up after 2 attempts"
+
+
+def test_failed_attempt_is_retried_until_max_attempts(queue):
+    task_id = queue.enqueue({})
+
+    queue.lease("w1", visibility_timeout=30)
+    assert queue.fail(task_id, "w1", RuntimeError("out of memory"))
+    assert queue.get(task_id)["status"] == TASK_QUEUED
+
+    queue.lease("w2", visibility_timeout=30)
+    assert queue.fail(task_id, "w2", RuntimeError("out of memory"))
+    task = queue.get(task_id)
+    assert task["status"] == TASK_FAILED
+    assert task["error"] == "out of memory"
+
+
+def test_complete_with_a_lost_lease_returns_false(queue, clock):
+    task_id = queue.enqueue({})
+    queue.lease("w1", visibility_timeout=30)
+    assert queue.complete(task_id, "w1", {"key": "first"})
+
+    # Completed tasks can't be completed or failed again
+    assert not queue.complete(task_id, "w1", {"key": "second"})
+    assert not queue.fail(task_id, "w1", RuntimeError("late"))
+    assert queue.get(task_id)["result"] == {"key": "first"}
+    assert not queue.complete(queue.enqueue({}), "w1", {"key": "never leased"})
+
+
+def test_purge_drops_old_finished_tasks(queue, clock):
+    done = queue.enqueue({})
+    queue.lease("w1", visibility_timeout=30)
+    queue.complete(done, "w1", {})
+    waiting = queue.enqueue({})
+
+    clock[0] += 100
+    assert queue.purge(older_than=50) == 1
+    assert queue.get(done) is None
+    assert queue.get(waiting) is not None
@@ -0,0 +1,96 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import render_scheduler
+from app.services.render_scheduler import (
+    RenderScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_STANDARD
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Scheduler clock that only moves when told to."""
+    now = [1000.0]
+    monkeypatch.setattr(render_scheduler, "time", SimpleNamespace(
+        monotonic=lambda: now[0], time_ns=lambda: int(now[0] * 1e9)))
+    return now
+
+
+def run_in_order(scheduler, submissions):
+    """
+    Submit renders while the only worker is busy, then let it run them.
+
+    Returns:
+        list: Names of the renders in the order they ran
+    """
+    gate = threading.Event()
+    ran = []
+    blocker = scheduler.submit(gate.wait, priority=PRIORITY_INTERACTIVE)
+    futures = [scheduler.submit(ran.append, name, priority=priority, cost=cost)
+               for name, priority, cost in submissions]
+    gate.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+    return ran
+
+
+def test_classes_run_in_priority_order_then_shortest_first():
+    scheduler = RenderScheduler(workers=1, aging_rate=0, reserved_interactive=0)
+
+    ran = run_in_order(scheduler, [
+        ("batch", PRIORITY_BATCH, 1),
+        ("standard-long", PRIORITY_STANDARD, 50),
+        ("standard-short", PRIORITY_STANDARD, 5),
+        ("interactive", PRIORITY_INTERACTIVE, 100),
+    ])
+
+    assert ran == ["interactive", "standard-short", "standard-long", "batch"]
+
+
+def test_equal_scores_run_in_submission_order():
+    scheduler = RenderScheduler(workers=1, aging_rate=0, reserved_interactive=0)
+
+    ran = run_in_order(scheduler, [(f"render-{i}", PRIORITY_STANDARD, 10) for i in range(5)])
+
+    assert ran == [f"render-{i}" for i in range(5)]
+
+
+def test_waiting_renders_age_past_newer_higher_priority_ones(clock):
+    scheduler = RenderScheduler(workers=1, aging_rate=1.0, reserved_interactive=0)
+    # Keep the tasks pending; no worker threads are started
+    scheduler._start = lambda: None
+    scheduler.submit(print, priority=PRIORITY_BATCH, cost=10)
+
+    # Standard renders have a 3300s head start over batch ones, which the batch render has waited off by then
+    clock[0] += 3299
+    scheduler.submit(print, priority=PRIORITY_STANDARD, cost=10)
+    assert scheduler._next_task(False).priority == PRIORITY_STANDARD
+
+    clock[0] += 2
+    scheduler.submit(print, priority=PRIORITY_STANDARD, cost=10)
+    assert scheduler._next_task(False).priority == PRIORITY_BATCH
+    assert scheduler.queued() == {PRIORITY_INTERACTIVE: 0, PRIORITY_STANDARD: 1, PRIORITY_BATCH: 0}
+
+
+def test_reserved_workers_only_take_interactive_renders(clock):
+    scheduler = RenderScheduler(workers=2, aging_rate=0, reserved_interactive=1)
+    scheduler._start = lambda: None
+    scheduler.submit(print, priority=PRIORITY_BATCH)
+
+    assert scheduler._next_task(True) is None
+    scheduler.submit(print, priority=PRIORITY_INTERACTIVE, cost=500)
+    assert scheduler._next_task(True).priority == PRIORITY_INTERACTIVE
+    assert scheduler._next_task(False).priority == PRIORITY_BATCH
+
+
+def test_failed_render_resolves_its_future_with_the_error():
+    scheduler = RenderScheduler(workers=1, reserved_interactive=0)
+
+    def fail():
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError, match="render failed"):
+        scheduler.submit(fail).result(timeout=5)
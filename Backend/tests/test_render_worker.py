@@ -0,0 +1,98 @@
+import signal
+import sqlite3
+import threading
+
+from app.workers import render_worker
+from app.workers.render_worker import RECYCLE_EXIT_CODE, RenderWorker
+
+
+class LockedQueue:
+    """Render queue whose writes fail as they do while another process holds the database lock."""
+
+    def __init__(self):
+        self.leased = False
+        self.unregistered = False
+
+    def lease(self, worker_id, visibility_timeout, priorities=None, node=None):
+        if self.leased:
+            return None
+        self.leased = True
+        return {"id": "task-1", "job_id": "job-1", "attempts": 1, "payload": {"manim_code": "", "job_id": "job-1"}}
+
+    def heartbeat(self, task_id, worker_id, visibility_timeout):
+        return True
+
+    def complete(self, task_id, worker_id, result):
+        raise sqlite3.OperationalError("database is locked")
+
+    fail = complete
+
+    def purge(self, older_than):
+        return 0
+
+    def unregister_worker(self, worker_id):
+        self.unregistered = True
+
+
+def test_queue_errors_while_reporting_do_not_stop_the_worker(monkeypatch):
+    def render(*args, **kwargs):
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr(render_worker, "create_video", render)
+    queue = LockedQueue()
+    stop_event = threading.Event()
+    worker = RenderWorker(queue=queue, store=object(), worker_id="w1", visibility_timeout=60,
+                          poll_interval=0.01, stop_event=stop_event)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    while not queue.leased:
+        stop_event.wait(0.01)
+    stop_event.wait(0.05)
+    assert thread.is_alive()
+
+    stop_event.set()
+    thread.join(timeout=5)
+    assert queue.unregistered
+
+
+class FakeProcess:
+    """Stands in for the worker child process, exiting with the next scripted code."""
+
+    def __init__(self, codes, on_last):
+        self.codes = codes
+        self.on_last = on_last
+        self.pid = 1000 + len(codes)
+        self.exitcode = None
+
+    def start(self):
+        self.exitcode = self.codes.pop(0)
+        if not self.codes:
+            self.on_last()
+
+    def join(self):
+        pass
+
+    def is_alive(self):
+        return False
+
+
+def test_supervisor_replaces_crashed_and_recycled_processes(monkeypatch):
+    handlers = {}
+    monkeypatch.setattr(render_worker.signal, "signal", lambda signum, handler: handlers.setdefault(signum, handler))
+    monkeypatch.setattr(render_worker, "RESTART_BACKOFF_MAX", 0.01)
+    # A database error, a clean exit nobody asked for and a recycle are all replaced
+    codes = [1, 0, RECYCLE_EXIT_CODE, 0]
+    started = []
+
+    def stop():
+        handlers[signal.SIGTERM](signal.SIGTERM, None)
+
+    class Context:
+        def Process(self, target, args, name):
+            started.append(name)
+            return FakeProcess(codes, stop)
+
+    monkeypatch.setattr(render_worker.multiprocessing, "get_context", lambda method: Context())
+
+    assert render_worker.supervise() == 0
+    assert len(started) == 4
@@ -0,0 +1,133 @@
+import textwrap
+
+import pytest
+
+from app.services.manim_service import get_fallback_template
+from app.services.scene_cost import (
+    SceneRejected,
+    analyze_scene,
+    enforce_scene_limits,
+    estimate_plan_duration,
+    get_scene_limits,
+)
+
+
+def scene(body):
+    """Wrap construct() body lines in a scene class."""
+    return (
+        "from manim import *\n\n"
+        "class EducationalScene(Scene):\n"
+        "    def construct(self):\n"
+        + textwrap.indent(textwrap.dedent(body).strip() + "\n", " " * 8)
+    )
+
+
+def test_estimate_plan_duration():
+    plan = "Scene 1: title (duration: 5 seconds)\nScene 2: proof, duration 8-12 sec\nNotes: keep it 3s"
+    assert estimate_plan_duration(plan) == 15.0
+    assert estimate_plan_duration("Intro 4 seconds, outro 2s") == 6.0
+    assert estimate_plan_duration("") == 0.0
+
+
+def test_analyze_counts_calls_and_durations():
+    stats = analyze_scene(scene("""
+        circle = Circle()
+        self.play(Create(circle), run_time=2)
+        self.wait()
+        self.wait(3)
+    """))
+
+    assert stats["plays"] == 1
+    assert stats["waits"] == 2
+    assert stats["seconds"] == 6.0
+    assert stats["mobjects"] == 1
+    assert stats["longest_call_seconds"] == 3.0
+
+
+def test_analyze_multiplies_by_loop_counts():
+    stats = analyze_scene(scene("""
+        dots = VGroup(*[Dot() for _ in range(4)])
+        for dot in dots:
+            self.play(FadeIn(dot))
+        for i in range(2, 8, 2):
+            self.wait(0.5)
+    """))
+
+    assert stats["plays"] == 4
+    assert stats["waits"] == 3
+    assert stats["mobjects"] == 5
+    assert stats["seconds"] == 5.5
+
+
+def test_analyze_folds_constant_bounds():
+    assert analyze_scene(scene("""
+        for i in range(10**6):
+            self.wait(1)
+    """))["waits"] == 10 ** 6
+    assert analyze_scene(scene("""
+        n = 2 * 50
+        for i in range(n):
+            self.wait(1)
+    """))["waits"] == 100
+    assert analyze_scene(scene("""
+        for _ in [0] * 10**9:
+            self.wait(1)
+    """))["waits"] == 10 ** 9
+
+
+@pytest.mark.parametrize("body", [
+    "for i in range(int(input())):\n    self.wait(1)",
+    "while True:\n    self.wait(1)",
+    "t = 0\nwhile t < 10**9:\n    self.wait(1)\n    t += 1",
+    "import itertools\nfor _ in itertools.count():\n    self.wait(1)",
+    "for _ in range(10**100):\n    self.wait(1)",
+])
+def test_analyze_flags_loops_without_a_known_end(body):
+    assert analyze_scene(scene(body))["unbounded_loops"] == 1
+
+
+def test_loops_that_break_or_dont_animate_are_bounded():
+    stats = analyze_scene(scene("""
+        while True:
+            self.wait(1)
+            break
+        t = 0
+        while t < 3:
+            t += 1
+    """))
+    assert stats["unbounded_loops"] == 0
+
+
+def test_analyze_ignores_invalid_code():
+    assert analyze_scene("def broken(:")["plays"] == 0
+
+
+def test_enforce_accepts_fallback_template():
+    code = get_fallback_template("Test")
+
+    assert enforce_scene_limits(code)[0] == code
+
+
+def test_enforce_clamps_long_calls():
+    limits = get_scene_limits()
+    code, stats = enforce_scene_limits(scene("""
+        self.wait(10**9)
+        self.play(Create(Circle()), run_time=duration)
+    """))
+
+    assert f"self.wait({limits['max_wait_seconds']})" in code
+    assert f"run_time=min(duration, {limits['max_run_time_seconds']})" in code
+    assert stats["seconds"] == limits["max_wait_seconds"] + limits["max_run_time_seconds"]
+    # Clamping is idempotent
+    assert enforce_scene_limits(code)[0] == code
+
+
+@pytest.mark.parametrize("body, problem", [
+    ("for i in range(10**9):\n    self.play(FadeIn(Dot()))", "animations"),
+    ("for i in range(100):\n    self.wait(30)", "of animation"),
+    ("dots = [Dot() for _ in range(10**5)]", "mobjects"),
+    ("for i in range(n):\n    self.wait(1)", "unbounded loop"),
+])
+def test_enforce_rejects_scenes_over_the_limits(body, problem):
+    with pytest.raises(SceneRejected, match=problem):
+        enforce_scene_limits(scene(body))
@@ -0,0 +1,121 @@
+import difflib
+import textwrap
+
+import pytest
+
+from app.services.scene_diff import apply_patch, diff_scenes, split_animations
+
+
+def scene(body, preamble=""):
+    """Wrap construct() body lines in a scene class."""
+    return (
+        "from manim import *\n" + preamble + "\n"
+        "class EducationalScene(Scene):\n"
+        "    def construct(self):\n"
+        + textwrap.indent(textwrap.dedent(body).strip() + "\n", " " * 8)
+    )
+
+
+BASE = scene("""
+    title = Text("Circles")
+    self.play(Write(title))
+    circle = Circle()
+    self.play(Create(circle))
+    self.wait(1)
+""")
+
+
+def unified_diff(old, new):
+    return "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True), "a/scene.py", "b/scene.py"))
+
+
+def test_split_groups_setup_with_the_next_animation():
+    split = split_animations(BASE)
+
+    assert len(split["animations"]) == 3
+    assert len(split["animations"][0]) == 2
+    assert len(split["animations"][1]) == 2
+    assert len(split["animations"][2]) == 1
+    assert split["tail"] == ()
+
+
+def test_split_keeps_statements_after_the_last_animation():
+    split = split_animations(scene("""
+        self.wait(1)
+        square = Square()
+    """))
+
+    assert len(split["animations"]) == 1
+    assert len(split["tail"]) == 1
+
+
+@pytest.mark.parametrize("code", [
+    scene("for i in range(3):\n    self.play(FadeIn(Dot()))"),
+    scene("if True:\n    self.wait(1)"),
+    scene("result = self.wait(1)"),
+    scene("self.play(Write(Text('a')), run_time=self.wait(1))"),
+    "class EducationalScene(Scene):\n"
+    "    def intro(self):\n        self.wait(1)\n\n"
+    "    def construct(self):\n        self.intro()\n",
+    "class Other(Scene):\n    def construct(self):\n        self.wait(1)\n",
+    "def broken(:",
+])
+def test_split_refuses_scenes_it_cant_number(code):
+    assert split_animations(code) is None
+
+
+def test_diff_ignores_formatting_and_comments():
+    edited = BASE.replace("circle = Circle()", "circle = Circle(  )  # the circle")
+
+    assert diff_scenes(BASE, edited) == {"reusable": 3, "changed": [], "animations": 3}
+
+
+def test_diff_reuses_animations_before_the_first_change():
+    edited = BASE.replace("Create(circle)", "GrowFromCenter(circle)")
+
+    assert diff_scenes(BASE, edited) == {"reusable": 1, "changed": [1], "animations": 3}
+
+
+def test_diff_counts_appended_animations_as_changed():
+    edited = BASE.replace("self.wait(1)", "self.wait(1)\n        self.play(FadeOut(circle))")
+
+    assert diff_scenes(BASE, edited) == {"reusable": 3, "changed": [3], "animations": 4}
+
+
+def test_diff_reuses_nothing_when_the_preamble_changes():
+    edited = BASE.replace("from manim import *\n", "from manim import *\nimport numpy as np\n")
+
+    assert diff_scenes(BASE, edited)["reusable"] == 0
+
+
+def test_diff_gives_up_on_unsplittable_scenes():
+    assert diff_scenes(BASE, scene("for i in range(3):\n    self.wait(1)")) is None
+
+
+def test_apply_patch_round_trips_unified_diff():
+    edited = BASE.replace("Create(circle)", "GrowFromCenter(circle)").replace(
+        "self.wait(1)", "self.wait(2)\n        self.play(FadeOut(circle))")
+
+    assert apply_patch(BASE, unified_diff(BASE, edited)) == edited
+
+
+def test_apply_patch_handles_insert_only_hunks():
+    original = "a\nb\nc\n"
+    patch = "@@ -1,0 +2,1 @@\n+inserted\n"
+
+    assert apply_patch(original, patch) == "a\ninserted\nb\nc\n"
+
+
+def test_apply_patch_rejects_patches_that_dont_match():
+    patch = unified_diff(BASE, BASE.replace("Circles", "Squares")).replace("-    ", "-  ", 1)
+    stale = unified_diff(BASE.replace("Circles", "Dots"), BASE)
+
+    with pytest.raises(ValueError, match="does not apply"):
+        apply_patch(BASE, stale)
+    with pytest.raises(ValueError):
+        apply_patch(BASE, patch)
+
+
+def test_apply_patch_requires_hunks():
+    with pytest.raises(ValueError, match="no hunks"):
+        apply_patch(BASE, "--- a/scene.py\n+++ b/scene.py\n")
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.controllers import animation_controller
+from app.services.single_flight import CallAborted, SingleFlight
+
+
+class Stop(BaseException):
+    """Stands in for SystemExit or KeyboardInterrupt in the leader."""
+
+
+def wait_for_waiters(flight, key, count=1, timeout=5):
+    deadline = time.monotonic() + timeout
+    while flight.waiters(key) < count:
+        assert time.monotonic() < deadline, "caller never attached"
+        time.sleep(0.001)
+
+
+def run_with_follower(flight, key, leader_fn):
+    """Start a leader running leader_fn, attach a second caller, then let the leader finish."""
+    release = threading.Event()
+    outcomes = {}
+
+    def leader():
+        release.wait()
+        return leader_fn()
+
+    def call(name):
+        try:
+            outcomes[name] = flight.do(key, leader)
+        except BaseException as e:
+            outcomes[name] = e
+
+    first = threading.Thread(target=call, args=("leader",))
+    first.start()
+    while key not in flight._calls:
+        time.sleep(0.001)
+    second = threading.Thread(target=call, args=("follower",))
+    second.start()
+    wait_for_waiters(flight, key)
+    release.set()
+    first.join(5)
+    second.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    outcomes = run_with_follower(flight, "key", lambda: calls.append(1) or "video")
+
+    assert calls == [1]
+    assert outcomes == {"leader": ("video", False), "follower": ("video", True)}
+    assert flight.do("key", lambda: "again") == ("again", False)
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise ValueError("render failed")
+
+    outcomes = run_with_follower(flight, "key", fail)
+
+    assert isinstance(outcomes["leader"], ValueError)
+    assert outcomes["follower"] is outcomes["leader"]
+
+
+def test_aborted_leader_fails_its_waiters():
+    flight = SingleFlight("test")
+
+    def stop():
+        raise Stop()
+
+    outcomes = run_with_follower(flight, "key", stop)
+
+    assert isinstance(outcomes["leader"], Stop)
+    assert isinstance(outcomes["follower"], CallAborted)
+    assert flight.waiters("key") == 0
+
+
+def test_cancelled_async_leader_fails_its_waiters():
+    flight = SingleFlight("test")
+
+    async def main():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        leader = asyncio.create_task(flight.ado("key", slow))
+        await started.wait()
+        follower = asyncio.create_task(flight.ado("key", slow))
+        while flight.waiters("key") < 1:
+            await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(CallAborted):
+            await follower
+
+    asyncio.run(main())
+
+
+def test_flight_key_separates_callers_with_different_options(monkeypatch):
+    monkeypatch.setenv("PROMPT_REUSE_MODE", "return")
+    key = animation_controller._flight_key
+
+    base = key("circles", None, True, None, "standard", False)
+    assert base == key("circles", None, True, "return", "standard", False)
+    assert base != key("circles", None, False, None, "standard", False)
+    assert base != key("circles", None, True, "offer", "standard", False)
+    assert base != key("circles", None, True, None, "interactive", False)
+    assert base != key("circles", {"encoder_profile": "fast-preview"}, True, None, "standard", False)
+    assert key("circles", None, False, None, "standard", True) != key("circles", None, False, None, "standard", True)
+
+
+def test_forced_request_does_not_attach_to_a_reusing_one(monkeypatch):
+    release = threading.Event()
+    runs = []
+
+    def run_job(prompt, settings, reuse, reuse_mode, priority, profiling):
+        runs.append(reuse)
+        release.wait(5)
+        return {"job_id": f"job-{len(runs)}", "status": "completed", "reused": reuse}
+
+    monkeypatch.setattr(animation_controller, "_run_animation_job", run_job)
+    monkeypatch.setattr(animation_controller, "_with_hls", lambda result, hls, priority: result)
+    results = {}
+
+    def call(name, **options):
+        results[name] = animation_controller.create_animation("circles", **options)
+
+    threads = [
+        threading.Thread(target=call, args=("normal",)),
+        threading.Thread(target=call, args=("same",)),
+        threading.Thread(target=call, args=("forced",), kwargs={"reuse": False}),
+    ]
+    threads[0].start()
+    while len(runs) < 1:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while len(runs) < 2:
+        time.sleep(0.001)
+    wait_for_waiters(animation_controller._generate_flight,
+                     animation_controller._flight_key("circles", None, True, None, "standard", False))
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sorted(runs) == [False, True]
+    assert results["same"]["coalesced"] and results["same"]["job_id"] == results["normal"]["job_id"]
+    assert not results["forced"]["coalesced"] and results["forced"]["reused"] is False
@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_startup_is_within_budget_without_heavy_imports():
+    result = subprocess.run(
+        [sys.executable, os.path.join("scripts", "check_startup_time.py"), "--runs", "2"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert result.stdout.rstrip().endswith("OK")
@@ -0,0 +1,108 @@
+import os
+import time
+
+import pytest
+
+from app.services.packaging_service import hls_package_complete
+from app.services.storage_service import CATEGORIES, StorageManager
+
+HLS = next(category for category in CATEGORIES if category["name"] == "hls")
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def manager(tmp_path):
+    roots = {"output": str(tmp_path / "output"), "media": str(tmp_path / "media"), "temp": str(tmp_path / "temp")}
+    return StorageManager(roots=roots, protect_hours=1)
+
+
+def write(path, data=b"x" * 100, age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    then = time.time() - age
+    os.utime(path, (then, then))
+    return path
+
+
+def make_hls_package(manager, job_id, age):
+    """Write a two-rendition HLS package whose files are all `age` seconds old."""
+    directory = os.path.join(manager.roots["output"], "hls", job_id)
+    master = write(os.path.join(directory, "master.m3u8"),
+                   b"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1000000\n480p/index.m3u8\n"
+                   b"#EXT-X-STREAM-INF:BANDWIDTH=2000000\n720p/index.m3u8\n", age)
+    for rendition in ("480p", "720p"):
+        write(os.path.join(directory, rendition, "index.m3u8"),
+              b"#EXTM3U\n#EXTINF:4.0,\nsegment_000.ts\n#EXTINF:4.0,\nsegment_001.ts\n", age)
+        for index in range(2):
+            write(os.path.join(directory, rendition, f"segment_{index:03d}.ts"), b"x" * 1000, age)
+    return master
+
+
+def test_complete_package_is_playable(manager):
+    master = make_hls_package(manager, "job-1", age=0)
+
+    assert hls_package_complete(master)
+    os.remove(os.path.join(os.path.dirname(master), "720p", "segment_001.ts"))
+    assert not hls_package_complete(master)
+    assert not hls_package_complete(None)
+
+
+def test_compaction_evicts_hls_packages_as_a_whole(manager, monkeypatch):
+    old = make_hls_package(manager, "job-old", age=3 * DAY)
+    new = make_hls_package(manager, "job-new", age=2 * DAY)
+    # Room for one package only
+    monkeypatch.setenv("STORAGE_QUOTA_HLS_MB", str(5000 / (1024 * 1024)))
+
+    evicted = manager.compact_category(HLS, artifact_usage={})
+
+    assert not os.path.exists(os.path.dirname(old))
+    assert hls_package_complete(new)
+    assert evicted["files"] == 7
+
+
+def test_recently_used_playlist_protects_its_segments(manager, monkeypatch):
+    master = make_hls_package(manager, "job-1", age=3 * DAY)
+    monkeypatch.setenv("STORAGE_QUOTA_HLS_MB", "0")
+    monkeypatch.setenv("STORAGE_TTL_HLS_HOURS", "1")
+
+    # Only the master playlist is a tracked artifact; serving it refreshes its use
+    evicted = manager.compact_category(HLS, artifact_usage={master: (time.time(), False)})
+
+    assert evicted == {"files": 0, "bytes": 0}
+    assert hls_package_complete(master)
+
+
+def test_active_job_package_is_kept(manager, monkeypatch):
+    master = make_hls_package(manager, "job-1", age=3 * DAY)
+    monkeypatch.setenv("STORAGE_QUOTA_HLS_MB", "0")
+
+    manager.compact_category(HLS, artifact_usage={master: (0, True)})
+
+    assert hls_package_complete(master)
+
+
+def test_evicting_a_package_forgets_its_tracked_files(manager, monkeypatch, job_store):
+    master = make_hls_package(manager, "job-1", age=3 * DAY)
+    job = job_store.create_job("circles")
+    job_store.add_artifact(job["id"], "hls", master)
+    monkeypatch.setenv("STORAGE_QUOTA_HLS_MB", "0")
+    assert master in job_store.get_artifact_usage()
+
+    manager.compact_category(HLS, artifact_usage={master: (time.time() - 3 * DAY, False)})
+
+    assert not os.path.exists(master)
+    assert job_store.list_artifacts(job["id"]) == []
+
+
+def test_single_file_categories_are_evicted_per_file(manager, monkeypatch):
+    videos = next(category for category in CATEGORIES if category["name"] == "videos")
+    directory = os.path.join(manager.roots["output"], "videos")
+    oldest = write(os.path.join(directory, "a.mp4"), age=3 * DAY)
+    newest = write(os.path.join(directory, "b.mp4"), age=2 * DAY)
+    monkeypatch.setenv("STORAGE_QUOTA_VIDEOS_MB", str(150 / (1024 * 1024)))
+
+    manager.compact_category(videos, artifact_usage={})
+
+    assert not os.path.exists(oldest)
+    assert os.path.exists(newest)
@@ -0,0 +1,84 @@
+import itertools
+import pickle
+
+from app.services import text_cache
+from app.services.text_cache import TextCache
+
+
+def make_cache(tmp_path, max_bytes=1024 * 1024):
+    return TextCache(cache_dir=str(tmp_path / "cache"), max_bytes=max_bytes)
+
+
+def test_make_key_is_stable_and_covers_settings():
+    key = TextCache.make_key("E = mc^2", font="Arial", size=48, line_spacing=1)
+    assert key == TextCache.make_key("E = mc^2", font="Arial", size=48, line_spacing=1)
+    assert key != TextCache.make_key("E = mc^2", font="Arial", size=36, line_spacing=1)
+    assert key != TextCache.make_key("E = mc^2", font="Arial", size=48, line_spacing=2)
+    assert key != TextCache.make_key("E = mc^3", font="Arial", size=48, line_spacing=1)
+
+
+def test_svg_round_trip(tmp_path):
+    cache = make_cache(tmp_path)
+    source = tmp_path / "rendered.svg"
+    source.write_bytes(b"<svg/>")
+    key = TextCache.make_key("hello")
+
+    assert cache.get_svg(key) is None
+    cached = cache.put_svg(key, str(source))
+
+    assert cache.get_svg(key) == cached
+    with open(cached, "rb") as f:
+        assert f.read() == b"<svg/>"
+    assert cache.stats() == {"svg": {"entries": 1, "bytes": 6}}
+
+
+def test_paths_round_trip(tmp_path):
+    cache = make_cache(tmp_path)
+    key = TextCache.make_key("hello")
+
+    cache.put_paths(key, {"points": [1, 2, 3]})
+
+    assert cache.get_paths(key) == {"points": [1, 2, 3]}
+
+
+def test_unpicklable_paths_are_skipped(tmp_path):
+    cache = make_cache(tmp_path)
+
+    assert cache.put_paths(TextCache.make_key("hello"), lambda: None) is None
+    assert cache.stats() == {}
+
+
+def test_unreadable_paths_entry_is_discarded(tmp_path):
+    cache = make_cache(tmp_path)
+    key = TextCache.make_key("hello")
+    path = cache.put_paths(key, [1, 2, 3])
+    with open(path, "wb") as f:
+        f.write(b"not a pickle")
+
+    assert cache.get_paths(key) is None
+    assert cache.stats() == {}
+
+
+def test_cache_is_shared_between_instances(tmp_path):
+    key = TextCache.make_key("shared")
+    make_cache(tmp_path).put_paths(key, "paths")
+
+    assert make_cache(tmp_path).get_paths(key) == "paths"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(text_cache.time, "time", lambda: next(clock))
+    payload_size = len(pickle.dumps("x" * 100, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = make_cache(tmp_path, max_bytes=payload_size * 3)
+    keys = [TextCache.make_key(f"text {i}") for i in range(3)]
+    for key in keys:
+        cache.put_paths(key, "x" * 100)
+    # Touch the oldest entry so the second one is now least recently used
+    cache.get_paths(keys[0])
+
+    cache.put_paths(TextCache.make_key("text 3"), "x" * 100)
+
+    assert cache.get_paths(keys[1]) is None
+    assert cache.get_paths(keys[0]) == "x" * 100
+    assert cache.stats()["paths"]["bytes"] <= payload_size * 3
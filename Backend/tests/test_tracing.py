@@ -0,0 +1,142 @@
+import pytest
+
+from app.services import tracing
+from app.services.tracing import (
+    CATEGORY_COMPUTE,
+    CATEGORY_IO,
+    CATEGORY_LLM,
+    CATEGORY_RENDER,
+    NO_SPAN,
+    Span,
+    Trace,
+    summarize,
+)
+
+# Span times in seconds after an arbitrary start, so 0 isn't mistaken for "now"
+BASE_NS = 1_700_000_000 * 10 ** 9
+
+
+def ns(seconds):
+    return BASE_NS + int(seconds * 10 ** 9)
+
+
+def add_span(trace, name, start, end, parent=None, category=None):
+    span = Span(trace, name, parent.span_id if parent else None, category, start_ns=ns(start))
+    trace.add(span)
+    if end is not None:
+        span.end(ns(end))
+    return span
+
+
+@pytest.fixture
+def isolated_traces(tmp_path, monkeypatch):
+    """Trace with export going to a temporary directory."""
+    monkeypatch.setenv("TRACING_ENABLED", "true")
+    monkeypatch.delenv("TRACE_EXPORT_URL", raising=False)
+    monkeypatch.setattr(tracing, "get_trace_path", lambda job_id: str(tmp_path / f"{job_id}.json"))
+    yield
+    tracing._current_span.set(None)
+
+
+def test_summarize_attributes_time_to_the_innermost_category():
+    trace = Trace("job-1")
+    root = add_span(trace, "job", 0, 10)
+    add_span(trace, "workflow.code_generator", 0, 3, root, CATEGORY_LLM)
+    render = add_span(trace, "render", 3, 9, root, CATEGORY_RENDER)
+    cli = add_span(trace, "render.cli", 3, 8, render)
+    add_span(trace, "scene.validate", 4, 5, cli, CATEGORY_COMPUTE)
+    add_span(trace, "render.publish", 8, 9, render, CATEGORY_IO)
+
+    summary = summarize(trace.to_otlp())
+
+    assert summary["total_seconds"] == 10.0
+    assert summary["in_progress"] is False
+    assert summary["by_category"] == {"compute": 1.0, "io": 1.0, "llm": 3.0, "render": 4.0}
+    assert summary["slowest"][0] == {"name": "render", "seconds": 6.0}
+    assert all(span["name"] != "job" for span in summary["slowest"])
+    assert summary["errors"] == []
+    assert summary["spans"] == 6
+
+
+def test_summarize_running_job():
+    trace = Trace("job-1")
+    root = add_span(trace, "job", 0, None)
+    add_span(trace, "workflow.planner", 0, 2, root, CATEGORY_LLM)
+
+    summary = summarize(trace.to_otlp())
+
+    assert summary["in_progress"] is True
+    assert summary["by_category"] == {"llm": 2.0}
+
+
+def test_summarize_lists_errors():
+    trace = Trace("job-1")
+    root = add_span(trace, "job", 0, 5)
+    failed = add_span(trace, "render.cli", 1, None, root, CATEGORY_RENDER)
+    failed.record_error(RuntimeError("manim exited with 1"))
+    failed.end(ns(4))
+
+    summary = summarize(trace.to_otlp())
+
+    assert summary["errors"] == [{"name": "render.cli", "message": "manim exited with 1"}]
+
+
+def test_summarize_empty_trace():
+    summary = summarize({})
+
+    assert summary["total_seconds"] is None
+    assert summary["by_category"] == {}
+    assert summary["spans"] == 0
+
+
+def test_spans_outside_a_job_are_not_recorded():
+    with tracing.span("orphan") as span:
+        assert span is NO_SPAN
+    assert tracing.start_span("orphan") is NO_SPAN
+
+
+def test_trace_drops_spans_over_the_limit(monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_SPANS", 3)
+    trace = Trace("job-1")
+    root = add_span(trace, "job", 0, 10)
+    for i in range(4):
+        add_span(trace, f"step.{i}", i, i + 1, root)
+
+    otlp = trace.to_otlp()
+
+    assert summarize(otlp)["spans"] == 3
+    resource = {item["key"]: item["value"] for item in otlp["resourceSpans"][0]["resource"]["attributes"]}
+    assert resource["trace.dropped_spans"] == {"intValue": "2"}
+
+
+def test_job_trace_round_trip(isolated_traces):
+    root = tracing.start_trace("job-2", prompt="circles")
+    with tracing.span("render", CATEGORY_RENDER):
+        with pytest.raises(ValueError):
+            with tracing.span("render.cli"):
+                raise ValueError("bad scene")
+        # A render worker records its spans in its own process
+        with tracing.continue_trace(tracing.current_span().context(), "render.worker") as remote:
+            with tracing.span("render.encode", CATEGORY_COMPUTE):
+                pass
+        tracing.add_remote_spans(tracing.current_span(), remote.export_spans())
+    live = tracing.get_trace("job-2")
+    tracing.finish_trace("job-2", status="completed")
+
+    assert tracing.current_span() is None
+    assert root.end_ns is not None
+    exported = tracing.get_trace("job-2")
+    spans = {span["name"]: span for span in exported["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    assert set(spans) == {"job", "render", "render.cli", "render.worker", "render.encode"}
+    assert spans["render.worker"]["parentSpanId"] == spans["render"]["spanId"]
+    assert {span["traceId"] for span in spans.values()} == {root.trace.trace_id}
+    assert summarize(exported)["errors"] == [{"name": "render.cli", "message": "bad scene"}]
+    assert summarize(live)["in_progress"] is True
+    assert summarize(exported)["in_progress"] is False
+
+
+def test_disabled_tracing_records_nothing(isolated_traces, monkeypatch):
+    monkeypatch.setenv("TRACING_ENABLED", "false")
+
+    assert tracing.start_trace("job-3") is NO_SPAN
+    assert tracing.get_trace("job-3") is None